@@ -0,0 +1,163 @@
+"""
+Benchmark of SmartBot's leaf evaluation.
+
+SmartBot.assess_state used to generate the moves of both colors at every
+leaf just to count pieces and kings; it now reads the material counts
+Checkers keeps up to date. This script times both on positions from random
+games and checks that they agree.
+
+With --memory it instead measures, with tracemalloc, the bytes a Checkers
+takes and the allocations a valid_moves call makes (the move trees), from
+the bitboard and from walking the squares.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Timing the evaluation on size 3 and size 6 boards::
+
+        python3 src/benchmark.py --size 3 --size 6
+
+    2) On more positions, with a fixed seed::
+
+        python3 src/benchmark.py --size 3 --positions 5000 --seed 7
+
+    3) Memory per position and per valid_moves call::
+
+        python3 src/benchmark.py --memory
+"""
+import gc
+import random
+import time
+import tracemalloc
+import click
+
+from checkers import Checkers, PieceColor, opposite_color
+from bot_minimax import SmartBot
+
+
+def assess_state_moves(bot, board):
+    """
+    The evaluation as it was before material counts: pieces and kings are
+    counted from the move trees of valid_moves (one tree per piece).
+
+    Input: bot (SmartBot), board (Checkers)
+    Output: int
+    """
+    opp_mvs = board.valid_moves(bot._oppcolor)
+    mvs = board.valid_moves(bot._color)
+    kings = sum(1 for mv in mvs if mv.location.piece.is_king)
+    opp_kings = sum(1 for mv in opp_mvs if mv.location.piece.is_king)
+    return (kings - opp_kings) + 2 * (len(mvs) - len(opp_mvs))
+
+
+def sample_positions(size, count):
+    """
+    Plays random games on a board of the given size and records the moves
+    leading to count of the positions they pass through.
+
+    Input: size (int), count (int)
+    Output: list[list[LegalMove]], the moves from the start to each position
+    """
+    lines = []
+    while len(lines) < count:
+        board = Checkers(size)
+        color = board.get_turn()
+        played = []
+        while len(lines) < count and not board.is_done(color):
+            lines.append(list(played))
+            move = random.choice(list(board.legal_moves(color)))
+            board.make_legal_move(move)
+            played.append(move)
+            color = opposite_color[color]
+    return lines
+
+
+def time_evaluation(size, count):
+    """
+    Times both evaluations on count positions of a board of the given size.
+
+    Input: size (int), count (int)
+    Output: (float, float), microseconds per evaluation from the move trees
+    and from the material counts
+    """
+    lines = sample_positions(size, count)
+    board = Checkers(size)
+    bot = SmartBot(board, PieceColor.BLACK, PieceColor.RED, 1)
+    moves_time = counts_time = 0.0
+    for line in lines:
+        board._populate()
+        for move in line:
+            board.make_legal_move(move)
+        start = time.perf_counter()
+        old = assess_state_moves(bot, board)
+        moves_time += time.perf_counter() - start
+        start = time.perf_counter()
+        new = bot.assess_state(board)
+        counts_time += time.perf_counter() - start
+        if old != new:
+            raise AssertionError(f"evaluations differ ({old} != {new}):\n"
+                                 f"{board}")
+    return 1e6 * moves_time / count, 1e6 * counts_time / count
+
+
+def memory_usage(size, count, use_bitboard=True):
+    """
+    Measures the memory a game takes and the allocations of valid_moves on
+    count positions from random games.
+
+    Input: size (int), count (int), use_bitboard (bool)
+    Output: (int, float, float), bytes of a new Checkers, and blocks and
+    bytes allocated per valid_moves call
+    """
+    lines = sample_positions(size, count)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    board = Checkers(size, use_bitboard)
+    game_bytes = tracemalloc.get_traced_memory()[0] - before
+    blocks = allocated = 0
+    for line in lines:
+        board._populate()
+        for move in line:
+            board.make_legal_move(move)
+        color = board.get_turn()
+        start = tracemalloc.take_snapshot()
+        trees = board.valid_moves(color)
+        stats = tracemalloc.take_snapshot().compare_to(start, "filename")
+        blocks += sum(stat.count_diff for stat in stats)
+        allocated += sum(stat.size_diff for stat in stats)
+        del trees
+    tracemalloc.stop()
+    return game_bytes, blocks / count, allocated / count
+
+
+@click.command(name="benchmark")
+@click.option('--size', 'sizes', type=click.INT, multiple=True,
+              default=[3, 6], help="Board size (can be given more than once)")
+@click.option('--positions', type=click.INT, default=2000)
+@click.option('--seed', type=click.INT, default=None)
+@click.option('--memory', is_flag=True,
+              help="Measure memory instead of evaluation time")
+
+def cmd(sizes, positions, seed, memory):
+    random.seed(seed)
+    if memory:
+        for size in sizes:
+            for use_bitboard in (True, False):
+                game_bytes, blocks, allocated = memory_usage(
+                    size, min(positions, 200), use_bitboard)
+                source = "bitboard" if use_bitboard else "squares"
+                print(f"size {size} ({source}): {game_bytes} bytes per game, "
+                      f"{blocks:.1f} allocations and {allocated:.0f} bytes "
+                      f"per valid_moves call")
+        return
+    for size in sizes:
+        moves_us, counts_us = time_evaluation(size, positions)
+        print(f"size {size}: move trees {moves_us:.2f} us, "
+              f"material counts {counts_us:.2f} us per leaf "
+              f"({moves_us / counts_us:.0f}x faster, {positions} positions)")
+
+
+if __name__ == "__main__":
+    cmd()
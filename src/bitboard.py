@@ -0,0 +1,599 @@
+"""
+Bitboard position core for Checkers.
+
+The dark squares of a (2*size+2)x(2*size+2) board are encoded in Python
+integers used as bitmasks: one for black pieces, one for red pieces and one
+for kings (of either color). Square (row, col) lives at bit row*dim + col, so
+every diagonal step is a constant shift and moves for every piece of a color
+can be found with a handful of shifts and masks. Python integers have no
+fixed width, so any board size works (the GUI and TUI go up to 12, 26x26).
+
+Author: Daniel Chen
+
+Example calls:
+
+    1) Creating a position in the starting state::
+
+        position = BitBoard(3)
+        position.reset()
+
+    2) Checking whether black must jump::
+
+        position.has_jump(True)
+
+    3) Getting black's jump paths as (path, captured) pairs::
+
+        position.jump_paths(True)
+
+    4) Getting the Zobrist hash of the position (kept up to date by
+    move_piece, remove_piece, put_piece, crown, uncrown and toggle_side)::
+
+        position.hash
+
+    5) Getting the shared tables of a board size::
+
+        geometry(3).neighbors
+"""
+import random
+from collections import namedtuple
+from functools import lru_cache
+
+#direction names, in the same order Piece.move_directions lists them
+NW, NE, SE, SW = "NW", "NE", "SE", "SW"
+KING_DIRECTIONS = (NW, NE, SE, SW)
+BLACK_DIRECTIONS = (SE, SW)
+RED_DIRECTIONS = (NW, NE)
+
+#(row, col) offsets of a single diagonal step
+OFFSETS = {NW : (-1, -1), NE : (-1, +1), SE : (+1, +1), SW : (+1, -1)}
+
+#Zobrist keys are drawn from a fixed seed so that every process (and every
+#file written by one) agrees on the hash of a position
+ZOBRIST_SEED = 20230601
+
+#piece kinds, as indices into BitBoard.zobrist
+BLACK_MAN, BLACK_KING, RED_MAN, RED_KING = 0, 1, 2, 3
+
+#how many board sizes geometry keeps tables for
+GEOMETRY_CACHE_SIZE = 16
+
+#The tables of one board size, built once by geometry and shared by every
+#position and game of that size (none of them is ever modified):
+#size, dim (int) - rows of pieces, and width and height of the board
+#dark (int) - bitmask of the dark squares
+#steps (dict{str: int}) - bit shift of a single step in each direction
+#can_step, can_jump (dict{str: int}) - squares from which one (two) steps in
+#each direction stay on the board
+#black_crown_row, red_crown_row (int) - rows a man of each color is crowned on
+#black_start, red_start (int) - the pieces of each color at the start
+#dark_squares (tuple[int, ...]) - bit indices of the dark squares, in order
+#dark_number (dict{int: int}) - position of each dark square in dark_squares
+#neighbors (tuple[tuple[int | None, ...], ...]) - for each square, its
+#neighbor in each direction of KING_DIRECTIONS (None off the board)
+#jumps (dict{str: tuple[(int, int) | None, ...]}) - for each direction and
+#square, the (jumped, landing) squares of a jump that way (None off the board)
+#zobrist (tuple[tuple[int, ...], ...]), side_key (int) - Zobrist keys per
+#piece kind and square, and for red to move
+Geometry = namedtuple("Geometry", [
+    "size", "dim", "dark", "steps", "can_step", "can_jump",
+    "black_crown_row", "red_crown_row", "black_start", "red_start",
+    "dark_squares", "dark_number", "neighbors", "jumps", "zobrist",
+    "side_key"])
+
+
+def shift(mask, amount):
+    """
+    Shifts a bitmask towards higher bits by amount (lower bits if negative).
+
+    Args:
+        mask : int
+        amount : int
+
+    Returns: int
+    """
+    if amount >= 0:
+        return mask << amount
+    return mask >> -amount
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def geometry(size):
+    """
+    Returns the Geometry of a board size, built the first time it is asked
+    for and then served from a cache holding the GEOMETRY_CACHE_SIZE most
+    recently used sizes.
+
+    Args:
+        size (int) : no. of rows of pieces
+
+    Returns: Geometry
+    """
+    dim = 2*size+2
+    steps = {d: dr*dim + dc for d, (dr, dc) in OFFSETS.items()}
+    can_step = dict.fromkeys(OFFSETS, 0)
+    can_jump = dict.fromkeys(OFFSETS, 0)
+    jumps = {d: [None] * (dim*dim) for d in OFFSETS}
+    neighbors = [(None,) * len(KING_DIRECTIONS)] * (dim*dim)
+    dark = black_start = red_start = 0
+    dark_squares = []
+    for row in range(dim):
+        for col in range(dim):
+            if (row + col) % 2 == 0:
+                continue
+            index = row*dim + col
+            bit = 1 << index
+            dark |= bit
+            dark_squares.append(index)
+            if row < size:
+                black_start |= bit
+            elif row > size+1:
+                red_start |= bit
+            around = []
+            for d in KING_DIRECTIONS:
+                dr, dc = OFFSETS[d]
+                if 0 <= row+dr < dim and 0 <= col+dc < dim:
+                    can_step[d] |= bit
+                    around.append(index + steps[d])
+                else:
+                    around.append(None)
+                if 0 <= row+2*dr < dim and 0 <= col+2*dc < dim:
+                    can_jump[d] |= bit
+                    jumps[d][index] = (index + steps[d], index + 2*steps[d])
+            neighbors[index] = tuple(around)
+
+    #one random 64-bit key per piece kind and square, and one for red to
+    #move
+    rng = random.Random(ZOBRIST_SEED + dim)
+    zobrist = tuple(tuple(rng.getrandbits(64) for _ in range(dim*dim))
+                    for _ in range(4))
+    side_key = rng.getrandbits(64)
+    return Geometry(size, dim, dark, steps, can_step, can_jump,
+                    black_crown_row=((1 << dim) - 1) << ((dim-1)*dim),
+                    red_crown_row=(1 << dim) - 1,
+                    black_start=black_start, red_start=red_start,
+                    dark_squares=tuple(dark_squares),
+                    dark_number={index: number for number, index
+                                 in enumerate(dark_squares)},
+                    neighbors=tuple(neighbors),
+                    jumps={d: tuple(table) for d, table in jumps.items()},
+                    zobrist=zobrist, side_key=side_key)
+
+
+def iter_bits(mask):
+    """
+    Yields the indices of the set bits of a mask, lowest first.
+
+    Args:
+        mask : int
+
+    Returns: generator of int
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitBoard:
+    """
+    Class for representing a checkers position as bitmasks, with shift-based
+    generation of quiet moves and (multi-)jumps.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #how many rows of pieces each player starts with
+    size: int
+
+    #width and height of the board
+    dim: int
+
+    #bitmask of all black pieces
+    black: int
+
+    #bitmask of all red pieces
+    red: int
+
+    #bitmask of all kings (of both colors)
+    kings: int
+
+    #whether black is the side to move
+    black_to_move: bool
+
+    #Zobrist hash of the pieces and the side to move
+    hash: int
+
+    #shared tables of the board size
+    geometry: Geometry
+
+    def __init__(self, size):
+        """
+        Initializes an empty position, with the shared tables of its size
+        (see geometry).
+
+        Args:
+            size (int) : no. of rows of pieces
+        """
+        shapes = geometry(size)
+        self.geometry = shapes
+        self.size = size
+        self.dim = shapes.dim
+        self.black = 0
+        self.red = 0
+        self.kings = 0
+        self.black_to_move = True
+
+        #bit shift of a single step in each direction
+        self.steps = shapes.steps
+        #squares from which one step in each direction stays on the board
+        self.can_step = shapes.can_step
+        #squares from which two steps in each direction stay on the board
+        self.can_jump = shapes.can_jump
+        self.dark = shapes.dark
+        #(jumped, landing) squares of a jump in each direction
+        self.jumps = shapes.jumps
+
+        #rows a man is crowned on
+        self.black_crown_row = shapes.black_crown_row
+        self.red_crown_row = shapes.red_crown_row
+
+        self.zobrist = shapes.zobrist
+        self.side_key = shapes.side_key
+        self.rehash()
+
+    def reset(self):
+        """
+        Puts the pieces in their starting squares: black on the first size
+        rows, red on the last size rows, no kings.
+
+        Args: None
+        Returns: None
+        """
+        self.black = self.geometry.black_start
+        self.red = self.geometry.red_start
+        self.kings = 0
+        self.black_to_move = True
+        self.rehash()
+
+    def rehash(self):
+        """
+        Recomputes the Zobrist hash from scratch. Only needed after the
+        bitmasks are set directly; the move methods keep it up to date.
+
+        Args: None
+        Returns: None
+        """
+        value = 0
+        for index in iter_bits(self.black | self.red):
+            value ^= self.zobrist[self.kind(index)][index]
+        if not self.black_to_move:
+            value ^= self.side_key
+        self.hash = value
+
+    def kind(self, index):
+        """
+        Returns the kind (BLACK_MAN, BLACK_KING, RED_MAN or RED_KING) of the
+        piece on an occupied square.
+
+        Args:
+            index (int)
+        Returns: int
+        """
+        kind = BLACK_MAN if (self.black >> index) & 1 else RED_MAN
+        if (self.kings >> index) & 1:
+            kind += 1
+        return kind
+
+    def index(self, row, col):
+        """
+        Returns the bit index of a board coordinate.
+
+        Args:
+            row (int), col (int)
+        Returns: int
+        """
+        return row*self.dim + col
+
+    def coords(self, index):
+        """
+        Returns the (row, col) board coordinate of a bit index.
+
+        Args:
+            index (int)
+        Returns: (int, int)
+        """
+        return divmod(index, self.dim)
+
+    def occupied(self):
+        """
+        Returns the bitmask of all squares holding a piece.
+
+        Args: None
+        Returns: int
+        """
+        return self.black | self.red
+
+    def empty(self):
+        """
+        Returns the bitmask of all empty dark squares.
+
+        Args: None
+        Returns: int
+        """
+        return self.dark & ~(self.black | self.red)
+
+    def own(self, black):
+        """
+        Returns the pieces of a side.
+
+        Args:
+            black (bool) : True for black, False for red
+        Returns: int
+        """
+        return self.black if black else self.red
+
+    def _movers(self, black, d):
+        """
+        Returns the pieces of a side that may move in direction d: kings
+        in all directions, men only forwards.
+
+        Args:
+            black (bool), d (str)
+        Returns: int
+        """
+        own = self.own(black)
+        forward = BLACK_DIRECTIONS if black else RED_DIRECTIONS
+        if d in forward:
+            return own
+        return own & self.kings
+
+    def has_jump(self, black):
+        """
+        Returns whether any piece of a side can make a capture.
+
+        Args:
+            black (bool) : True for black, False for red
+        Returns: bool
+        """
+        opp = self.own(not black)
+        empty = self.empty()
+        for d in KING_DIRECTIONS:
+            s = self.steps[d]
+            movers = self._movers(black, d) & self.can_jump[d]
+            if shift(shift(movers, s) & opp, s) & empty:
+                return True
+        return False
+
+    def quiet_paths(self, black):
+        """
+        Returns every non-capturing move of a side, ordered by origin square
+        (row by row) and then by direction.
+
+        Args:
+            black (bool) : True for black, False for red
+
+        Returns:
+            list[(tuple[int, int], int)] : (path, captured) pairs, where the
+            path is (origin, destination) and captured is always 0
+        """
+        empty = self.empty()
+        found = []
+        for order, d in enumerate(KING_DIRECTIONS):
+            s = self.steps[d]
+            movers = self._movers(black, d) & self.can_step[d]
+            for dest in iter_bits(shift(movers, s) & empty):
+                found.append((dest - s, order, dest))
+        found.sort()
+        return [((origin, dest), 0) for origin, _, dest in found]
+
+    def iter_quiet_paths(self, black):
+        """
+        Yields every non-capturing move of a side, one direction at a time,
+        so a caller can stop as soon as it has seen enough.
+
+        Args:
+            black (bool) : True for black, False for red
+
+        Returns:
+            generator of (tuple[int, int], int) : (path, captured) pairs, as
+            in quiet_paths
+        """
+        empty = self.empty()
+        for d in KING_DIRECTIONS:
+            s = self.steps[d]
+            movers = self._movers(black, d) & self.can_step[d]
+            for dest in iter_bits(shift(movers, s) & empty):
+                yield (dest - s, dest), 0
+
+    def jump_paths(self, black):
+        """
+        Returns every complete capturing sequence of a side, ordered by origin
+        square and then depth-first by direction. Captured pieces stay on the
+        board until the sequence ends, so they can be neither jumped twice
+        nor landed on.
+
+        Args:
+            black (bool) : True for black, False for red
+
+        Returns:
+            list[(tuple[int, ...], int)] : (path, captured) pairs, where the
+            path runs from the origin through every landing square and
+            captured is the bitmask of jumped pieces
+        """
+        return list(self.iter_jump_paths(black))
+
+    def iter_jump_paths(self, black):
+        """
+        Yields every complete capturing sequence of a side, in the order of
+        jump_paths. The sequences of one piece are found together, and the
+        next piece is only looked at if the caller asks for more.
+
+        Args:
+            black (bool) : True for black, False for red
+
+        Returns:
+            generator of (tuple[int, ...], int) : (path, captured) pairs, as
+            in jump_paths
+        """
+        opp = self.own(not black)
+        empty = self.empty()
+        origins = 0
+        for d in KING_DIRECTIONS:
+            s = self.steps[d]
+            movers = self._movers(black, d) & self.can_jump[d]
+            landing = shift(shift(movers, s) & opp, s) & empty
+            origins |= shift(landing, -2*s)
+
+        for origin in iter_bits(origins):
+            paths = []
+            self._jump_recurse(origin, (origin,), 0, self.piece_directions(origin),
+                               opp, empty | (1 << origin), paths)
+            yield from paths
+
+    def piece_jump_paths(self, origin):
+        """
+        Returns every complete capturing sequence of the piece on origin.
+
+        Args:
+            origin (int) : bit index of the piece
+
+        Returns:
+            list[(tuple[int, ...], int)] : (path, captured) pairs
+        """
+        black = bool(self.black >> origin & 1)
+        paths = []
+        self._jump_recurse(origin, (origin,), 0, self.piece_directions(origin),
+                           self.own(not black), self.empty() | (1 << origin),
+                           paths)
+        return paths
+
+    def _jump_recurse(self, square, path, captured, dirs, opp, empty, paths):
+        """
+        Private method: depth-first search of capture continuations.
+
+        Args:
+            square : int (square currently on)
+            path : tuple[int, ...] (squares visited so far)
+            captured : int (pieces jumped so far)
+            dirs : tuple[str, ...] (directions of the moving piece)
+            opp : int (opponent pieces)
+            empty : int (squares that can be landed on)
+            paths : list (completed sequences are appended here)
+
+        Returns: None
+        """
+        extended = False
+        jumps = self.jumps
+        for d in dirs:
+            pair = jumps[d][square]
+            if pair is not None:
+                over, land = pair
+                if (opp >> over) & 1 and not (captured >> over) & 1 \
+                        and (empty >> land) & 1:
+                    extended = True
+                    self._jump_recurse(land, path + (land,),
+                                       captured | (1 << over), dirs, opp,
+                                       empty, paths)
+        if not extended and captured:
+            paths.append((path, captured))
+
+    def piece_directions(self, index):
+        """
+        Returns the directions the piece on a square may move in.
+
+        Args:
+            index (int) : bit index of an occupied square
+        Returns: tuple[str, ...]
+        """
+        if (self.kings >> index) & 1:
+            return KING_DIRECTIONS
+        if (self.black >> index) & 1:
+            return BLACK_DIRECTIONS
+        return RED_DIRECTIONS
+
+    def move_piece(self, origin, dest):
+        """
+        Moves the piece on origin to dest, keeping its color and rank.
+
+        Args:
+            origin (int), dest (int)
+        Returns: None
+        """
+        keys = self.zobrist[self.kind(origin)]
+        self.hash ^= keys[origin] ^ keys[dest]
+        change = (1 << origin) | (1 << dest)
+        if (self.black >> origin) & 1:
+            self.black ^= change
+        else:
+            self.red ^= change
+        if (self.kings >> origin) & 1:
+            self.kings ^= change
+
+    def remove_piece(self, index):
+        """
+        Removes whatever piece is on a square.
+
+        Args:
+            index (int)
+        Returns: None
+        """
+        if ((self.black | self.red) >> index) & 1:
+            self.hash ^= self.zobrist[self.kind(index)][index]
+        clear = ~(1 << index)
+        self.black &= clear
+        self.red &= clear
+        self.kings &= clear
+
+    def put_piece(self, index, black, king):
+        """
+        Places a piece on an empty square.
+
+        Args:
+            index (int)
+            black (bool) : True for a black piece, False for red
+            king (bool)
+        Returns: None
+        """
+        bit = 1 << index
+        if black:
+            self.black |= bit
+        else:
+            self.red |= bit
+        if king:
+            self.kings |= bit
+        self.hash ^= self.zobrist[self.kind(index)][index]
+
+    def uncrown(self, index):
+        """
+        Turns the king on a square back into a man.
+
+        Args:
+            index (int)
+        Returns: None
+        """
+        if (self.kings >> index) & 1:
+            kind = self.kind(index)
+            self.hash ^= self.zobrist[kind][index] ^ self.zobrist[kind-1][index]
+            self.kings &= ~(1 << index)
+
+    def crown(self, index):
+        """
+        Turns the piece on a square into a king.
+
+        Args:
+            index (int)
+        Returns: None
+        """
+        if not (self.kings >> index) & 1:
+            kind = self.kind(index)
+            self.hash ^= self.zobrist[kind][index] ^ self.zobrist[kind+1][index]
+            self.kings |= 1 << index
+
+    def toggle_side(self):
+        """
+        Passes the move to the other side.
+
+        Args: None
+        Returns: None
+        """
+        self.black_to_move = not self.black_to_move
+        self.hash ^= self.side_key
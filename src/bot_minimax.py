@@ -5,13 +5,53 @@ Bots for Checkers
 
 Author: Lucas Tucker
 """
+import csv
+import json
 import random
-import copy
 import math
+import time
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
 from typing import Union
 import click
 
 from checkers import Checkers, Board, Piece, Moves, Square, PieceColor
+from transposition import TranspositionTable, SharedTranspositionTable, \
+    EXACT, LOWER, UPPER, NO_MOVE
+from move_ordering import MoveOrderer
+from evaluation import Evaluator
+from tablebase import Tablebase, WIN, LOSS
+from opening_book import OpeningBook, move_code
+from game_record import GameRecord, GameRecorder, open_writer, result_of, \
+    start_snapshot
+
+# Search algorithms SmartBot can use
+SEARCHES = ("minimax", "alphabeta")
+
+# Ways SmartBot can split a search over worker processes
+PARALLEL_MODES = ("root", "lazy")
+
+# Default size of the alpha-beta transposition table, in MB
+DEFAULT_TT_MB = 16
+
+# Deepest iteration a time-budgeted search will start when given no depth
+MAX_DEPTH = 64
+
+# The clock is read once every this many nodes
+CLOCK_CHECK_NODES = 16
+
+# Score of a position the tablebase says is won right now; a win in d plies
+# scores TABLEBASE_WIN - d, far above any evaluation
+TABLEBASE_WIN = 10000
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its time budget runs out, or when it is
+    stopped (see SmartBot.stop).
+    """
 
 # Current Win Rates:
 # Depth 1: 75%
@@ -30,56 +70,548 @@ https://www.youtube.com/watch?v=STjW3eH0Cik&t=1591s
 
 class Move_Tree:
     """
-    Trees for individual move-index pairs that represent all potential game
+    Trees for individual moves that represent all potential game
     continuations, with opp_trees as the subsequent move trees for the 
-    opponent. 
+    opponent. Leaves (no opp_trees) carry the score of the board they reach.
     """
-    def __init__(self, mv, ind, opp_trees, board_state):
+    def __init__(self, mv, opp_trees, score):
         """
         Constructor with:
-        mv (Moves); ind (int); opp_trees (list[Move_Tree]);
-        board_state (Checkers)
+        mv (LegalMove); opp_trees (list[Move_Tree]);
+        score (int, or None if the tree has opp_trees)
         """
         self.move = mv
-        self.index = ind
         self.opp_trees = opp_trees
-        self.board_state = board_state
+        self.score = score
 
 class SmartBot:
     """
-    Minimax bot
+    Minimax bot. With search="alphabeta" the same minimax values are found by
+    a depth-first negamax search with alpha-beta pruning, which scores nodes
+    as it goes instead of building Move_Trees, and remembers positions it has
+    already searched in a transposition table.
     """
     _checkers: Checkers
     _color: PieceColor
 
-    def __init__(self, checkers, color, opponent_color, depth):
+    def __init__(self, checkers, color, opponent_color, depth,
+                 search="alphabeta", tt_size_mb=DEFAULT_TT_MB,
+                 tt_policy="depth", time_budget_ms=None, move_ordering=True,
+                 evaluator=None, tablebase=None, book=None, workers=None,
+                 parallel="root"):
         """ 
         Constructor that consumes checkers (Checkers object bot will use),
         color (PieceColor attribute of bot), opponent_color (PieceColor attr. of
-        opponent player), and depth (depth of bot). 
+        opponent player), depth (depth of bot), search (either "minimax"
+        or "alphabeta"), the size in MB and replacement policy of the
+        alpha-beta transposition table (a size of 0 turns it off) and an
+        optional time budget per move in milliseconds. With a time budget the
+        bot deepens one depth at a time, up to depth (or MAX_DEPTH if depth
+        is None), and plays the best move of the deepest search it finished.
+        Unless move_ordering is False, the alpha-beta search tries the most
+        promising moves first (see MoveOrderer). Positions are scored with
+        evaluator (an Evaluator, the material-only default if None), and
+        positions with few enough pieces are looked up in tablebase (a
+        Tablebase, if given) instead of being searched. While its position
+        is in book (an OpeningBook, if given) the bot plays a book move
+        without searching. With more than one worker the alpha-beta search
+        runs in that many processes: with parallel="root" the root moves are
+        split between them (see parallel_best_moves; not with a time
+        budget), with parallel="lazy" they all search the position and share
+        one transposition table (see lazy_smp_best_moves). 
 
         Input:
             checkers: Checkers
             color: PieceColor attribute
             opponent_color: PieceColor attribute
             depth: int
+            search: str
+            tt_size_mb: float
+            tt_policy: str
+            time_budget_ms: int
+            move_ordering: bool
+            evaluator: Evaluator
+            tablebase: Tablebase
+            book: OpeningBook
+            workers: int
+            parallel: str
         """
+        if search not in SEARCHES:
+            raise ValueError(f"search must be one of {SEARCHES}")
+        if time_budget_ms is not None and search != "alphabeta":
+            raise ValueError("a time budget needs the alphabeta search")
+        if parallel not in PARALLEL_MODES:
+            raise ValueError(f"parallel must be one of {PARALLEL_MODES}")
+        lazy = workers is not None and workers > 1 and parallel == "lazy"
+        if workers is not None and workers > 1 and search != "alphabeta":
+            raise ValueError("workers need the alphabeta search")
+        if workers is not None and workers > 1 and not lazy \
+                and time_budget_ms is not None:
+            raise ValueError("root splitting cannot be combined with a time "
+                             "budget")
+        if lazy and not tt_size_mb:
+            raise ValueError("the lazy parallel search needs a "
+                             "transposition table")
+        if depth is None:
+            if time_budget_ms is None:
+                raise ValueError("depth can only be None with a time budget")
+            depth = MAX_DEPTH
         self._checkers = checkers
         self._color = color
         self._depth = depth
         self._oppcolor = opponent_color
+        self._search = search
+        self._table = None
+        self._tt_size_mb = tt_size_mb
+        self._tt_policy = tt_policy
+        self._move_ordering = move_ordering
+        if lazy:
+            self._table = SharedTranspositionTable(tt_size_mb, tt_policy)
+        elif search == "alphabeta" and tt_size_mb:
+            self._table = TranspositionTable(tt_size_mb, tt_policy)
+        self._orderer = None
+        if search == "alphabeta" and move_ordering:
+            self._orderer = MoveOrderer()
+        self._time_budget_ms = time_budget_ms
+        self._deadline = None
+        self._nodes = 0
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
+        self._search_info = {}
+        self._evaluator = evaluator if evaluator is not None else Evaluator()
+        self._tablebase = tablebase
+        self._tablebase_hits = 0
+        self._book = book
+        self._workers = workers if workers is not None else 1
+        self._parallel = parallel
+        self._executor = None
+        #set to 1 to stop lazy SMP helpers (a view of shared memory)
+        self._stop = None
+        self._stop_memory = None
+        #set by stop, from another thread, to abandon the current search
+        self._cancelled = False
+        #depth of the alpha-beta iteration being searched, for progress
+        self._current_depth = None
+        #answers found by ponder: (depth, best moves) by position
+        self._pondered = {}
+        #depth the last search with a time budget reached
+        self._budget_depth = None
+        #value of the best move found by the last alpha_beta_best_moves
+        self._root_score = None
+
+    def get_table(self):
+        """
+        Returns the bot's transposition table (None if it has none), e.g. to
+        read its hit, miss and collision counters.
+
+        Output: TranspositionTable
+        """
+        return self._table
 
     def suggest_move(self):
         """
-        This method assesses all possible moves up to the depth and returns the
-        move-index pair with the optimal min max outcome. 
+        This method assesses all possible moves up to the depth and returns a
+        random move among those with the optimal min max outcome, as a
+        move-index pair (the move tree holds just the chosen line, so playing
+        it with execute_single_move_rand follows that line). 
 
         Input: depth (int)
         Output: list[Moves, int]
         """
+        return [self._checkers.to_move_tree(self.choose_move()), 0]
+
+    def choose_move(self):
+        """
+        Picks the move suggest_move plays, as a LegalMove (which can be
+        played on any board in the same position, e.g. by a BackgroundSearch).
+        Raises SearchTimeout if the search is stopped first.
+
+        Output: LegalMove
+        """
+        if self._book is not None:
+            move = self._book.choose(self._checkers)
+            if move is not None:
+                self._search_info = {"book": True}
+                return move
+        pondered = self._pondered.get(self.position_key())
+        if pondered is not None and pondered[0] >= self.ponder_depth():
+            # The opponent played a reply pondered deep enough
+            depth, best_moves = pondered
+            self._search_info = {"depth": depth, "pondered": True}
+            _, move = self.find_rand(best_moves)
+            return move
+        # How deep the previous searches already searched this position
+        reused_depth = None
+        if self._table is not None:
+            entry = self._table.probe(self._checkers.zobrist_hash())
+            if entry is not None:
+                reused_depth = entry[0]
+        if self._search == "alphabeta" and self._workers > 1 \
+                and self._parallel == "lazy":
+            best_moves = self.lazy_smp_best_moves()
+        elif self._search == "alphabeta" and self._workers > 1:
+            best_moves = self.parallel_best_moves()
+        elif self._search == "alphabeta":
+            best_moves = self.iterative_deepening()
+        else:
+            best_moves = self.minimax_best_moves()
+        if self._search == "alphabeta":
+            self._search_info["reused_depth"] = reused_depth
+        _, move = self.find_rand(best_moves)
+        return move
+
+    def iterative_deepening(self):
+        """
+        Runs the alpha-beta search at depth 0, 1, 2, ... up to the bot's
+        depth and returns the best moves of the deepest search that finished.
+        Without a time budget only the full depth is searched; with one, a
+        search that runs past the budget is abandoned (depth 0 always
+        finishes, so there is always a move). Depth reached, nodes searched
+        and nodes per second are kept for get_search_info.
+
+        Output: dict{int: list[LegalMove]}
+        """
+        start = time.perf_counter()
+        self._nodes = 0
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
+        self._tablebase_hits = 0
+        if self._orderer is not None:
+            self._orderer.new_search()
+        best_moves = {}
+        reached = None
+        if self._time_budget_ms is None:
+            self._current_depth = self._depth
+            best_moves = self.alpha_beta_best_moves(self._depth)
+            reached = self._depth
+        else:
+            for depth in range(self._depth + 1):
+                self._current_depth = depth
+                if depth > 0:
+                    self._deadline = start + self._time_budget_ms / 1000
+                try:
+                    best_moves = self.alpha_beta_best_moves(depth)
+                except SearchTimeout:
+                    if self._cancelled:
+                        raise
+                    break
+                finally:
+                    self._deadline = None
+                reached = depth
+            self._budget_depth = reached
+        elapsed = time.perf_counter() - start
+        cutoffs = self._cutoffs
+        self._search_info = {"depth": reached,
+                             "nodes": self._nodes,
+                             "time_ms": 1000 * elapsed,
+                             "nps": self._nodes / elapsed if elapsed else 0.0,
+                             "cutoffs": cutoffs,
+                             "tablebase_hits": self._tablebase_hits,
+                             "first_move_cutoff_rate":
+                                 self._first_move_cutoffs / cutoffs if cutoffs else 0.0}
+        return best_moves
+
+    def deepen(self, depth, time_budget_ms=None):
+        """
+        Generator running the alpha-beta search at depth 0, 1, 2, ... up to
+        depth, which yields (depth, score, best moves) after each depth it
+        finishes, e.g. to report on a long search as it goes. It ends early,
+        without yielding the unfinished depth, when time_budget_ms (if
+        given) runs out or the search is stopped (see stop).
+
+        Input: depth (int), time_budget_ms (int)
+        Output: generator of (int, int, dict{int: list[LegalMove]})
+        """
+        start = time.perf_counter()
+        self._nodes = 0
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
+        self._tablebase_hits = 0
+        if self._orderer is not None:
+            self._orderer.new_search()
+        for current in range(depth + 1):
+            self._current_depth = current
+            if time_budget_ms is not None:
+                self._deadline = start + time_budget_ms / 1000
+            try:
+                best_moves = self.alpha_beta_best_moves(current)
+            except SearchTimeout:
+                return
+            finally:
+                self._deadline = None
+            yield current, self._root_score, best_moves
+
+    def principal_variation(self, length):
+        """
+        Returns the line the last search expects from the bot's position:
+        the transposition table's best move there, then its best move in
+        the position that follows, and so on, up to length moves (fewer if
+        the table runs out).
+
+        Input: length (int)
+        Output: list[LegalMove]
+        """
+        board = self._checkers
+        table = self._table
+        line = []
+        if table is None:
+            return line
+        undos = []
+        color = self._color
+        while len(line) < length:
+            entry = table.probe(board.zobrist_hash())
+            if entry is None or entry[3] == NO_MOVE:
+                break
+            move = None
+            for mv in board.legal_moves(color):
+                if self.move_key(mv) == entry[3]:
+                    move = mv
+                    break
+            if move is None:
+                break
+            undos.append(board.make_legal_move(move))
+            line.append(move)
+            color = self.opposite_color(color)
+        for undo in reversed(undos):
+            board.unmake_move(undo)
+        return line
+
+    def set_color(self, color):
+        """
+        Makes the bot play color from now on (e.g. for an engine playing
+        whichever side is to move); what it has learned is kept.
+
+        Input: color (PieceColor attr.)
+        Output: None
+        """
+        self._color = color
+        self._oppcolor = self.opposite_color(color)
+
+    def ponder(self):
+        """
+        Searches on the opponent's turn (the bot's board has the opponent to
+        move): for each reply the opponent can make, most likely first (the
+        transposition table's best reply, then in MoveOrderer order), the
+        bot's answer is searched at depth 0, 1, 2, ... up to the bot's
+        depth, all replies at one depth before the next. It runs until it
+        is done or stopped (see stop). The answers are kept for choose_move,
+        which plays one at once if the opponent makes a reply pondered to
+        ponder_depth; otherwise its search still finds the transposition
+        table filled.
+
+        Output: None
+        """
+        board = self._checkers
+        self._pondered = {}
+        if self._search != "alphabeta":
+            return
+        table = self._table
+        tt_move = NO_MOVE
+        if table is not None:
+            entry = table.probe(board.zobrist_hash())
+            if entry is not None:
+                tt_move = entry[3]
+        replies = list(self.ordered_moves(
+            board, board.legal_moves(self._oppcolor), 0, tt_move))
+        if self._orderer is not None:
+            self._orderer.new_search()
+        try:
+            for depth in range(self._depth + 1):
+                self._current_depth = depth
+                for reply in replies:
+                    undo = board.make_legal_move(reply)
+                    try:
+                        best_moves = self.alpha_beta_best_moves(depth)
+                        if best_moves:
+                            self._pondered[self.position_key()] = \
+                                (depth, best_moves)
+                    finally:
+                        board.unmake_move(undo)
+        except SearchTimeout:
+            pass
+
+    def ponder_depth(self):
+        """
+        Returns how deep a pondered answer must have been searched for
+        choose_move to play it without a search: the bot's depth or, with a
+        time budget, the depth its last search reached within the budget.
+
+        Output: int (math.inf with a time budget but no search yet, as no
+        pondered answer is played before one)
+        """
+        if self._time_budget_ms is None:
+            return self._depth
+        if self._budget_depth is None:
+            return math.inf
+        return self._budget_depth
+
+    def position_key(self):
+        """
+        Returns the pieces of the bot's board as a key of pondered
+        answers.
+
+        Output: (int, int, int), the black, red and kings bitmasks
+        """
+        position = self._checkers.get_position()
+        return position.black, position.red, position.kings
+
+    def parallel_best_moves(self):
+        """
+        Searches every root move to the bot's depth, each in one of the
+        bot's worker processes, and returns the moves with the best min max
+        value, grouped by starting square (the same moves
+        alpha_beta_best_moves finds). The workers get the position as a
+        Snapshot and search it with a full window, so every root move gets
+        its exact value. Each worker keeps its own board, bot and
+        transposition table from one move to the next.
+
+        Output: dict{int: list[LegalMove]}
+        """
+        start = time.perf_counter()
+        board = self._checkers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._workers)
+        snapshot = board.snapshot()
+        tablebase_path = None
+        if self._tablebase is not None:
+            tablebase_path = self._tablebase.path
+        settings = (snapshot.size, self._color.name, self._depth,
+                    self._tt_size_mb, self._tt_policy, self._move_ordering,
+                    tuple(self._evaluator.weights), tablebase_path)
+        possible_mvs = list(board.legal_moves(self._color))
+        futures = [self._executor.submit(_score_root_move, settings, snapshot,
+                                         mv)
+                   for mv in possible_mvs]
+        self._current_depth = self._depth
+        best = -math.inf
+        best_moves = {}
+        nodes = 0
+        for mv, future in zip(possible_mvs, futures):
+            if self._cancelled:
+                for pending in futures:
+                    pending.cancel()
+                raise SearchTimeout
+            cur, searched = future.result()
+            nodes += searched
+            if cur > best:
+                best_moves = {}
+                best = cur
+            if cur == best:
+                if not(mv.origin in best_moves):
+                    best_moves[mv.origin] = []
+                best_moves[mv.origin].append(mv)
+        elapsed = time.perf_counter() - start
+        self._search_info = {"depth": self._depth,
+                             "nodes": nodes,
+                             "time_ms": 1000 * elapsed,
+                             "nps": nodes / elapsed if elapsed else 0.0,
+                             "workers": self._workers}
+        return best_moves
+
+    def lazy_smp_best_moves(self):
+        """
+        Lazy SMP search: the bot searches as iterative_deepening does while
+        workers - 1 helper processes search the same position, iterating
+        over the depths from a staggered start (every other helper one
+        ply ahead) until the bot is done. All of them read and write the
+        bot's shared transposition table, so the bot finds much of its tree
+        already searched and well ordered. The bot's own result is returned
+        and the helpers are then stopped.
+
+        Output: dict{int: list[LegalMove]}
+        """
+        board = self._checkers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._workers - 1)
+            self._stop_memory = shared_memory.SharedMemory(create=True, size=1)
+            self._stop = self._stop_memory.buf
+        self._stop[0] = 0
+        tablebase_path = None
+        if self._tablebase is not None:
+            tablebase_path = self._tablebase.path
+        snapshot = board.snapshot()
+        settings = (snapshot.size, self._color.name, self._depth,
+                    self._table.name, self._stop_memory.name, self._tt_policy,
+                    self._move_ordering, tuple(self._evaluator.weights),
+                    tablebase_path)
+        helpers = [self._executor.submit(_lazy_smp_helper, settings, snapshot,
+                                         helper)
+                   for helper in range(1, self._workers)]
+        try:
+            best_moves = self.iterative_deepening()
+        finally:
+            self._stop[0] = 1
+            helper_nodes = sum(helper.result() for helper in helpers)
+        self._search_info["workers"] = self._workers
+        self._search_info["helper_nodes"] = helper_nodes
+        return best_moves
+
+    def close(self):
+        """
+        Shuts down the bot's worker processes, if it started any, and frees
+        the shared memory of the lazy parallel search (the bot is not used
+        after that).
+
+        Output: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._stop_memory is not None:
+            self._stop.release()
+            self._stop_memory.close()
+            self._stop_memory.unlink()
+            self._stop = self._stop_memory = None
+        if isinstance(self._table, SharedTranspositionTable):
+            self._table.close()
+            self._table = None
+
+    def stop(self):
+        """
+        Stops a search running in another thread (e.g. a BackgroundSearch):
+        it raises SearchTimeout at its next clock check. The next search
+        started with a BackgroundSearch runs normally again.
+
+        Output: None
+        """
+        self._cancelled = True
+
+    def progress(self):
+        """
+        Returns how far a search running in another thread has got: depth
+        (the alpha-beta depth being searched, None before the first one)
+        and nodes (moves played so far by this process).
+
+        Output: dict{str: int | None}
+        """
+        return {"depth": self._current_depth, "nodes": self._nodes}
+
+    def get_search_info(self):
+        """
+        Returns statistics of the last alpha-beta search: depth (deepest
+        finished depth), nodes (moves played), time_ms, nps (nodes per
+        second), cutoffs (nodes cut off by alpha-beta),
+        first_move_cutoff_rate (share of those where the first move searched
+        caused the cutoff, which measures the move ordering) and
+        reused_depth (the depth the transposition table already held the
+        position at, from earlier searches, or None). A move from the book
+        or from pondering gives {"book": True} or {"depth", "pondered"}
+        instead.
+
+        Output: dict{str: int | float}
+        """
+        return self._search_info
+
+    def minimax_best_moves(self):
+        """
+        Builds the full Move_Tree for every move up to the depth and returns
+        the moves with the best min max value, grouped by starting square.
+
+        Output: dict{int: list[LegalMove]}
+        """
         # Get possible moves for this color
         depth = self._depth
-        possible_mvs = self.non_empties(self._checkers.valid_moves(self._color))
+        possible_mvs = list(self._checkers.legal_moves(self._color))
         # Use get_trees to get list of trees corresponding to move continuations
         tree_list = self.get_trees(possible_mvs, self._color, depth, self._checkers)
         best = -math.inf
@@ -88,28 +620,222 @@ class SmartBot:
         for tree in tree_list:
             cur = self.get_minmax(tree, opp=True)
             # Find tree with best minmax value
-            if cur >= best:
-                if not(tree.move in best_moves):
-                    best_moves[tree.move] = []
+            if cur > best:
+                best_moves = {}
                 best = cur
-                best_moves[tree.move].append(tree.index)
-        return self.find_rand(best_moves)
-    
+            if cur == best:
+                if not(tree.move.origin in best_moves):
+                    best_moves[tree.move.origin] = []
+                best_moves[tree.move.origin].append(tree.move)
+        return best_moves
+
+    def alpha_beta_best_moves(self, depth):
+        """
+        Searches every move up to depth with negamax and alpha-beta
+        pruning and returns the moves with the best min max value, grouped by
+        starting square (without a transposition table, the same moves
+        minimax_best_moves finds). Each root move is searched with a window
+        just below the best value so far, so moves that tie it get their
+        exact value while worse ones are cut off early.
+
+        Input: depth (int)
+        Output: dict{int: list[LegalMove]}
+        """
+        board = self._checkers
+        table = self._table
+        if table is not None:
+            table.new_search()
+        possible_mvs = list(board.legal_moves(self._color))
+        tt_move = NO_MOVE
+        if table is not None:
+            entry = table.probe(board.zobrist_hash())
+            if entry is not None:
+                tt_move = entry[3]
+        best = -math.inf
+        best_moves = {}
+        best_key = NO_MOVE
+        ordered = self.ordered_moves(board, possible_mvs, 0, tt_move)
+        for mv in ordered:
+            cur = self.score_move(board, mv, self._color, depth,
+                                  best - 1, math.inf, 0)
+            if cur > best:
+                best_moves = {}
+                best = cur
+                best_key = self.move_key(mv)
+            if cur == best:
+                if not(mv.origin in best_moves):
+                    best_moves[mv.origin] = []
+                best_moves[mv.origin].append(mv)
+        if table is not None and best_moves:
+            # Lets the next, deeper iteration try this move first
+            table.store(board.zobrist_hash(), depth, EXACT, best, best_key)
+        self._root_score = best
+        return best_moves
+
+    def ordered_moves(self, board, mvs, ply, tt_move):
+        """
+        Given a board, the moves of the side to move, the ply and the
+        transposition table's best move, this method returns the moves in the
+        order the MoveOrderer suggests (or unchanged without one).
+
+        Input: board (Checkers), mvs (iterable of LegalMove), ply (int),
+        tt_move (int)
+        Output: iterable of LegalMove
+        """
+        if self._orderer is None:
+            return mvs
+        return self._orderer.order(board, list(mvs), ply, tt_move,
+                                   self.move_key)
+
+    def negamax(self, board, color, depth, alpha, beta, ply):
+        """
+        Given a board, the color to move, the remaining depth and an
+        alpha-beta window, this method returns the min max value of the board
+        from the standpoint of color (the position is assessed if color
+        cannot move). The value is exact if it falls inside (alpha, beta);
+        otherwise it is a bound on the side of the window it falls.
+
+        Input: board (Checkers), color (PieceColor attr.), depth (int),
+        alpha (int), beta (int), ply (int, distance from the root)
+        Output: int
+        """
+        table = self._table
+        tt_move = NO_MOVE
+        if table is not None:
+            key = board.zobrist_hash()
+            entry = table.probe(key)
+            if entry is not None:
+                entry_depth, bound, score, tt_move = entry
+                if entry_depth >= depth and (bound == EXACT
+                        or (bound == LOWER and score >= beta)
+                        or (bound == UPPER and score <= alpha)):
+                    return score
+
+        alpha_orig = alpha
+        best = -math.inf
+        best_move = NO_MOVE
+        searched = 0
+        ordered = self.ordered_moves(board, board.legal_moves(color), ply,
+                                     tt_move)
+        for mv in ordered:
+            score = self.score_move(board, mv, color, depth, alpha, beta, ply)
+            searched += 1
+            if score > best:
+                best = score
+                best_move = self.move_key(mv)
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        # Opponent will never allow this line
+                        self._cutoffs += 1
+                        if searched == 1:
+                            self._first_move_cutoffs += 1
+                        if self._orderer is not None:
+                            self._orderer.record_cutoff(best_move,
+                                                        not mv.captured, ply,
+                                                        depth)
+                        break
+        if not searched:
+            # color cannot move
+            return self.evaluate(board, color)
+
+        if table is not None:
+            if best <= alpha_orig:
+                bound = UPPER
+            elif best >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, depth, bound, best, best_move)
+        return best
+
+    def score_move(self, board, mv, color, depth, alpha, beta, ply):
+        """
+        Plays a move for color, scores the resulting board from the
+        standpoint of color (the position is assessed if depth is used up or
+        the opponent cannot move) and takes the move back.
+
+        Input: board (Checkers), mv (LegalMove), color (PieceColor attr.),
+        depth (int), alpha (int), beta (int), ply (int)
+        Output: int
+        """
+        self._nodes += 1
+        if not self._nodes % CLOCK_CHECK_NODES:
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchTimeout
+            if self._stop is not None and self._stop[0]:
+                raise SearchTimeout
+            if self._cancelled:
+                raise SearchTimeout
+        undo = board.make_legal_move(mv)
+        try:
+            tablebase = self._tablebase
+            if tablebase is not None and tablebase.covers(board.get_position()):
+                score = -self.tablebase_score(board)
+            elif depth > 0:
+                score = -self.negamax(board, self.opposite_color(color),
+                                      depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = self.evaluate(board, color)
+        finally:
+            # The board is put back even when the search is abandoned
+            board.unmake_move(undo)
+        return score
+
+    def tablebase_score(self, board):
+        """
+        Given a board in the bot's tablebase, this method returns its score
+        from the standpoint of the color to move: the sooner a win the
+        higher, the later a loss the higher, 0 for a draw.
+
+        Input: board (Checkers)
+        Output: int
+        """
+        self._tablebase_hits += 1
+        result, distance = self._tablebase.probe(board.get_position())
+        if result == WIN:
+            return TABLEBASE_WIN - distance
+        if result == LOSS:
+            return distance - TABLEBASE_WIN
+        return 0
+
+    def evaluate(self, board, color):
+        """
+        Given a board and a color, this method returns assess_state from the
+        standpoint of that color.
+
+        Input: board (Checkers), color (PieceColor attr.)
+        Output: int
+        """
+        score = self.assess_state(board)
+        if color != self._color:
+            return -score
+        return score
+
+    def move_key(self, mv):
+        """
+        Given a move, this method returns an integer naming it by all the
+        squares it visits (see move_code), for the transposition table.
+
+        Input: mv (LegalMove)
+        Output: int
+        """
+        return move_code(mv, self._checkers.get_board_dim())
+
     def find_rand(self, move_dict):
         """ 
-        Given a dictionary which maps Moves to lists of child indices, this
-        method returns a random Move-index list corresponding to one move on
-        the board. 
+        Given a dictionary which maps starting squares to lists of moves, this
+        method returns a random starting square and one of its moves. 
 
         Input:
-            move_dict: dict{Moves: list[int]}
+            move_dict: dict{int: list[LegalMove]}
         
         Returns:
-            list[Moves, int]
+            list[int, LegalMove]
         """
-        rand_mv = random.choice(list(move_dict.items()))[0]
-        rand_child = random.choice(move_dict[rand_mv])
-        return [rand_mv, rand_child]
+        rand_start = random.choice(list(move_dict.items()))[0]
+        rand_move = random.choice(move_dict[rand_start])
+        return [rand_start, rand_move]
    
     def get_minmax(self, tree, opp):
         """
@@ -119,9 +845,9 @@ class SmartBot:
         Input: tree (Move_Tree), opp (bool)
         Output: min_max (int)
         """
-       # Base case is that tree has no children, so we assess state here
+       # Base case is that tree has no children, so its state was assessed
         if not(tree.opp_trees):
-            return self.assess_state(tree.board_state)
+            return tree.score
         if not(opp):
             min_max = -math.inf
             for subtree in tree.opp_trees:
@@ -140,41 +866,23 @@ class SmartBot:
 
     def assess_state(self, board):
         """
-        Given a board, this method returns an assessment (int) of 
-        the board from the standpoint of king and piece counts. 
+        Given a board, this method returns the bot's evaluator's assessment
+        (int) of the board from the bot's standpoint. 
 
         Input: board (Checkers)
         Output: int
         """
-        opp_color = self._oppcolor
-        # valid_moves returns Moves objects for each piece of the given color
-        opp_mvs = board.valid_moves(opp_color)
-        mvs = board.valid_moves(self._color)
-        king_dif = self.king_tally(mvs) - self.king_tally(opp_mvs)
-        pieces_dif = 2 * (len(mvs) - len(opp_mvs))
-        return king_dif + pieces_dif
-
-    def king_tally(self, mvs):
-        """
-        Given a list of move objects, this method returns the total number which
-        correspond to king pieces.
-
-        Input: mvs (list[Moves])
-        Output: int
-        """
-        tally = 0
-        for mv in mvs:
-            if mv.location.piece.is_king:
-                tally += 1
-        return tally
+        return self._evaluator.evaluate(board, self._color)
 
     def get_trees(self, mvs, color, depth, board):
         """
         Given a list of possible moves, a color, depth, and board, this method
-        returns a tree list (one tree per move-index pair of the mvs list)
-        corresponding to potential game continuations.
+        returns a tree list (one tree per move of the mvs list)
+        corresponding to potential game continuations. Each move is played on
+        the board with make_legal_move and taken back with unmake_move, so the
+        board is left as it was found.
         
-        Input: mvs (list[Moves]), color (PieceColor.color), depth (int),
+        Input: mvs (list[LegalMove]), color (PieceColor.color), depth (int),
         board (Checkers)
 
         Output: list[Move_Tree]
@@ -182,50 +890,21 @@ class SmartBot:
         opp_color = self.opposite_color(color)
         tree_list = []
         for mv in mvs:
-            for ind, child in enumerate(mv.children):
-                new_state = self.simulate_move(board, mv, ind, color)
-                if depth == 0:
-                    tree_list.append(Move_Tree(mv, ind, [], new_state))
-                else:
-                    # Get all opponent's potential moves in this new state
-                    opp_mvs = self.non_empties(new_state.valid_moves(opp_color))
-                    # Recursive call to make tree list for this move/ind's tree
-                    opp_trees = self.get_trees(opp_mvs, opp_color, depth - 1, new_state)
-                    tree_list.append(Move_Tree(mv, ind, opp_trees, new_state))
+            undo = board.make_legal_move(mv)
+            if depth == 0:
+                tree_list.append(Move_Tree(mv, [], self.assess_state(board)))
+            else:
+                # Get all opponent's potential moves in this new state
+                opp_mvs = list(board.legal_moves(opp_color))
+                # Recursive call to make tree list for this move's tree
+                opp_trees = self.get_trees(opp_mvs, opp_color, depth - 1, board)
+                score = None
+                if not opp_trees:
+                    score = self.assess_state(board)
+                tree_list.append(Move_Tree(mv, opp_trees, score))
+            board.unmake_move(undo)
         return tree_list
     
-    def simulate_move(self, board, mv, ind, color):
-        """
-        Given a board, move, index, and color, this method returns a new board
-        state (a Checkers object) corresponding to if that move-index were to be 
-        played.
-
-        Input: board (Checkers); mv (Moves); ind (int); color (PieceColor attr.)
-        Output: new_state (Checkers)
-        """
-        new_state = copy.deepcopy(board)
-        # Note that the Moves object inserted into execute_single_move_rand 
-        # needs to be a Moves object that belongs to the copied board
-        mv_copy = self.copy_move_select(mv, new_state, color)
-        new_state.execute_single_move_rand(mv_copy, ind)
-        return new_state
-
-    def copy_move_select(self, mv, copied_state, color):
-        """
-        Given a copied board, a Moves object, and a color, this method returns
-        the equivalent Moves object in the copied board. 
-
-        Input: mv (Moves); copied_state (Checkers); color (PieceColor attribute)
-        Output: cp (Moves)
-        """
-        row = mv.location.row
-        col = mv.location.col
-        copy_mvs = self.non_empties(copied_state.valid_moves(color))
-        for cp in copy_mvs:
-            # Find equivalent Moves object
-            if cp.location.row == row and cp.location.col == col:
-                return cp
-    
     def opposite_color(self, color):
         """
         Given a PieceColor Enum object, this method returns that of the opposite
@@ -238,19 +917,200 @@ class SmartBot:
             return PieceColor.BLACK
         return PieceColor.RED
 
-    def non_empties(self, mvs):
+# SmartBots of a parallel_best_moves worker process, by their settings
+_root_bots = {}
+
+
+def _score_root_move(settings, snapshot, mv):
+    """
+    Scores one root move in a parallel_best_moves worker: sets up the
+    snapshot on the worker's board for these settings and scores the move
+    with a full alpha-beta window.
+
+    Input:
+        settings: tuple, (board size, color name, depth, tt_size_mb,
+        tt_policy, move_ordering, evaluator weights, tablebase path)
+        snapshot: Snapshot
+        mv: LegalMove
+    Returns: (int, int), the score and the number of nodes searched
+    """
+    bot = _root_bots.get(settings)
+    if bot is None:
+        size, color, depth, tt_size_mb, tt_policy, move_ordering, weights, \
+            tablebase_path = settings
+        color = PieceColor[color]
+        opp = PieceColor.BLACK if color == PieceColor.RED else PieceColor.RED
+        tablebase = None
+        if tablebase_path is not None:
+            tablebase = Tablebase(tablebase_path)
+        bot = SmartBot(Checkers(size), color, opp, depth,
+                       tt_size_mb=tt_size_mb, tt_policy=tt_policy,
+                       move_ordering=move_ordering,
+                       evaluator=Evaluator(list(weights)),
+                       tablebase=tablebase)
+        _root_bots[settings] = bot
+    board = bot._checkers
+    board.restore(snapshot)
+    if bot._table is not None:
+        bot._table.new_search()
+    if bot._orderer is not None:
+        bot._orderer.new_search()
+    bot._nodes = 0
+    score = bot.score_move(board, mv, bot._color, bot._depth, -math.inf,
+                           math.inf, 0)
+    return score, bot._nodes
+
+
+# SmartBots of a lazy SMP helper process, by their settings
+_helper_bots = {}
+
+
+def _lazy_smp_helper(settings, snapshot, helper):
+    """
+    Runs one lazy SMP helper: sets up the snapshot on the helper's board for
+    these settings and searches it at depth 1 + helper % 2, then one depth
+    deeper each time, up to one past the bot's depth, until the stop flag
+    is set. Its results only reach the bot through the shared table.
+
+    Input:
+        settings: tuple, (board size, color name, depth, shared table name,
+        stop flag name, tt_policy, move_ordering, evaluator weights,
+        tablebase path)
+        snapshot: Snapshot
+        helper: int, the helper's number (from 1)
+    Returns: int, the number of nodes searched
+    """
+    bot = _helper_bots.get(settings)
+    if bot is None:
+        size, color, depth, table_name, stop_name, tt_policy, move_ordering, \
+            weights, tablebase_path = settings
+        color = PieceColor[color]
+        opp = PieceColor.BLACK if color == PieceColor.RED else PieceColor.RED
+        tablebase = None
+        if tablebase_path is not None:
+            tablebase = Tablebase(tablebase_path)
+        bot = SmartBot(Checkers(size), color, opp, depth, tt_size_mb=0,
+                       move_ordering=move_ordering,
+                       evaluator=Evaluator(list(weights)),
+                       tablebase=tablebase)
+        bot._table = SharedTranspositionTable(policy=tt_policy,
+                                              name=table_name)
+        bot._stop_memory = shared_memory.SharedMemory(name=stop_name)
+        bot._stop = bot._stop_memory.buf
+        _helper_bots[settings] = bot
+    bot._checkers.restore(snapshot)
+    if bot._orderer is not None:
+        bot._orderer.new_search()
+    bot._nodes = 0
+    last = min(bot._depth + 1, MAX_DEPTH)
+    try:
+        for depth in range(1 + helper % 2, last + 1):
+            if bot._stop[0]:
+                break
+            bot.alpha_beta_best_moves(depth)
+    except SearchTimeout:
+        pass
+    return bot._nodes
+
+
+class BackgroundSearch:
+    """
+    A SmartBot choosing a move in a background thread, so that the caller
+    (e.g. the GUI loop) keeps running while the bot thinks. The bot searches
+    its own board, set up from a snapshot of the game, and the move it
+    chooses is then played on the game by the caller.
+    """
+    bot: SmartBot
+    future: Future
+    started: float
+
+    def __init__(self, bot, snapshot):
         """
-        Given a list of Moves objects, each corresponding to a piece of the
-        bot's color, this method returns a new list of those Moves objects with
-        nonempty children (to yield playable moves). 
+        Starts the search.
 
-        Returns: list[Moves]
+        Input:
+            bot: SmartBot, with a board of its own (not the game's)
+            snapshot: Snapshot, the position to choose a move in
         """
-        non_empty_lst = []
-        for mv in mvs:
-            if mv.children:
-                non_empty_lst.append(mv)
-        return non_empty_lst
+        self.bot = bot
+        self.started = time.perf_counter()
+        bot._cancelled = False
+        bot._current_depth = None
+        bot._nodes = 0
+        executor = ThreadPoolExecutor(1)
+        self.future = executor.submit(self._run, snapshot)
+        #the thread exits once the search is done
+        executor.shutdown(wait=False)
+
+    def _run(self, snapshot):
+        """
+        Private method: sets up snapshot on the bot's board and returns the
+        move the bot chooses (runs in the background thread).
+        """
+        self.bot._checkers.restore(snapshot)
+        return self.bot.choose_move()
+
+    def done(self):
+        """
+        Returns whether the search has finished (or was stopped).
+
+        Output: bool
+        """
+        return self.future.done()
+
+    def result(self):
+        """
+        Returns the move the bot chose, waiting for it if need be. Raises
+        SearchTimeout if the search was cancelled before it finished.
+
+        Output: LegalMove
+        """
+        return self.future.result()
+
+    def elapsed(self):
+        """
+        Returns the seconds since the search started.
+
+        Output: float
+        """
+        return time.perf_counter() - self.started
+
+    def progress(self):
+        """
+        Returns the depth and nodes the search has reached (see
+        SmartBot.progress).
+
+        Output: dict{str: int | None}
+        """
+        return self.bot.progress()
+
+    def cancel(self):
+        """
+        Stops the search and waits for its thread to let go of the bot, so
+        the bot can be used or closed afterwards.
+
+        Output: None
+        """
+        self.bot.stop()
+        wait([self.future])
+
+
+class PonderSearch(BackgroundSearch):
+    """
+    A SmartBot pondering (see SmartBot.ponder) in a background thread during
+    its opponent's turn, from a snapshot with the opponent to move. Cancel
+    it once the opponent has moved, before the bot chooses its move; result
+    is None.
+    """
+
+    def _run(self, snapshot):
+        """
+        Private method: sets up snapshot on the bot's board and ponders
+        (runs in the background thread).
+        """
+        self.bot._checkers.restore(snapshot)
+        self.bot.ponder()
+
 
 class RandomBot:
     """
@@ -336,25 +1196,120 @@ class BotPlayer:
     wins: int
 
     def __init__(self, name: str, board: Checkers, color: PieceColor,
-                 opponent_color: PieceColor, depth):
+                 opponent_color: PieceColor, depth, tablebase=None,
+                 book=None, search_workers=None):
         """ Constructor
         Input:
             name: Name of the bot
             board: Board to play on
             color: Bot's color
             opponent_color: Opponent's color
+            tablebase: Tablebase for a smart bot, or None
+            book: OpeningBook for a smart bot, or None
+            search_workers: Processes a smart bot searches each move with
+            (lazy SMP), or None for one
         """
         self.name = name
 
         if self.name == "random":
             self.bot = RandomBot(board, color)
         elif self.name == "smart":
-            self.bot = SmartBot(board, color, opponent_color, depth)
+            self.bot = SmartBot(board, color, opponent_color, depth,
+                                tablebase=tablebase, book=book,
+                                workers=search_workers, parallel="lazy")
         self.color = color
         self.wins = 0
 
 
-def simulate(game: Checkers, n: int, bots) -> None:
+# Why a simulated game ended: the side to move (or its opponent) had no
+# moves left, or 80 moves in a row took no piece
+NO_MOVES = "no-moves"
+MOVE_LIMIT = "move-limit"
+
+# Outcome of one simulated game:
+# winner (PieceColor or None) - None for a draw
+# plies (int) - moves played
+# termination (str) - NO_MOVES or MOVE_LIMIT
+# time_s (float) - wall time of the game in seconds
+# moves (tuple or None) - the moves played as paths of bit indices, if the
+# game was recorded (see game_record)
+GameResult = namedtuple("GameResult", ["winner", "plies", "termination",
+                                       "time_s", "moves"],
+                        defaults=(None,))
+
+# Fields of the per-game records cmd writes
+RECORD_FIELDS = ["game", "board_size", "red_player", "red_depth",
+                 "black_player", "black_depth", "winner", "plies",
+                 "termination", "time_s"]
+
+
+def play_game(game: Checkers, bots, record=False) -> GameResult:
+    """
+    Plays one game between the Bots specified by bots, from the starting
+    position (black moves first).
+
+    Input:
+        game: The board on which to play
+        bots: Dictionary mapping piece colors to Player objects
+        record: Whether to keep the moves played in the result
+    Returns: GameResult
+    """
+    start = time.perf_counter()
+    game._populate()
+    recorder = GameRecorder(game) if record else None
+    plies = 0
+    while (not game.is_done(PieceColor.RED)) and (not game.is_done(PieceColor.BLACK)):
+        # Get the move of the bot whose turn it is and play it
+        current = bots[game.get_turn()]
+        move, index = current.bot.suggest_move()
+        game.execute_single_move_rand(move, index)
+        if recorder is not None:
+            recorder.observe()
+        plies += 1
+
+    termination = NO_MOVES
+    if game.consecutive_non_jump_moves >= 80:
+        termination = MOVE_LIMIT
+    # Get the winner from the Checkers object
+    moves = tuple(recorder.moves) if recorder is not None else None
+    return GameResult(game._winner, plies, termination,
+                      time.perf_counter() - start, moves)
+
+
+def player_tag(name, depth):
+    """
+    Names a bot for a game record: "random", or "smart" and its depth.
+
+    Input: name (str), depth (int)
+    Output: str
+    """
+    if name == "smart":
+        return f"smart {depth}"
+    return name
+
+
+def result_game_record(index, result, board_size, players, depths):
+    """
+    Turns the result of a recorded game into a GameRecord (see game_record)
+    tagged with the players and how the game ended.
+
+    Input:
+        index: The game's number
+        result: GameResult, with its moves
+        board_size, players, depths: as for simulate_parallel
+    Returns: GameRecord
+    """
+    tags = {"Event": "bot_minimax simulation",
+            "Round": str(index + 1),
+            "Black": player_tag(players[PieceColor.BLACK],
+                                depths[PieceColor.BLACK]),
+            "Red": player_tag(players[PieceColor.RED], depths[PieceColor.RED]),
+            "Termination": result.termination}
+    return GameRecord(tags, start_snapshot(board_size), result.moves,
+                      result_of(result.winner))
+
+
+def simulate(game: Checkers, n: int, bots, writer=None) -> None:
     """ 
     Simulates n games between the Bots specified by bots. Number of wins are 
     updated in the BotPlayer objects within bots.  
@@ -364,76 +1319,248 @@ def simulate(game: Checkers, n: int, bots) -> None:
         n: The number of games to play
         bots: Dictionary mapping piece colors to Player objects (the bots that 
         will play one another)
-        dim: Board is of dimensions (2*(dim) + 2) x (2*(dim) + 2)
+        writer: Optional game_record writer (see open_writer) every game is
+        appended to as it finishes
     Returns: None
     """
+    board_size = (game.get_board_dim() - 2) // 2
+    players = {color: player.name for color, player in bots.items()}
+    depths = {color: getattr(player.bot, "_depth", None)
+              for color, player in bots.items()}
     for i in range(n):
-        game._populate()
-        current = bots[PieceColor.RED]
-        while (not game.is_done(PieceColor.RED)) and (not game.is_done(PieceColor.BLACK)):
-            # Get corresponding bot's move to play
-            move, index = current.bot.suggest_move()
-            game.execute_single_move_rand(move, index)
-
-            # Alternate turns by switching bots
-            if current.color == PieceColor.BLACK:
-                current = bots[PieceColor.RED]
-            elif current.color == PieceColor.RED:
-                current = bots[PieceColor.BLACK]
-        
-        # Get the winner from the Checkers object
-        winner = game._winner
+        result = play_game(game, bots, record=writer is not None)
+        if writer is not None:
+            writer.write(result_game_record(i, result, board_size, players,
+                                            depths))
+        winner = result.winner
         if winner is not None:
             bots[winner].wins += 1
 
 
+# Board and bots of a simulate_parallel worker process
+_worker_game = None
+_worker_bots = None
+
+
+def _init_worker(board_size, players, depths, tablebase_path=None,
+                 book_path=None, search_workers=None):
+    """
+    Sets up the board and bots a simulate_parallel worker plays all its games
+    with.
+
+    Input:
+        board_size: Board is of dimensions (2*(board_size) + 2) squared
+        players: dict{PieceColor: str}, "random" or "smart" for each color
+        depths: dict{PieceColor: int}, search depth for each color
+        tablebase_path: Tablebase file for the smart bots, or None (the
+        file is mapped into memory, so the workers share it)
+        book_path: OpeningBook file for the smart bots, or None
+        search_workers: Processes each smart bot searches with, or None
+    Returns: None
+    """
+    global _worker_game, _worker_bots
+    _worker_game = Checkers(board_size)
+    tablebase = None
+    if tablebase_path is not None:
+        tablebase = Tablebase(tablebase_path)
+    book = None
+    if book_path is not None:
+        book = OpeningBook(book_path)
+    _worker_bots = {}
+    for color in (PieceColor.RED, PieceColor.BLACK):
+        opp = PieceColor.BLACK if color == PieceColor.RED else PieceColor.RED
+        _worker_bots[color] = BotPlayer(players[color], _worker_game, color,
+                                        opp, depths[color], tablebase, book,
+                                        search_workers)
+
+
+def _play_seeded_game(task):
+    """
+    Plays game number index in a worker, after seeding the worker's random
+    number generator for that game.
+
+    Input:
+        task: (int, int or None, bool), the game's index, the simulation's
+        seed and whether to record the moves
+    Returns: (int, tuple), the index and the GameResult as a plain tuple
+    (the winner given by color name)
+    """
+    index, seed, record = task
+    random.seed(None if seed is None else f"{seed}:{index}")
+    result = play_game(_worker_game, _worker_bots, record)
+    winner = None if result.winner is None else result.winner.name
+    return index, tuple(result._replace(winner=winner))
+
+
+def simulate_parallel(board_size: int, n: int, players, depths,
+                      workers: int, seed=None, tablebase_path=None,
+                      book_path=None, search_workers=None,
+                      record_games=False):
+    """
+    Plays n games between the bots described by players and depths on a
+    pool of worker processes and yields each result as its game finishes
+    (in no particular order). Every worker has its own board and bots, and
+    every game its own random seed, derived from seed and the game's index,
+    so a run with a seed gives the same results whatever the number of
+    workers. With one worker the games are played in this process, and
+    only then can each smart bot search with several processes of its own
+    (search_workers; the pool's worker processes cannot start any).
+
+    Input:
+        board_size: Board is of dimensions (2*(board_size) + 2) squared
+        n: The number of games to play
+        players: dict{PieceColor: str}, "random" or "smart" for each color
+        depths: dict{PieceColor: int}, search depth for each color
+        workers: Number of processes to play on
+        seed: Seed for the games (None for unrepeatable games)
+        tablebase_path: Tablebase file for the smart bots, or None
+        book_path: OpeningBook file for the smart bots, or None
+        search_workers: Processes each smart bot searches with, or None
+        record_games: Whether the results carry the moves played
+    Returns: generator of (int, GameResult), each game's index and result
+    """
+    if workers != 1 and search_workers is not None and search_workers > 1:
+        raise ValueError("search workers need the games played in one "
+                         "process")
+    tasks = [(i, seed, record_games) for i in range(n)]
+    if workers == 1:
+        _init_worker(board_size, players, depths, tablebase_path, book_path,
+                     search_workers)
+        results = map(_play_seeded_game, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, _init_worker,
+                                    (board_size, players, depths,
+                                     tablebase_path, book_path))
+        results = pool.imap_unordered(_play_seeded_game, tasks)
+    try:
+        for index, (winner, *rest) in results:
+            winner = None if winner is None else PieceColor[winner]
+            yield index, GameResult(winner, *rest)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        else:
+            for player in _worker_bots.values():
+                if isinstance(player.bot, SmartBot):
+                    player.bot.close()
+
+
+def game_record(index, result, board_size, players, depths):
+    """
+    Describes a finished game as a flat record with the RECORD_FIELDS keys
+    (the depth of a random bot is None, as it does not search).
+
+    Input:
+        index: The game's number
+        result: GameResult
+        board_size, players, depths: as for simulate_parallel
+    Returns: dict
+    """
+    record = {"game": index, "board_size": board_size}
+    for color in (PieceColor.RED, PieceColor.BLACK):
+        prefix = color.name.lower()
+        record[prefix + "_player"] = players[color]
+        record[prefix + "_depth"] = (depths[color]
+                                     if players[color] == "smart" else None)
+    record["winner"] = (None if result.winner is None
+                        else result.winner.name.lower())
+    record["plies"] = result.plies
+    record["termination"] = result.termination
+    record["time_s"] = round(result.time_s, 4)
+    return record
+
+
 @click.command(name="Checkers Bot")
 @click.option('-n', '--num-games', type=click.INT, default=100)
 @click.option('--player1',
               type=click.Choice(['random', 'smart'], case_sensitive=False),
-              default="random")
+              default="random", help="Bot playing red")
 @click.option('--player2',
               type=click.Choice(['random', 'smart'], case_sensitive=False),
-              default="random")
+              default="random", help="Bot playing black")
 @click.option('--depth1', type=click.INT, default=3)
 @click.option('--depth2', type=click.INT, default=3)
 @click.option('--board_size', type=click.INT, default=3)
+@click.option('--workers', type=click.INT, default=1,
+              help="Processes to play the games on (0 for one per CPU core)")
+@click.option('--search-workers', type=click.INT, default=None,
+              help="Processes each smart bot searches a move with (lazy "
+                   "SMP; needs --workers 1)")
+@click.option('--seed', type=click.INT, default=None,
+              help="Seed for repeatable games")
+@click.option('--tablebase', 'tablebase_path',
+              type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Endgame tablebase file for the smart bots")
+@click.option('--book', 'book_path',
+              type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Opening book file for the smart bots")
+@click.option('--format', 'out_format',
+              type=click.Choice(['text', 'jsonl', 'csv'], case_sensitive=False),
+              default="text",
+              help="text: totals only; jsonl/csv: one record per game")
+@click.option('-o', '--output', type=click.File('w'), default='-',
+              help="File for the per-game records (default: stdout)")
+@click.option('--games-out', type=click.Path(dir_okay=False), default=None,
+              help="Append every game's moves to this file (PDN text if it "
+                   "ends in .pdn, binary otherwise)")
 
-def cmd(num_games, player1, player2, depth1, depth2, board_size):
-    print("")
-    print("Hello. In this mode only bots can be played against one another.")
-    print("Note that you will be prompted for the depths of both bots,")
-    print("and this number is disregarded in the case of a random bot.")
-    print("")
-    num_games = int(input("Enter the number of games you want the bots to play (integer): "))
-    player1 = input("Enter 'random' or 'smart' for player 1: ")
-    depth1 = int(input("Enter player 1 depth (integer): "))
-    player2 = input("Enter 'random' or 'smart' for player 2: ")
-    depth2 = int(input("Enter player 2 depth (integer): "))
-    board_size = int(input("Enter integer n for board size (2n + 2)x(2n + 2): "))
-    print("")
-    print("Playing games... (depth 3+ can take a bit)")
-    print("")
-
-    board = Checkers(board_size)
-    bot1 = BotPlayer(player1, board, PieceColor.RED, PieceColor.BLACK, depth1)
-    bot2 = BotPlayer(player2, board, PieceColor.BLACK, PieceColor.RED, depth2)
+def cmd(num_games, player1, player2, depth1, depth2, board_size, workers,
+        search_workers, seed, tablebase_path, book_path, out_format, output,
+        games_out):
+    if workers == 0:
+        workers = multiprocessing.cpu_count()
+    if workers != 1 and search_workers is not None and search_workers > 1:
+        raise click.BadParameter("needs --workers 1",
+                                 param_hint="--search-workers")
+    players = {PieceColor.RED: player1, PieceColor.BLACK: player2}
+    depths = {PieceColor.RED: depth1, PieceColor.BLACK: depth2}
 
-    bots = {PieceColor.RED: bot1, PieceColor.BLACK: bot2}
+    writer = None
+    if out_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=RECORD_FIELDS)
+        writer.writeheader()
+    # Totals go to stderr when the records take stdout
+    totals_to_stderr = out_format != "text" and output.name == "<stdout>"
 
-    simulate(board, num_games, bots)
+    wins = {PieceColor.RED: 0, PieceColor.BLACK: 0}
+    played = 0
+    games_writer = open_writer(games_out) if games_out is not None else None
+    try:
+        results = simulate_parallel(board_size, num_games, players, depths,
+                                    workers, seed, tablebase_path, book_path,
+                                    search_workers, games_writer is not None)
+        for index, result in results:
+            played += 1
+            if games_writer is not None:
+                games_writer.write(result_game_record(index, result,
+                                                      board_size, players,
+                                                      depths))
+            if result.winner is not None:
+                wins[result.winner] += 1
+            if out_format == "text":
+                continue
+            record = game_record(index, result, board_size, players, depths)
+            if writer is not None:
+                writer.writerow(record)
+            else:
+                output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if games_writer is not None:
+            games_writer.close()
 
-    bot1_wins = bots[PieceColor.RED].wins
-    bot2_wins = bots[PieceColor.BLACK].wins
-    ties = num_games - (bot1_wins + bot2_wins)
-
-    print(f"Bot 1 ({player1}) wins: {100 * bot1_wins / num_games:.2f}%")
-    print(f"Bot 2 ({player2}) wins: {100 * bot2_wins / num_games:.2f}%")
-    print(f"Ties: {100 * ties / num_games:.2f}%")
+    if not played:
+        return
+    ties = played - (wins[PieceColor.RED] + wins[PieceColor.BLACK])
+    click.echo(f"Bot 1 ({player1}) wins: "
+               f"{100 * wins[PieceColor.RED] / played:.2f}%",
+               err=totals_to_stderr)
+    click.echo(f"Bot 2 ({player2}) wins: "
+               f"{100 * wins[PieceColor.BLACK] / played:.2f}%",
+               err=totals_to_stderr)
+    click.echo(f"Ties: {100 * ties / played:.2f}%", err=totals_to_stderr)
 
 
 if __name__ == "__main__":
     cmd()
-
-
-
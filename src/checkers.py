@@ -26,19 +26,220 @@ Example calls:
     5) resigning the game for Red:
 
         checkers.resign_game(PieceColor.RED)
+
+    6) saving a position as text or bytes and setting it up again:
+
+        text = checkers.to_fen()       # e.g. "3:B:B1,2,K7:R25,26:0"
+        copy = Checkers.from_fen(text)
+        data = checkers.to_bytes()
+        copy = Checkers.from_bytes(data)
 """
 
 
+from collections import namedtuple
 from enum import Enum
 from typing import Optional, List
 import random
 
+from bitboard import BitBoard, geometry, iter_bits
+
 PieceColor = Enum("PieceColor", ["RED", "BLACK"])
 
 opposite_color = {}
 opposite_color[PieceColor.RED] = PieceColor.BLACK
 opposite_color[PieceColor.BLACK] = PieceColor.RED
 
+#Directions as indices into the neighbor table (bitboard.geometry), in the
+#order of bitboard.KING_DIRECTIONS
+DIR_NW, DIR_NE, DIR_SE, DIR_SW = range(4)
+
+#Directions each kind of piece moves in (shared, see Piece.move_directions)
+KING_MOVES = (DIR_NW, DIR_NE, DIR_SE, DIR_SW)
+BLACK_MOVES = (DIR_SE, DIR_SW)
+RED_MOVES = (DIR_NW, DIR_NE)
+
+#The dead squares of a move tree node that has jumped nothing, and the
+#children of one with no continuation (shared by all such nodes)
+NO_DEAD = ()
+NO_CHILDREN = ()
+
+#What make_move hands back so unmake_move can take the move back:
+#path (tuple[Square, ...]) - squares the piece visited, first to last
+#captured (tuple[(Square, Piece), ...]) - pieces taken and where they stood
+#crowned (bool) - whether the move made the piece a king
+#non_jump_moves (int) - consecutive_non_jump_moves before the move
+MoveUndo = namedtuple("MoveUndo", ["path", "captured", "crowned",
+                                   "non_jump_moves"])
+
+#A complete legal move, as produced by Checkers.legal_moves. Squares are bit
+#indices (row*board_dim + col):
+#origin (int) - square the piece starts on
+#path (tuple[int, ...]) - squares the piece lands on, in order
+#captured (int) - bitmask of the squares of the pieces it takes
+LegalMove = namedtuple("LegalMove", ["origin", "path", "captured"])
+
+#A game state as a few integers, as produced by Checkers.snapshot (cheap to
+#send to another process):
+#size (int) - no. of rows of pieces
+#black, red, kings (int) - bitboard masks of the pieces
+#black_to_move (bool) - whose turn it is
+#non_jump_moves (int) - consecutive_non_jump_moves
+Snapshot = namedtuple("Snapshot", ["size", "black", "red", "kings",
+                                   "black_to_move", "non_jump_moves"])
+
+#Text and binary forms of a Snapshot. Both number the dark squares 1, 2, ...
+#row by row from the top left, as in PDN.
+#
+#Text: "size:turn:Bsquares:Rsquares:non_jump_moves", e.g.
+#"3:B:B1,2,K7:R25,26:0" - black to move, black men on 1 and 2 and a king on
+#7, red men on 25 and 26, no moves since the last jump.
+#
+#Binary: one byte for the size, one for non_jump_moves*2 + black_to_move,
+#then the occupied dark squares as a bitmask (one bit per dark square), then
+#two bits per occupied square in order (1: red, 2: king).
+
+
+def dark_squares(size):
+    """
+    Returns the bit indices of the dark squares of a board size, in the
+    order the text and binary forms number them, and the number (from 0) of
+    each index (shared, see bitboard.geometry).
+
+    Args:
+        size (int) : no. of rows of pieces
+
+    Returns:
+        (tuple[int, ...], dict{int: int})
+    """
+    shapes = geometry(size)
+    return shapes.dark_squares, shapes.dark_number
+
+
+def snapshot_to_fen(snapshot):
+    """
+    Writes a Snapshot in the text form.
+
+    Args:
+        snapshot : Snapshot
+
+    Returns: str
+    """
+    _, number = dark_squares(snapshot.size)
+    fields = [str(snapshot.size), "B" if snapshot.black_to_move else "R"]
+    for letter, mask in (("B", snapshot.black), ("R", snapshot.red)):
+        names = []
+        for index in iter_bits(mask):
+            king = "K" if snapshot.kings >> index & 1 else ""
+            names.append(f"{king}{number[index] + 1}")
+        fields.append(letter + ",".join(names))
+    fields.append(str(snapshot.non_jump_moves))
+    return ":".join(fields)
+
+
+def fen_to_snapshot(text):
+    """
+    Reads a Snapshot from the text form.
+
+    Args:
+        text : str
+
+    Returns: Snapshot
+    """
+    fields = text.strip().split(":")
+    if len(fields) != 5:
+        raise ValueError(f"position {text!r} does not have 5 fields")
+    size_field, turn, black_field, red_field, counter = fields
+    try:
+        size = int(size_field)
+        non_jump_moves = int(counter)
+    except ValueError:
+        raise ValueError(f"bad size or move count in {text!r}") from None
+    if turn not in ("B", "R"):
+        raise ValueError(f"side to move must be B or R, not {turn!r}")
+    squares, _ = dark_squares(size)
+    masks = {}
+    kings = 0
+    for letter, field in (("B", black_field), ("R", red_field)):
+        if not field.startswith(letter):
+            raise ValueError(f"expected {letter} pieces, got {field!r}")
+        mask = 0
+        for name in filter(None, field[1:].split(",")):
+            king = name.startswith("K")
+            try:
+                number = int(name[1:] if king else name)
+            except ValueError:
+                raise ValueError(f"bad square {name!r}") from None
+            if not 1 <= number <= len(squares):
+                raise ValueError(f"square {number} is off the board")
+            bit = 1 << squares[number - 1]
+            mask |= bit
+            if king:
+                kings |= bit
+        masks[letter] = mask
+    if masks["B"] & masks["R"]:
+        raise ValueError(f"two pieces on one square in {text!r}")
+    return Snapshot(size, masks["B"], masks["R"], kings, turn == "B",
+                    non_jump_moves)
+
+
+def snapshot_to_bytes(snapshot):
+    """
+    Packs a Snapshot in the binary form: 2 bytes, one bit per dark square
+    and two bits per piece (12 bytes for the starting position of size 3).
+
+    Args:
+        snapshot : Snapshot
+
+    Returns: bytes
+    """
+    if not 0 <= snapshot.non_jump_moves < 128:
+        raise ValueError("non_jump_moves must be below 128 to be packed")
+    squares, number = dark_squares(snapshot.size)
+    red, kings = snapshot.red, snapshot.kings
+    occupied = 0
+    kinds = 0
+    shift = 0
+    for index in iter_bits(snapshot.black | red):
+        occupied |= 1 << number[index]
+        kinds |= ((red >> index & 1) | (kings >> index & 1) << 1) << shift
+        shift += 2
+    return bytes((snapshot.size, snapshot.non_jump_moves << 1
+                  | snapshot.black_to_move)) \
+        + occupied.to_bytes((len(squares) + 7) // 8, "little") \
+        + kinds.to_bytes((shift + 7) // 8, "little")
+
+
+def bytes_to_snapshot(data):
+    """
+    Unpacks a Snapshot from the binary form.
+
+    Args:
+        data : bytes
+
+    Returns: Snapshot
+    """
+    if len(data) < 2:
+        raise ValueError("packed position is too short")
+    size, flags = data[0], data[1]
+    squares, _ = dark_squares(size)
+    width = (len(squares) + 7) // 8
+    occupied = int.from_bytes(data[2:2 + width], "little")
+    kinds = int.from_bytes(data[2 + width:], "little")
+    if len(data) != 2 + width + (2 * occupied.bit_count() + 7) // 8 \
+            or occupied >> len(squares):
+        raise ValueError("packed position does not match its size")
+    black = red = kings = 0
+    for number in iter_bits(occupied):
+        bit = 1 << squares[number]
+        if kinds & 1:
+            red |= bit
+        else:
+            black |= bit
+        if kinds & 2:
+            kings |= bit
+        kinds >>= 2
+    return Snapshot(size, black, red, kings, bool(flags & 1), flags >> 1)
+
 class Checkers:
     """
     Class for representing all the checkers game logic. Uses the Board,
@@ -61,20 +262,46 @@ class Checkers:
     #whether or not the game has been resigned or drawn
     _resigned: bool
 
+    #bitmask copy of the board that moves are generated from
+    _position: BitBoard
+
+    #whether valid_moves uses _position (True) or walks the squares (False)
+    _use_bitboard: bool
+
+    #number of men and of kings of each color on the board
+    _men: dict
+    _kings: dict
+
+    #the squares of the board by index (row*board_dim + col), and the
+    #neighbors of each (shared, see bitboard.geometry)
+    _squares: list
+    _neighbors: tuple
+
     #PUBLIC ATTRIBUTES
 
     #how many moves since last piece was taken
     consecutive_non_jump_moves: int
 
-    def __init__(self, size):
+    def __init__(self, size, use_bitboard=True):
         """
         Initializes the game board. At first, there is no winner, no
         consecutive non jump moves, no one has resigned, and the board
         state is as it is at the start of the game.
+
+        Args:
+            size (int) : no. of rows of pieces
+            use_bitboard (bool) : generate moves from the bitboard position
+                (default) instead of walking the squares
         """
         self._size = size
         self._board_dim = 2*size+2
         self._game_board = Board(self._board_dim, self._board_dim)
+        self._squares = self._game_board.squares
+        self._position = BitBoard(size)
+        self._neighbors = self._position.geometry.neighbors
+        self._use_bitboard = use_bitboard
+        self._men = {PieceColor.BLACK: 0, PieceColor.RED: 0}
+        self._kings = {PieceColor.BLACK: 0, PieceColor.RED: 0}
         self._winner = None
         self.consecutive_non_jump_moves = 0
         self._resigned = False
@@ -108,6 +335,223 @@ class Checkers:
         """
         return self._game_board
 
+    def get_position(self):
+        """
+        Returns the bitboard position kept in step with the board.
+
+        Args: None
+        Returns: BitBoard
+        """
+        return self._position
+
+    def get_turn(self):
+        """
+        Returns the color whose turn it is. Black moves first, and the turn
+        passes every time a move is completed.
+
+        Args: None
+        Returns: Enum(PieceColor)
+        """
+        if self._position.black_to_move:
+            return PieceColor.BLACK
+        return PieceColor.RED
+
+    def zobrist_hash(self):
+        """
+        Returns the Zobrist hash of the position: the pieces on the board and
+        the color whose turn it is.
+
+        Args: None
+        Returns: int
+        """
+        return self._position.hash
+
+    def get_material(self, piece_color):
+        """
+        Returns how many men and kings a player has on the board. The counts
+        are kept up to date as moves are played and taken back, so this
+        takes no time.
+
+        Args:
+            piece_color : Enum(PieceColor)
+
+        Returns:
+            (int, int) : men, kings
+        """
+        return self._men[piece_color], self._kings[piece_color]
+
+    def snapshot(self):
+        """
+        Returns the state of the game as a Snapshot, which restore can set
+        up again (in this or another Checkers of the same size).
+
+        Args: None
+        Returns: Snapshot
+        """
+        position = self._position
+        return Snapshot(self._size, position.black, position.red,
+                        position.kings, position.black_to_move,
+                        self.consecutive_non_jump_moves)
+
+    def restore(self, snapshot):
+        """
+        Sets up the state saved by snapshot. There is no winner afterwards.
+
+        Args:
+            snapshot : Snapshot
+
+        Returns: None
+        """
+        if snapshot.size != self._size:
+            raise ValueError(f"snapshot of size {snapshot.size} given to a "
+                             f"board of size {self._size}")
+        squares = self._squares
+        #pieces only ever stand on the dark squares
+        for index in self._position.geometry.dark_squares:
+            square = squares[index]
+            bit = 1 << index
+            if snapshot.black & bit:
+                square.piece = Piece(PieceColor.BLACK,
+                                     bool(snapshot.kings & bit))
+            elif snapshot.red & bit:
+                square.piece = Piece(PieceColor.RED,
+                                     bool(snapshot.kings & bit))
+            else:
+                square.piece = None
+        self._winner = None
+        self._resigned = False
+        self.consecutive_non_jump_moves = snapshot.non_jump_moves
+        position = self._position
+        position.black = snapshot.black
+        position.red = snapshot.red
+        position.kings = snapshot.kings
+        position.black_to_move = snapshot.black_to_move
+        self._sync_material()
+
+    @classmethod
+    def from_fen(cls, text):
+        """
+        Creates a game set up from a position in the text form (see
+        to_fen).
+
+        Args:
+            text : str
+
+        Returns: Checkers
+        """
+        snapshot = fen_to_snapshot(text)
+        checkers = cls(snapshot.size)
+        checkers.restore(snapshot)
+        return checkers
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates a game set up from a position in the binary form (see
+        to_bytes).
+
+        Args:
+            data : bytes
+
+        Returns: Checkers
+        """
+        snapshot = bytes_to_snapshot(data)
+        checkers = cls(snapshot.size)
+        checkers.restore(snapshot)
+        return checkers
+
+    def to_fen(self):
+        """
+        Returns the position as text: board size, side to move, the squares
+        of the black and of the red pieces (kings marked K) and the
+        consecutive non jump moves, e.g. "3:B:B1,2,K7:R25,26:0".
+
+        Args: None
+        Returns: str
+        """
+        return snapshot_to_fen(self.snapshot())
+
+    def to_bytes(self):
+        """
+        Returns the position packed into a few bytes (see
+        snapshot_to_bytes).
+
+        Args: None
+        Returns: bytes
+        """
+        return snapshot_to_bytes(self.snapshot())
+
+    def load_fen(self, text):
+        """
+        Sets up a position given in the text form (see to_fen), which must
+        be for this board size.
+
+        Args:
+            text : str
+
+        Returns: None
+        """
+        self.restore(fen_to_snapshot(text))
+
+    def load_bytes(self, data):
+        """
+        Sets up a position given in the binary form (see to_bytes), which
+        must be for this board size.
+
+        Args:
+            data : bytes
+
+        Returns: None
+        """
+        self.restore(bytes_to_snapshot(data))
+
+    def __reduce__(self):
+        """
+        Pickles (and copies) the game as its Snapshot and flags rather than
+        as the linked squares of its board.
+
+        Args: None
+        Returns: tuple
+        """
+        return (_rebuild_checkers, (self.snapshot(), self._use_bitboard,
+                                    self._winner, self._resigned))
+
+    def load_board(self, text, turn=PieceColor.BLACK):
+        """
+        Sets up a position written the way str(checkers) prints the board:
+        one line per row, "□" (or ".") for an empty square, "b"/"r" for a
+        black/red man and "B"/"R" for a king. The game starts over from it
+        with the given color to move.
+
+        Args:
+            text : str (the board, one line per row)
+            turn : Enum(PieceColor) (color to move)
+
+        Returns: None
+        """
+        rows = [line.strip() for line in text.splitlines() if line.strip()]
+        dim = self._board_dim
+        if len(rows) != dim or any(len(row) != dim for row in rows):
+            raise ValueError(f"board must be {dim} rows of {dim} squares")
+        pieces = {"b": (PieceColor.BLACK, False), "B": (PieceColor.BLACK, True),
+                  "r": (PieceColor.RED, False), "R": (PieceColor.RED, True)}
+        for i, row in enumerate(rows):
+            for j, char in enumerate(row):
+                if char in "□.":
+                    piece = None
+                elif char in pieces:
+                    if (i+j) % 2 == 0:
+                        raise ValueError(f"piece on light square ({i}, {j})")
+                    piece = Piece(*pieces[char])
+                else:
+                    raise ValueError(f"unknown square {char!r} at ({i}, {j})")
+                self.get_board().board[i][j].piece = piece
+        self._winner = None
+        self._resigned = False
+        self.consecutive_non_jump_moves = 0
+        self._position.black_to_move = turn == PieceColor.BLACK
+        self._sync_position()
+
     def valid_moves(self, piece_color):
         """
         Returns the set of possible moves for a certain player.
@@ -127,6 +571,57 @@ class Checkers:
         reg_move_list = self.reg_moves(piece_color)
         return reg_move_list
 
+    def legal_moves(self, piece_color):
+        """
+        Yields every complete legal move of a player as a LegalMove: one per
+        way of finishing a multi-jump, and only jumps if any piece can jump.
+        Unlike valid_moves no move trees are built, and the moves are
+        generated as they are asked for, so a caller can stop early.
+
+        Args:
+            piece_color : Enum(PieceColor)
+
+        Returns:
+            generator of LegalMove
+        """
+        black = piece_color == PieceColor.BLACK
+        position = self._position
+        if position.has_jump(black):
+            paths = position.iter_jump_paths(black)
+        else:
+            paths = position.iter_quiet_paths(black)
+        for path, captured in paths:
+            yield LegalMove(path[0], path[1:], captured)
+
+    def to_move_tree(self, move):
+        """
+        Turns a LegalMove into a move tree with a single line of children,
+        so it can be played with execute_single_move_rand(tree, 0) or
+        step by step with execute_single_move.
+
+        Args:
+            move : LegalMove
+
+        Returns:
+            Moves
+        """
+        board = self.get_board().board
+        dim = self._board_dim
+        row, col = divmod(move.origin, dim)
+        tree = Moves(board[row][col])
+        node = tree
+        prev = move.origin
+        for land in move.path:
+            row, col = divmod(land, dim)
+            dead = None
+            if move.captured:
+                over_row, over_col = divmod((prev + land) // 2, dim)
+                dead = board[over_row][over_col]
+            node.add_move(board[row][col], dead)
+            node = node.children[0]
+            prev = land
+        return tree
+
     def piece_valid_moves(self, coord, piece_color):
         """
         When given a tuple of board coordinates, returns a list of tuples with
@@ -167,6 +662,10 @@ class Checkers:
 
             NOT FIXED
         """
+        if self._use_bitboard:
+            black = piece_color == PieceColor.BLACK
+            paths = self._position.jump_paths(black)
+            return self._paths_to_moves(piece_color, paths), bool(paths)
         move_list = []
         can_jump = False
         for row in self.get_board().board:
@@ -188,7 +687,7 @@ class Checkers:
             Move, bool
 
         """
-        jump_moves = Moves(square, set())
+        jump_moves = Moves(square)
         self._jump_recurse(square, square.piece.color, jump_moves, square.piece, square)
         can_jump = False
         if jump_moves.can_execute():
@@ -211,33 +710,36 @@ class Checkers:
             None
 
         """
-        opposite: Optional[PieceColor]
-        if piece_color.value == PieceColor.RED.value:
-            opposite = PieceColor.BLACK
-        else:
-            opposite = PieceColor.RED
+        opposite = opposite_color[piece_color]
+        squares = self._squares
+        neighbors = self._neighbors
+        dim = self._board_dim
 
         for dir in first_piece.move_directions():
-            if square.neighbors[dir] is not None: #neighbor exists
-                if square.neighbors[dir].has_piece(): #neighbor has piece
-                    if square.neighbors[dir].piece.color == opposite:
-                        #neighbor piece is opposite color
-                        if square.neighbors[dir] not in move.dead_squares:
-                            #we haven't visited this square
-                            if square.neighbors[dir].neighbors[dir] is not None:
-                                #two neighbors down exists
-                                if square.neighbors[dir].neighbors[dir].is_empty() or square.neighbors[dir].neighbors[dir] == first_square:
-                                    #two neighbors down is empty
-                                    #we only need to keep track of 1st square,
-                                    #since if we jump to a square we've visited
-                                    #in the past that isn't the 1st square
-                                    #it must already be empty.
-                                    #parity ensures that if we kill a piece,
-                                    #we cannot return to it.
-                                    last_index = len(move.children)
-                                    move.add_move(square.neighbors[dir].neighbors[dir], square.neighbors[dir])
-                                    #print(move)
-                                    self._jump_recurse(square.neighbors[dir].neighbors[dir], piece_color, move.children[last_index], first_piece, first_square)
+            over = neighbors[square.row*dim + square.col][dir]
+            if over is None: #no neighbor that way
+                continue
+            land = neighbors[over][dir]
+            over = squares[over]
+            if over.has_piece(): #neighbor has piece
+                if over.piece.color == opposite:
+                    #neighbor piece is opposite color
+                    if over not in move.dead_squares:
+                        #we haven't visited this square
+                        if land is not None:
+                            #two neighbors down exists
+                            land = squares[land]
+                            if land.is_empty() or land is first_square:
+                                #two neighbors down is empty
+                                #we only need to keep track of 1st square,
+                                #since if we jump to a square we've visited
+                                #in the past that isn't the 1st square
+                                #it must already be empty.
+                                #parity ensures that if we kill a piece,
+                                #we cannot return to it.
+                                last_index = len(move.children)
+                                move.add_move(land, over)
+                                self._jump_recurse(land, piece_color, move.children[last_index], first_piece, first_square)
 
     def reg_moves(self, piece_color):
         """
@@ -249,6 +751,10 @@ class Checkers:
         Returns:
             list[Moves]
         """
+        if self._use_bitboard:
+            black = piece_color == PieceColor.BLACK
+            return self._paths_to_moves(piece_color,
+                                        self._position.quiet_paths(black))
         move_list = []
         for row in self.get_board().board:
             for square in row:
@@ -257,6 +763,47 @@ class Checkers:
 
         return move_list
 
+    def _paths_to_moves(self, piece_color, paths):
+        """
+        Private method: turns the (path, captured) pairs produced by the
+        bitboard into one move tree per piece of piece_color, in the same
+        order and shape as walking the squares would give.
+
+        Args:
+            piece_color : Enum(PieceColor)
+            paths : list[(tuple[int, ...], int)] (from BitBoard)
+
+        Returns:
+            list[Moves]
+        """
+        board = self.get_board().board
+        dim = self._board_dim
+        black = piece_color == PieceColor.BLACK
+        trees = {}
+        move_list = []
+        for index in iter_bits(self._position.own(black)):
+            row, col = divmod(index, dim)
+            trees[index] = Moves(board[row][col])
+            move_list.append(trees[index])
+
+        for path, captured in paths:
+            move = trees[path[0]]
+            for prev, land in zip(path, path[1:]):
+                row, col = divmod(land, dim)
+                square = board[row][col]
+                if move.children and move.children[-1].location is square:
+                    #paths come depth-first, so a shared prefix is always
+                    #the most recently added child
+                    move = move.children[-1]
+                    continue
+                if captured:
+                    over_row, over_col = divmod((prev + land) // 2, dim)
+                    move.add_move(square, board[over_row][over_col])
+                else:
+                    move.add_move(square, None)
+                move = move.children[-1]
+        return move_list
+
 
     def _reg_moves_piece(self, square):
         """
@@ -266,11 +813,13 @@ class Checkers:
         Returns:
             Moves
         """
-        moves = Moves(square, set())
+        moves = Moves(square)
+        neighbors = self._neighbors[square.row*self._board_dim + square.col]
         for dir in square.piece.move_directions():
-            if square.neighbors[dir] is not None: #check if adjacent exists
-                if square.neighbors[dir].is_empty():#if neighboring square empty
-                    moves.add_move(square.neighbors[dir], None)
+            if neighbors[dir] is not None: #check if adjacent exists
+                neighbor = self._squares[neighbors[dir]]
+                if neighbor.is_empty():#if neighboring square empty
+                    moves.add_move(neighbor, None)
 
         return moves
 
@@ -290,24 +839,18 @@ class Checkers:
             cur_move = move
             while bool(cur_move.children):
                 index = random.randint(0, len(cur_move.children)-1)
-                moving_piece = cur_move.location.piece
-                cur_move.location.piece = None
-                cur_move.children[index].location.piece = moving_piece
+                self._move_piece(cur_move.location, cur_move.children[index].location)
                 cur_move = cur_move.children[index]
             if cur_move.dead_squares:
                 for dead_square in cur_move.dead_squares:
-                    dead_square.piece = None
+                    self._remove_piece(dead_square)
                     self.consecutive_non_jump_moves = 0
             else:
                 self.consecutive_non_jump_moves += 1
 
             #check if we are kinging
-            if cur_move.location.row == 0:
-                if moving_piece.color.value == PieceColor.RED.value:
-                    moving_piece.is_king = True
-            if cur_move.location.row == self._board_dim -1:
-                if moving_piece.color.value == PieceColor.BLACK.value:
-                    moving_piece.is_king = True
+            self._check_crown(cur_move.location)
+            self._position.toggle_side()
         else:
             pass
 
@@ -342,23 +885,19 @@ class Checkers:
         Returns:
             None
         """
-        moving_piece = move.location.piece
-        move.children[child].location.piece = moving_piece
-        move.location.piece = None
+        self._move_piece(move.location, move.children[child].location)
         if move.children[child].dead_squares:
             for dead_square in move.children[child].dead_squares:
-                dead_square.piece = None
+                self._remove_piece(dead_square)
                 self.consecutive_non_jump_moves = 0
                 #print("killed: " + "[" + str(dead_square.row) + "," + str(dead_square.col) + "]")
         else:
             self.consecutive_non_jump_moves += 1
 
-        if move.children[child].location.row == 0:
-            if moving_piece.color.value == PieceColor.RED.value:
-                moving_piece.is_king = True
-        if move.children[child].location.row == self._board_dim -1:
-            if moving_piece.color.value == PieceColor.BLACK.value:
-                moving_piece.is_king = True
+        self._check_crown(move.children[child].location)
+        if not move.children[child].can_execute():
+            #the move is over, so the turn passes
+            self._position.toggle_side()
 
     def execute_single_move_rand(self, move, child):
         """
@@ -373,26 +912,191 @@ class Checkers:
         Returns:
             None
         """
-        moving_piece = move.location.piece
-        move.children[child].location.piece = moving_piece
-        move.location.piece = None
+        self._move_piece(move.location, move.children[child].location)
         if move.children[child].dead_squares:
             for dead_square in move.children[child].dead_squares:
-                dead_square.piece = None
+                self._remove_piece(dead_square)
                 self.consecutive_non_jump_moves = 0
         else:
             self.consecutive_non_jump_moves += 1
 
         if move.children[child].can_execute():
+            #execute_move kings the piece where the move ends
             self.execute_move(move.children[child])
+        else:
+            #if we are at the end of the board we king
+            self._check_crown(move.children[child].location)
+            self._position.toggle_side()
+
+    def _move_piece(self, from_square, to_square):
+        """
+        Private method: moves the piece on from_square to to_square, on both
+        the board and the bitboard position.
 
-        #if we are at the end of the board we king
-        if move.children[child].location.row == 0:
+        Args:
+            from_square : Square
+            to_square : Square
+
+        Returns: None
+        """
+        if from_square is to_square:
+            #a king can capture its way round back to where it started
+            return
+        to_square.piece = from_square.piece
+        from_square.piece = None
+        self._position.move_piece(self._position.index(from_square.row, from_square.col),
+                                  self._position.index(to_square.row, to_square.col))
+
+    def _remove_piece(self, square):
+        """
+        Private method: takes the piece on square off the board and the
+        bitboard position.
+
+        Args:
+            square : Square
+
+        Returns: None
+        """
+        if square.piece is None:
+            #already taken earlier in the same multi-jump
+            return
+        if square.piece.is_king:
+            self._kings[square.piece.color] -= 1
+        else:
+            self._men[square.piece.color] -= 1
+        square.piece = None
+        self._position.remove_piece(self._position.index(square.row, square.col))
+
+    def _check_crown(self, square):
+        """
+        Private method: turns the piece on square into a king if it has
+        reached the far end of the board.
+
+        Args:
+            square : Square (where a move ended)
+
+        Returns: None
+        """
+        moving_piece = square.piece
+        if moving_piece.is_king:
+            return
+        if square.row == 0:
             if moving_piece.color.value == PieceColor.RED.value:
                 moving_piece.is_king = True
-        if move.children[child].location.row == self._board_dim -1:
+                self._position.crown(self._position.index(square.row, square.col))
+        if square.row == self._board_dim -1:
             if moving_piece.color.value == PieceColor.BLACK.value:
                 moving_piece.is_king = True
+                self._position.crown(self._position.index(square.row, square.col))
+        if moving_piece.is_king:
+            self._men[moving_piece.color] -= 1
+            self._kings[moving_piece.color] += 1
+
+    def make_move(self, move, child):
+        """
+        Plays a whole move in place, starting with the given child of the
+        move tree and randomly finishing it from there (as
+        execute_single_move_rand does), and returns what is needed to take
+        it back with unmake_move.
+
+        Args:
+            move: Move
+            child: int
+
+        Returns:
+            MoveUndo
+        """
+        cur_move = move.children[child]
+        path = [move.location, cur_move.location]
+        while cur_move.children:
+            cur_move = cur_move.children[random.randint(0, len(cur_move.children)-1)]
+            path.append(cur_move.location)
+        return self._make_path(tuple(path), cur_move.dead_squares)
+
+    def make_legal_move(self, move):
+        """
+        Plays a LegalMove in place and returns what is needed to take it back
+        with unmake_move.
+
+        Args:
+            move: LegalMove
+
+        Returns:
+            MoveUndo
+        """
+        board = self.get_board().board
+        dim = self._board_dim
+        path = []
+        for index in (move.origin,) + move.path:
+            row, col = divmod(index, dim)
+            path.append(board[row][col])
+        dead = []
+        for index in iter_bits(move.captured):
+            row, col = divmod(index, dim)
+            dead.append(board[row][col])
+        return self._make_path(tuple(path), dead)
+
+    def _make_path(self, path, dead_squares):
+        """
+        Private method: moves the piece on the first square of path to the
+        last, takes the pieces on dead_squares, kings the piece if needed and
+        passes the turn.
+
+        Args:
+            path: tuple[Square, ...]
+            dead_squares: iterable of Square
+
+        Returns:
+            MoveUndo
+        """
+        moving_piece = path[0].piece
+        was_king = moving_piece.is_king
+        non_jump_moves = self.consecutive_non_jump_moves
+        captured = tuple((square, square.piece) for square in dead_squares)
+
+        self._move_piece(path[0], path[-1])
+        for square, _ in captured:
+            self._remove_piece(square)
+        if captured:
+            self.consecutive_non_jump_moves = 0
+        else:
+            self.consecutive_non_jump_moves += 1
+        self._check_crown(path[-1])
+        self._position.toggle_side()
+
+        return MoveUndo(path, captured,
+                        moving_piece.is_king and not was_king, non_jump_moves)
+
+    def unmake_move(self, undo):
+        """
+        Takes back a move played with make_move or make_legal_move. Moves
+        must be taken back in the reverse order they were made.
+
+        Args:
+            undo: MoveUndo
+
+        Returns:
+            None
+        """
+        start = undo.path[0]
+        end = undo.path[-1]
+        self._position.toggle_side()
+        if undo.crowned:
+            end.piece.is_king = False
+            self._position.uncrown(self._position.index(end.row, end.col))
+            self._men[end.piece.color] += 1
+            self._kings[end.piece.color] -= 1
+        self._move_piece(end, start)
+        for square, piece in undo.captured:
+            square.piece = piece
+            if piece.is_king:
+                self._kings[piece.color] += 1
+            else:
+                self._men[piece.color] += 1
+            self._position.put_piece(self._position.index(square.row, square.col),
+                                     piece.color == PieceColor.BLACK,
+                                     piece.is_king)
+        self.consecutive_non_jump_moves = undo.non_jump_moves
 
     def is_done(self, piece_color):
         """
@@ -459,33 +1163,76 @@ class Checkers:
         Args: None
         Returns: None
         """
-        #1st loop - populate board
-        for i in range(self._board_dim): #row
-            for j in range(self._board_dim): #col
-                if (i+j) % 2 == 1:
-                    if i < self._size:
-                        self.get_board().board[i][j].piece = Piece(PieceColor.BLACK)
-                    elif i > self._size+1:
-                        self.get_board().board[i][j].piece = Piece(PieceColor.RED)
-                    else:
-                        self.get_board().board[i][j].piece = None
+        #a new game: no winner, nobody resigned, no moves played
+        self._winner = None
+        self._resigned = False
+        self.consecutive_non_jump_moves = 0
 
-        #2nd loop - connections
-        dirs = {"NW" : (-1, -1),          "NE" : (-1, +1),
+        #the starting position of the size, black to move; pieces only ever
+        #stand on the dark squares
+        position = self._position
+        position.reset()
+        squares = self._squares
+        for index in position.geometry.dark_squares:
+            bit = 1 << index
+            if position.black & bit:
+                squares[index].piece = Piece(PieceColor.BLACK)
+            elif position.red & bit:
+                squares[index].piece = Piece(PieceColor.RED)
+            else:
+                squares[index].piece = None
+        self._sync_material()
 
-                "SW" : (+1, -1),          "SE" : (+1, +1)}
+    def _sync_position(self):
+        """
+        Private method: rebuilds the bitboard position and the material
+        counts from the pieces on the board.
 
+        Args: None
+        Returns: None
+        """
+        position = self._position
+        position.black = 0
+        position.red = 0
+        position.kings = 0
         for row in self.get_board().board:
             for square in row:
-                if (square.row + square.col) % 2 == 1:
-                    for dir in dirs:
-                        dr, dc = dirs[dir]
-                        cur_row = square.row
-                        cur_col = square.col
-                        target_row = cur_row+dr
-                        target_col = cur_col+dc
-                        if 0 <= target_row < self._board_dim and 0 <= target_col < self._board_dim:
-                            square.neighbors[dir] = self.get_board().board[target_row][target_col]
+                if square.has_piece():
+                    bit = 1 << position.index(square.row, square.col)
+                    if square.piece.color == PieceColor.BLACK:
+                        position.black |= bit
+                    else:
+                        position.red |= bit
+                    if square.piece.is_king:
+                        position.kings |= bit
+        self._sync_material()
+
+    def _sync_material(self):
+        """
+        Private method: recomputes the Zobrist hash and the material counts
+        from the bitmasks of the position.
+
+        Args: None
+        Returns: None
+        """
+        position = self._position
+        position.rehash()
+        for color, pieces in ((PieceColor.BLACK, position.black),
+                              (PieceColor.RED, position.red)):
+            self._kings[color] = (pieces & position.kings).bit_count()
+            self._men[color] = pieces.bit_count() - self._kings[color]
+
+
+def _rebuild_checkers(snapshot, use_bitboard, winner, resigned):
+    """
+    Private function: unpickles a Checkers pickled by Checkers.__reduce__.
+    """
+    checkers = Checkers(snapshot.size, use_bitboard)
+    checkers.restore(snapshot)
+    checkers._winner = winner
+    checkers._resigned = resigned
+    return checkers
+
 
 class Board:
     """
@@ -511,7 +1258,8 @@ class Board:
         #self._board_dim = 2*size+2
         self._board_width = width
         self._board_height = height
-        self.board = [[None]*self._board_width for _ in range(self._board_height)]
+        self.squares = []
+        self.board = []
         self._populate()
 
     def _populate(self):
@@ -522,9 +1270,12 @@ class Board:
 
         Returns: None
         """
-        for i in range(self._board_height): #row
-            for j in range(self._board_width): #col
-                self.board[i][j] = Square(i,j, None)
+        width = self._board_width
+        self.squares = [Square(i, j, None) for i in range(self._board_height)
+                        for j in range(width)]
+        #rows of the same Square objects
+        self.board = [self.squares[i*width:(i+1)*width]
+                      for i in range(self._board_height)]
 
     def __str__(self) -> str:
         """
@@ -542,23 +1293,25 @@ class Board:
 
 class Square:
     """
-    Class for the squares on the board.
+    Class for the squares on the board. A square does not hold its
+    neighbors: they are looked up by index in the neighbor table shared by
+    every board of the same size.
     """
+    __slots__ = ("piece", "row", "col")
+
     def __init__(self, row, col, piece) -> None:
         """
-        Constructor. Initializes a square, which does not connect to any
-        neighbors, and exists at a location with a piece on it. 
+        Constructor. Initializes a square, which exists at a location with a
+        piece on it.
         
         Args:
             row (int) : row value of the square
             col (int) : column value of the square
             piece (Piece) : if there is a piece on the board
-            highlighted (bool) : True if this is a possible move
         """
         self.piece = piece
         self.row = row
         self.col = col
-        self.neighbors = {'NW' : None, 'NE' : None, 'SE' : None, 'SW' : None}
 
     def __str__(self) -> str:
         """ 
@@ -614,6 +1367,8 @@ class Piece:
     """
     Class representing individual pieces.
     """
+    __slots__ = ("is_king", "color")
+
     is_king: bool
     def __init__(self, piece_color, is_king=False):
         """
@@ -635,21 +1390,24 @@ class Piece:
         
         Args: None
         
-        Returns: list[str]
+        Returns: tuple[int, ...] (direction indices, shared)
         """
         if self.is_king:
-            return ["NW", "NE", "SE", "SW"]
+            return KING_MOVES
         if self.color.value == PieceColor.BLACK.value:
-            return ["SE", "SW"]
-        return ["NW", "NE"] #self.color is RED
+            return BLACK_MOVES
+        return RED_MOVES #self.color is RED
 
 
 class Moves:
     """
     Class representing possible moves a piece could take using a tree
-    structure.
+    structure. The dead squares of a node are an immutable tuple, shared
+    with its children unless they jump again.
     """
-    def __init__(self, square, dead) -> None:
+    __slots__ = ("location", "dead_squares", "children")
+
+    def __init__(self, square, dead=NO_DEAD) -> None:
         """
         Initializes the move tree. We want a square that is the head of the move
         tree, and has no children, and the move jumps over no pieces, so 
@@ -657,11 +1415,12 @@ class Moves:
 
         Args:
             square : Square (current location)
-            dead : set[Square] (list of dead squares)
+            dead : tuple[Square, ...] (dead squares, in the order jumped)
         """
         self.location = square
         self.dead_squares = dead
-        self.children = [] #set of moves
+        #list of moves (a shared empty tuple until the first is added)
+        self.children = NO_CHILDREN
 
     def add_move(self, square, new_dead):
         """
@@ -671,12 +1430,13 @@ class Moves:
             square : Square (current location)
             new_dead = Square (just jumped over)
         """
-        if new_dead is None:
-            self.children.append(Moves(square, self.dead_squares.copy()))
+        dead = self.dead_squares
+        if new_dead is not None:
+            dead = dead + (new_dead,)
+        if self.children:
+            self.children.append(Moves(square, dead))
         else:
-            new_dead_set = self.dead_squares.copy()
-            new_dead_set.add(new_dead)
-            self.children.append(Moves(square, new_dead_set))
+            self.children = [Moves(square, dead)]
 
     def __str__(self):
         """ 
@@ -0,0 +1,441 @@
+"""
+Line-based engine protocol for the checkers engine.
+
+Runs the SmartBot search behind a text protocol on stdin/stdout, in the
+spirit of UCI, so that another program (e.g. a match orchestrator) can run
+the engine as a subprocess. Searches run in a background thread, so the
+engine keeps reading commands while it thinks and "stop" ends a search at
+once.
+
+Squares are numbered as in PDN (1 to the number of dark squares, row by
+row from black's side) and moves are written as in PDN: "9-13", "22x15x6".
+Positions are given in the text form of checkers.snapshot_to_fen.
+
+Commands (one per line):
+
+    engine                      -> id lines, option lines, "engineok"
+    isready                     -> "readyok"
+    setoption name Hash value MB
+    newgame [SIZE]              new game (of SIZE rows of pieces)
+    position startpos [size SIZE] [moves M1 M2 ...]
+    position fen FEN [moves M1 M2 ...]
+    moves M1 M2 ...             play moves from the current position
+    go [depth D] [movetime MS] [infinite]
+                                search the side to move
+    stop                        stop the search (it still answers)
+    print                       -> "fen FEN"
+    quit
+
+While a search runs, it sends one line per depth finished, then its move
+(and the reply it expects, if any; "bestmove none" without legal moves):
+
+    info depth 4 score 2 nodes 5210 time 31 nps 168064 pv 9-13 22-18 ...
+    bestmove 9-13 ponder 22-18
+
+Errors are reported as "info string error: ..." and the command is
+ignored.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Running the engine for an orchestrator::
+
+        python3 src/engine.py
+
+    2) A short session::
+
+        newgame 3
+        moves 9-13
+        go movetime 500
+        (info ... lines, then e.g. "bestmove 22-18 ponder 13x22")
+"""
+import sys
+import threading
+import time
+import click
+
+from checkers import Checkers, PieceColor, fen_to_snapshot, snapshot_to_fen
+from bot_minimax import SmartBot, BackgroundSearch, DEFAULT_TT_MB, \
+    MAX_DEPTH
+from game_record import format_move, parse_move, play_path, start_snapshot
+
+ENGINE_NAME = "big-checkers"
+ENGINE_AUTHORS = "Lucas Tucker, Daniel Chen, Althea Li, Niko Matheos"
+
+# Board size of a new engine
+DEFAULT_SIZE = 3
+
+# Longest principal variation sent in info lines
+MAX_PV_MOVES = 16
+
+# Range of the Hash option, in MB
+MIN_HASH_MB = 0
+MAX_HASH_MB = 4096
+
+
+class Engine:
+    """
+    Class for the engine side of the protocol: it keeps the current
+    position and one SmartBot (with its transposition table) for all its
+    searches, and answers commands.
+    """
+    #the position searched by go, as a Snapshot
+    position: tuple
+
+    #size of the bot's transposition table, in MB
+    hash_mb: int
+
+    def __init__(self, out=None):
+        """
+        Starts an engine at the starting position of DEFAULT_SIZE.
+
+        Args:
+            out : file the engine writes to (default sys.stdout)
+        """
+        self._out = out if out is not None else sys.stdout
+        #lines come from the command loop and from the search thread
+        self._lock = threading.Lock()
+        self.position = start_snapshot(DEFAULT_SIZE)
+        self.hash_mb = DEFAULT_TT_MB
+        self._bot = None
+        self._search = None
+        self._commands = {"engine": self.engine, "isready": self.isready,
+                          "setoption": self.setoption,
+                          "newgame": self.newgame,
+                          "position": self.set_position,
+                          "moves": self.moves, "go": self.go,
+                          "stop": self.stop, "print": self.print_position}
+
+    def send(self, line):
+        """
+        Writes one line of output.
+
+        Args:
+            line : str
+
+        Returns: None
+        """
+        with self._lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+
+    def run(self, lines=None):
+        """
+        Answers commands until "quit" or the end of the input.
+
+        Args:
+            lines : iterable of str (default sys.stdin)
+
+        Returns: None
+        """
+        for line in lines if lines is not None else sys.stdin:
+            if not self.handle(line):
+                break
+        self.stop()
+        if self._bot is not None:
+            self._bot.close()
+
+    def handle(self, line):
+        """
+        Answers one command line.
+
+        Args:
+            line : str
+
+        Returns: bool, False once the engine is told to quit
+        """
+        words = line.split()
+        if not words:
+            return True
+        if words[0] == "quit":
+            return False
+        command = self._commands.get(words[0])
+        try:
+            if command is None:
+                raise ValueError(f"unknown command {words[0]!r}")
+            command(words[1:])
+        except ValueError as error:
+            self.send(f"info string error: {error}")
+        except Exception as error:
+            #the engine keeps running whatever goes wrong with a command
+            self.send(f"info string error: {type(error).__name__}: {error}")
+        return True
+
+    def engine(self, args):
+        """
+        Identifies the engine and its options.
+        """
+        self.send(f"id name {ENGINE_NAME}")
+        self.send(f"id author {ENGINE_AUTHORS}")
+        self.send(f"option name Hash type spin default {DEFAULT_TT_MB} "
+                  f"min {MIN_HASH_MB} max {MAX_HASH_MB}")
+        self.send("engineok")
+
+    def isready(self, args):
+        """
+        Answers once the commands before it have been handled.
+        """
+        self.send("readyok")
+
+    def setoption(self, args):
+        """
+        Sets an option: "name Hash value MB". The transposition table is
+        made anew.
+        """
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.removeprefix("name ").strip()
+        if name.lower() != "hash":
+            raise ValueError(f"unknown option {name!r}")
+        try:
+            hash_mb = int(value)
+        except ValueError:
+            raise ValueError(f"Hash must be a whole number of MB, not "
+                             f"{value!r}") from None
+        if not MIN_HASH_MB <= hash_mb <= MAX_HASH_MB:
+            raise ValueError(f"Hash must be between {MIN_HASH_MB} and "
+                             f"{MAX_HASH_MB} MB")
+        self.stop()
+        self.hash_mb = hash_mb
+        self._drop_bot()
+
+    def newgame(self, args):
+        """
+        Starts a new game, of the size given or of the current size. What
+        the bot learned is forgotten.
+        """
+        size = self.position.size
+        if args:
+            size = _size(args[0])
+        self.stop()
+        self.position = start_snapshot(size)
+        self._drop_bot()
+
+    def set_position(self, args):
+        """
+        Sets the position: "startpos [size N]" or "fen FEN", then "moves
+        ..." played from it.
+        """
+        if not args:
+            raise ValueError("position needs startpos or fen")
+        moves = []
+        if "moves" in args:
+            at = args.index("moves")
+            args, moves = args[:at], args[at + 1:]
+        if args[0] == "startpos":
+            size = self.position.size
+            if len(args) == 3 and args[1] == "size":
+                size = _size(args[2])
+            elif len(args) != 1:
+                raise ValueError("expected position startpos [size N]")
+            position = start_snapshot(size)
+        elif args[0] == "fen" and len(args) == 2:
+            position = fen_to_snapshot(args[1])
+            _check_size(position.size)
+        else:
+            raise ValueError("expected position startpos or position fen FEN")
+        position = self._play(position, moves)
+        self.stop()
+        if position.size != self.position.size:
+            self._drop_bot()
+        self.position = position
+
+    def moves(self, args):
+        """
+        Plays moves from the current position.
+        """
+        position = self._play(self.position, args)
+        self.stop()
+        self.position = position
+
+    def go(self, args):
+        """
+        Starts searching the side to move: "depth D" (at most D),
+        "movetime MS" (at most MS milliseconds), "infinite" (until stop).
+        Without depth or movetime it searches until stop.
+        """
+        depth = MAX_DEPTH
+        time_ms = None
+        words = iter(args)
+        for word in words:
+            if word in ("depth", "movetime"):
+                try:
+                    value = int(next(words))
+                except (StopIteration, ValueError):
+                    raise ValueError(f"{word} needs a whole number") from None
+                if value < 0:
+                    raise ValueError(f"{word} cannot be negative")
+                if word == "depth":
+                    depth = min(value, MAX_DEPTH)
+                else:
+                    time_ms = value
+            elif word != "infinite":
+                raise ValueError(f"unknown go argument {word!r}")
+        self.stop()
+        self._search = _EngineSearch(self, depth, time_ms)
+
+    def stop(self, args=()):
+        """
+        Stops the running search, if any, and waits for its answer.
+        """
+        if self._search is not None:
+            self._search.cancel()
+            self._search = None
+
+    def print_position(self, args):
+        """
+        Writes the current position.
+        """
+        self.send(f"fen {snapshot_to_fen(self.position)}")
+
+    def bot(self):
+        """
+        Returns the engine's SmartBot, made for the size of the position at
+        the first search after a change of size or options.
+
+        Returns: SmartBot
+        """
+        if self._bot is None:
+            self._bot = SmartBot(Checkers(self.position.size),
+                                 PieceColor.BLACK, PieceColor.RED, MAX_DEPTH,
+                                 tt_size_mb=self.hash_mb)
+        return self._bot
+
+    def _drop_bot(self):
+        """
+        Private method: frees the bot, so the next search makes a new one.
+        """
+        if self._bot is not None:
+            self._bot.close()
+            self._bot = None
+
+    def _play(self, position, moves):
+        """
+        Private method: plays moves (PDN text) from position, checking that
+        each is legal, and returns the position reached.
+        """
+        board = Checkers(position.size)
+        for text in moves:
+            path = parse_move(text, position.size)
+            board.restore(position)
+            color = PieceColor.BLACK if position.black_to_move \
+                else PieceColor.RED
+            legal = [(mv.origin,) + tuple(mv.path)
+                     for mv in board.legal_moves(color)]
+            if path not in legal:
+                raise ValueError(f"illegal move {text}")
+            position = play_path(position, path)
+        return position
+
+
+class _EngineSearch(BackgroundSearch):
+    """
+    Private class: a search started by go, which sends an info line for
+    every depth it finishes and its move once it ends (also when stopped).
+    """
+
+    def __init__(self, engine, depth, time_ms):
+        """
+        Starts the search of the engine's position.
+        """
+        self.engine = engine
+        self.depth = depth
+        self.time_ms = time_ms
+        bot = engine.bot()
+        color = PieceColor.BLACK if engine.position.black_to_move \
+            else PieceColor.RED
+        bot.set_color(color)
+        super().__init__(bot, engine.position)
+
+    def _run(self, snapshot):
+        """
+        Private method: runs the search and sends its lines (in the
+        background thread).
+        """
+        bot = self.bot
+        board = bot._checkers
+        board.restore(snapshot)
+        size = snapshot.size
+        start = time.perf_counter()
+        line = []
+        try:
+            for depth, score, best_moves in bot.deepen(self.depth,
+                                                       self.time_ms):
+                if not best_moves:
+                    break
+                #the move is picked as choose_move does; the table's line
+                #is only shown if it starts with that very move (it names
+                #moves by code, not by the move itself)
+                _, first = bot.find_rand(best_moves)
+                line = bot.principal_variation(min(depth + 1, MAX_PV_MOVES))
+                if not line or (line[0].origin, tuple(line[0].path)) != \
+                        (first.origin, tuple(first.path)):
+                    line = [first]
+                elapsed = time.perf_counter() - start
+                nodes = bot._nodes
+                pv = " ".join(format_move((mv.origin,) + tuple(mv.path),
+                                          size) for mv in line)
+                self.engine.send(f"info depth {depth} score {score} "
+                                 f"nodes {nodes} time {int(1000 * elapsed)} "
+                                 f"nps {int(nodes / elapsed) if elapsed else 0}"
+                                 f" pv {pv}")
+        finally:
+            self._answer(line, board, size)
+
+    def _answer(self, line, board, size):
+        """
+        Private method: sends the bestmove line, from the deepest finished
+        depth (any legal move if none finished).
+        """
+        if not line:
+            moves = list(board.legal_moves(self.bot._color))
+            if not moves:
+                self.engine.send("bestmove none")
+                return
+            line = moves[:1]
+        words = ["bestmove", format_move((line[0].origin,)
+                                         + tuple(line[0].path), size)]
+        if len(line) > 1:
+            words += ["ponder", format_move((line[1].origin,)
+                                            + tuple(line[1].path), size)]
+        self.engine.send(" ".join(words))
+
+
+def _size(text):
+    """
+    Private function: reads a board size.
+    """
+    try:
+        size = int(text)
+    except ValueError:
+        raise ValueError(f"size must be a whole number, not {text!r}") \
+            from None
+    return _check_size(size)
+
+
+def _check_size(size):
+    """
+    Private function: returns size if it is a board size the game has.
+    """
+    if not 1 <= size <= 12:
+        raise ValueError("size must be between 1 and 12")
+    return size
+
+
+@click.command(name="engine")
+@click.option('--size', type=click.IntRange(1, 12), default=DEFAULT_SIZE,
+              help="Board size of the first game")
+@click.option('--hash', 'hash_mb',
+              type=click.IntRange(MIN_HASH_MB, MAX_HASH_MB),
+              default=DEFAULT_TT_MB,
+              help="Transposition table size in MB")
+def cmd(size, hash_mb):
+    engine = Engine()
+    engine.hash_mb = hash_mb
+    engine.position = start_snapshot(size)
+    engine.run()
+
+
+if __name__ == '__main__':
+    cmd()
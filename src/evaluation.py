@@ -0,0 +1,346 @@
+"""
+Weighted evaluation of checkers positions for the SmartBot search.
+
+A position is described by a feature vector, each feature counted for the
+side being evaluated minus the same count for its opponent:
+
+    men          men on the board
+    kings        kings on the board
+    advancement  rows the men have advanced from their own back row
+    back_rank    men still guarding their own back row
+    center       pieces on the central squares
+    mobility     single steps the pieces could take to an empty square
+    runaway      men that no opposing piece stands in front of (in the
+                 cone of squares ahead that could stop them)
+
+and scored as the dot product with a weight vector. The default weights
+(2 per man, 3 per king, 0 for the rest) give the original material score.
+Weights are integers, so scores stay integers for the transposition table.
+Features with weight 0 are not computed.
+
+evaluate_batch scores many positions at once from their bitmasks with NumPy
+(an optional dependency, only needed for the batch mode), for tuning and
+training tools.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Scoring a position for black with the default weights::
+
+        Evaluator().evaluate(checkers, PieceColor.BLACK)
+
+    2) A bot that also values advancement and runaway men::
+
+        weights = dict(DEFAULT_WEIGHTS, advancement=1, runaway=4)
+        SmartBot(checkers, color, opp, 4, evaluator=Evaluator(weights))
+
+    3) Scoring many (black, red, kings) bitmask triples for red::
+
+        Evaluator(weights).evaluate_batch(masks, 3, PieceColor.RED)
+"""
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitboard import BitBoard, GEOMETRY_CACHE_SIZE, KING_DIRECTIONS, \
+    BLACK_DIRECTIONS, RED_DIRECTIONS, shift, iter_bits
+from checkers import PieceColor, opposite_color
+
+#names of the features, in feature vector order
+FEATURES = ("men", "kings", "advancement", "back_rank", "center", "mobility",
+            "runaway")
+
+#weights giving the original score of king_dif + 2*pieces_dif
+DEFAULT_WEIGHTS = {"men": 2, "kings": 3, "advancement": 0, "back_rank": 0,
+                   "center": 0, "mobility": 0, "runaway": 0}
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def geometry(size):
+    """
+    Returns the masks the features of a board size are counted with (built
+    once per size, for the GEOMETRY_CACHE_SIZE most recent sizes).
+
+    Args:
+        size (int) : no. of rows of pieces
+
+    Returns:
+        dict : "position" (BitBoard, for its shift tables), "rows"
+        (list[int], the dark squares of each row), "back" and "cones"
+        (dict{bool: ...}, keyed by black: the back row mask, and for each
+        square the mask of the cone ahead of a man on it) and "center" (int)
+    """
+    position = BitBoard(size)
+    dim = position.dim
+    rows = [0] * dim
+    cones = {True: [0] * dim * dim, False: [0] * dim * dim}
+    center = 0
+    low, high = dim // 4, dim - dim // 4
+    for row in range(dim):
+        for col in range(dim):
+            if (row + col) % 2 == 0:
+                continue
+            bit = 1 << (row*dim + col)
+            rows[row] |= bit
+            if low <= row < high and low <= col < high:
+                center |= bit
+            for ahead in range(dim):
+                if ahead == row:
+                    continue
+                dist = abs(ahead - row)
+                for other in range(max(0, col - dist), min(dim, col + dist + 1)):
+                    if (ahead + other) % 2 == 1:
+                        cones[ahead > row][row*dim + col] |= 1 << (ahead*dim + other)
+    return {"position": position, "rows": rows, "center": center,
+            "back": {True: rows[0], False: rows[dim - 1]}, "cones": cones}
+
+
+class Evaluator:
+    """
+    Class scoring positions as a weighted sum of FEATURES.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #weight of each feature, in FEATURES order
+    weights: list
+
+    def __init__(self, weights=None):
+        """
+        Initializes the evaluator with a weight vector.
+
+        Args:
+            weights : dict{str: int} (weights by feature name; missing
+                features get weight 0) or list[int] (in FEATURES order), or
+                None for DEFAULT_WEIGHTS
+        """
+        if weights is None:
+            weights = DEFAULT_WEIGHTS
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(FEATURES)
+            if unknown:
+                raise ValueError(f"unknown features {sorted(unknown)}")
+            weights = [weights.get(name, 0) for name in FEATURES]
+        if len(weights) != len(FEATURES):
+            raise ValueError(f"need {len(FEATURES)} weights, got {len(weights)}")
+        if any(int(weight) != weight for weight in weights):
+            raise ValueError("weights must be integers")
+        self.weights = [int(weight) for weight in weights]
+        self._men_weight, self._kings_weight = self.weights[:2]
+        #(counting method, weight) of the other features that count
+        self._positional = [(getattr(self, "_count_" + name), weight)
+                            for name, weight
+                            in zip(FEATURES[2:], self.weights[2:]) if weight]
+
+    def evaluate(self, board, color):
+        """
+        Scores a position from the standpoint of color.
+
+        Args:
+            board : Checkers
+            color : Enum(PieceColor)
+
+        Returns:
+            int
+        """
+        men, kings = board.get_material(color)
+        opp_men, opp_kings = board.get_material(opposite_color[color])
+        score = self._men_weight * (men - opp_men) \
+            + self._kings_weight * (kings - opp_kings)
+        if self._positional:
+            position = board.get_position()
+            black = color == PieceColor.BLACK
+            for count, weight in self._positional:
+                score += weight * (count(position, black)
+                                   - count(position, not black))
+        return score
+
+    def features(self, board, color):
+        """
+        Returns the full feature vector of a position from the standpoint of
+        color.
+
+        Args:
+            board : Checkers
+            color : Enum(PieceColor)
+
+        Returns:
+            list[int] : in FEATURES order
+        """
+        return [self._feature(board, color, name) for name in FEATURES]
+
+    def _feature(self, board, color, name):
+        """
+        Private method: one feature of a position, color's count minus its
+        opponent's.
+        """
+        if name == "men":
+            return board.get_material(color)[0] \
+                - board.get_material(opposite_color[color])[0]
+        if name == "kings":
+            return board.get_material(color)[1] \
+                - board.get_material(opposite_color[color])[1]
+        position = board.get_position()
+        black = color == PieceColor.BLACK
+        count = getattr(self, "_count_" + name)
+        return count(position, black) - count(position, not black)
+
+    def _count_advancement(self, position, black):
+        """
+        Private method: rows advanced by the men of a side, summed.
+        """
+        men = position.own(black) & ~position.kings
+        rows = geometry(position.size)["rows"]
+        last = position.dim - 1
+        total = 0
+        for row, mask in enumerate(rows):
+            total += (men & mask).bit_count() * (row if black else last - row)
+        return total
+
+    def _count_back_rank(self, position, black):
+        """
+        Private method: men of a side on its own back row.
+        """
+        men = position.own(black) & ~position.kings
+        return (men & geometry(position.size)["back"][black]).bit_count()
+
+    def _count_center(self, position, black):
+        """
+        Private method: pieces of a side on the central squares.
+        """
+        return (position.own(black) & geometry(position.size)["center"]).bit_count()
+
+    def _count_mobility(self, position, black):
+        """
+        Private method: single steps to an empty square the pieces of a side
+        could take (jumps not included).
+        """
+        own = position.own(black)
+        forward = BLACK_DIRECTIONS if black else RED_DIRECTIONS
+        empty = position.empty()
+        total = 0
+        for d in KING_DIRECTIONS:
+            movers = own if d in forward else own & position.kings
+            movers &= position.can_step[d]
+            total += (shift(movers, position.steps[d]) & empty).bit_count()
+        return total
+
+    def _count_runaway(self, position, black):
+        """
+        Private method: men of a side with no opposing piece in the cone of
+        squares ahead of them.
+        """
+        men = position.own(black) & ~position.kings
+        opp = position.own(not black)
+        cones = geometry(position.size)["cones"][black]
+        return sum(1 for square in iter_bits(men) if not opp & cones[square])
+
+    def features_batch(self, positions, size, color):
+        """
+        Returns the feature vectors of many positions at once, computed with
+        NumPy from their bitmasks.
+
+        Args:
+            positions : iterable of (int, int, int) (black, red and kings
+                bitmasks) or of BitBoard
+            size : int (no. of rows of pieces of the boards)
+            color : Enum(PieceColor) (side the features are counted for)
+
+        Returns:
+            numpy.ndarray : int64 array of shape (len(positions),
+            len(FEATURES))
+        """
+        if np is None:
+            raise ImportError("evaluate_batch needs NumPy (pip install numpy)")
+        tables = _batch_geometry(size)
+        black, red, kings = _unpack(positions, tables["cells"])
+        men = {True: black & ~kings, False: red & ~kings}
+        side_kings = {True: black & kings, False: red & kings}
+        empty = tables["dark"] & ~(black | red)
+        counts = {}
+        for side in (True, False):
+            own = men[side] | side_kings[side]
+            opp = men[not side] | side_kings[not side]
+            steps = np.zeros(len(own), dtype=np.int64)
+            forward = BLACK_DIRECTIONS if side else RED_DIRECTIONS
+            for d in KING_DIRECTIONS:
+                src, dst = tables["steps"][d]
+                movers = own if d in forward else side_kings[side]
+                steps += (movers[:, src] & empty[:, dst]).sum(axis=1)
+            #float32 so the product runs in BLAS; the counts stay exact
+            blockers = opp.astype(np.float32) @ tables["cones"][side].T
+            counts[side] = np.stack([
+                men[side].sum(axis=1),
+                side_kings[side].sum(axis=1),
+                men[side].astype(np.int64) @ tables["advance"][side],
+                (men[side] & tables["back"][side]).sum(axis=1),
+                (own & tables["center"]).sum(axis=1),
+                steps,
+                (men[side] & (blockers == 0)).sum(axis=1),
+            ], axis=1).astype(np.int64)
+        side = color == PieceColor.BLACK
+        return counts[side] - counts[not side]
+
+    def evaluate_batch(self, positions, size, color):
+        """
+        Scores many positions at once from the standpoint of color (see
+        features_batch).
+
+        Returns:
+            numpy.ndarray : int64 array of scores
+        """
+        features = self.features_batch(positions, size, color)
+        return features @ np.array(self.weights, dtype=np.int64)
+
+
+def _unpack(positions, cells):
+    """
+    Private function: turns bitmask triples into three boolean arrays of
+    shape (len(positions), cells).
+    """
+    width = (cells + 7) // 8
+    masks = {0: [], 1: [], 2: []}
+    for item in positions:
+        if isinstance(item, BitBoard):
+            item = (item.black, item.red, item.kings)
+        for which in range(3):
+            masks[which].append(item[which].to_bytes(width, "little"))
+    arrays = []
+    for which in range(3):
+        raw = np.frombuffer(b"".join(masks[which]), dtype=np.uint8)
+        bits = np.unpackbits(raw.reshape(-1, width), axis=1, bitorder="little")
+        arrays.append(bits[:, :cells].astype(bool))
+    return arrays
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def _batch_geometry(size):
+    """
+    Private function: the masks of geometry(size) as NumPy arrays over the
+    squares, plus the (from, to) square index arrays of a step in each
+    direction.
+    """
+    shapes = geometry(size)
+    position = shapes["position"]
+    dim = position.dim
+    cells = dim * dim
+
+    def bits(mask):
+        return np.array([(mask >> i) & 1 for i in range(cells)], dtype=bool)
+
+    row_of = np.arange(cells) // dim
+    steps = {}
+    for d in KING_DIRECTIONS:
+        src = np.array(list(iter_bits(position.can_step[d])), dtype=np.int64)
+        steps[d] = (src, src + position.steps[d])
+    return {"cells": cells, "dark": bits(position.dark),
+            "center": bits(shapes["center"]),
+            "back": {side: bits(shapes["back"][side]) for side in (True, False)},
+            "advance": {True: row_of, False: dim - 1 - row_of},
+            "cones": {side: np.array([bits(cone) for cone in shapes["cones"][side]],
+                                     dtype=np.float32)
+                      for side in (True, False)},
+            "steps": steps}
@@ -0,0 +1,649 @@
+"""
+Game records: saving played games and replaying them.
+
+A game is kept as a GameRecord: its tags (players, event, termination, ...),
+the position it started from, the moves played (each as the squares the
+piece visited) and the result. Records are appended to a file as they are
+played, in one of two formats:
+
+    text (.pdn)  PDN-like: tag pairs, then the moves numbered in pairs, with
+                 dark squares numbered 1, 2, ... row by row from the top
+                 left ("9-13" for a step, "22x15x6" for a double jump)
+    binary       fixed header, then per game a short header, its tags, its
+                 start position packed as by Checkers.to_bytes and one byte
+                 (two on boards of more than 256 dark squares) per square of
+                 each move; a side file (path + ".idx") holds the offset of
+                 every game, so game i can be read without the ones before
+
+GameRecorder builds the record while a game is played, whatever way the
+moves are executed: it only looks at the position after each turn and works
+out which legal move led there. replay goes the other way without any move
+generation, playing each stored path straight onto the bitmasks, so
+positions can be rebuilt from millions of games quickly.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Recording a game as it is played and appending it to a file::
+
+        recorder = GameRecorder(checkers)
+        ... after every move: recorder.observe()
+        with open_writer("games.pdn") as writer:
+            writer.write(recorder.record({"Event": "test"}))
+
+    2) Every position of every game in a file::
+
+        for record in read_games("games.bin"):
+            for snapshot in replay(record):
+                ...
+
+    3) Game 1000 of a binary file, without reading the rest::
+
+        read_game("games.bin", 1000)
+
+    4) Counting the positions in a file from the command line::
+
+        python3 src/game_record.py games.bin
+"""
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+import click
+
+from bitboard import BitBoard
+from checkers import PieceColor, Snapshot, dark_squares, snapshot_to_fen, \
+    fen_to_snapshot, snapshot_to_bytes, bytes_to_snapshot
+
+#A played game:
+#tags (dict{str: str}) - PDN tag pairs, e.g. "Black", "Red", "Termination"
+#start (Snapshot) - the position before the first move
+#moves (tuple[tuple[int, ...], ...]) - each move as the bit indices of the
+#squares the piece visited, start square first
+#result (str) - one of RESULTS
+GameRecord = namedtuple("GameRecord", ["tags", "start", "moves", "result"])
+
+#PDN results: black (who moves first) won, red won, draw, not finished
+BLACK_WIN, RED_WIN, DRAW, UNFINISHED = "1-0", "0-1", "1/2-1/2", "*"
+RESULTS = (BLACK_WIN, RED_WIN, DRAW, UNFINISHED)
+
+#binary file header: magic, format version
+MAGIC = b"CKGR"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+
+#binary game header: board size, result (index in RESULTS), move count,
+#bytes of the start position, bytes of the tags
+GAME_HEADER = struct.Struct("<BBIHH")
+
+#one game offset in the index file
+OFFSET = struct.Struct("<Q")
+
+#moves per line of PDN move text
+PDN_MOVES_PER_LINE = 8
+
+
+def start_snapshot(size):
+    """
+    Returns the starting position of a board size as a Snapshot.
+
+    Args:
+        size (int) : no. of rows of pieces
+
+    Returns: Snapshot
+    """
+    position = BitBoard(size)
+    position.reset()
+    return Snapshot(size, position.black, position.red, position.kings,
+                    True, 0)
+
+
+def result_of(winner):
+    """
+    Returns the PDN result of a game given its winner.
+
+    Args:
+        winner : Enum(PieceColor) or None (a draw)
+
+    Returns: str
+    """
+    if winner is None:
+        return DRAW
+    return BLACK_WIN if winner == PieceColor.BLACK else RED_WIN
+
+
+def play_path(snapshot, path):
+    """
+    Plays a move given as the squares the piece visits onto a position,
+    without checking that it is legal: the piece moves to the last square,
+    every piece jumped over is taken and a man reaching the far row is
+    crowned.
+
+    Args:
+        snapshot : Snapshot (the side to move moves)
+        path : tuple[int, ...] (bit indices, start square first)
+
+    Returns: Snapshot
+    """
+    dim = 2 * snapshot.size + 2
+    black_to_move = snapshot.black_to_move
+    own, opp = (snapshot.black, snapshot.red) if black_to_move \
+        else (snapshot.red, snapshot.black)
+    kings = snapshot.kings
+    origin, dest = path[0], path[-1]
+    captured = 0
+    prev = origin
+    for land in path[1:]:
+        if abs(land - prev) > dim + 1:
+            #a jump: the piece taken stands half way
+            captured |= 1 << ((prev + land) // 2)
+        prev = land
+    from_bit, to_bit = 1 << origin, 1 << dest
+    king = kings & from_bit
+    own = own & ~from_bit | to_bit
+    opp &= ~captured
+    kings &= ~(captured | from_bit)
+    if king or dest // dim == (dim - 1 if black_to_move else 0):
+        kings |= to_bit
+    black, red = (own, opp) if black_to_move else (opp, own)
+    non_jump_moves = 0 if captured else snapshot.non_jump_moves + 1
+    return Snapshot(snapshot.size, black, red, kings, not black_to_move,
+                    non_jump_moves)
+
+
+def replay(record):
+    """
+    Yields every position of a recorded game, from the start position to
+    the one after the last move, by playing the stored paths onto the
+    bitmasks (see play_path).
+
+    Args:
+        record : GameRecord
+
+    Returns: generator of Snapshot
+    """
+    snapshot = record.start
+    yield snapshot
+    for path in record.moves:
+        snapshot = play_path(snapshot, path)
+        yield snapshot
+
+
+class GameRecorder:
+    """
+    Class recording the moves of a game played on a Checkers, by looking at
+    the position after every move.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #position the game started from
+    start: Snapshot
+
+    #moves played so far, as paths of bit indices
+    moves: list
+
+    def __init__(self, checkers):
+        """
+        Starts recording a game from the current position of checkers.
+
+        Args:
+            checkers : Checkers
+        """
+        self._checkers = checkers
+        self._position = BitBoard(checkers.snapshot().size)
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the moves recorded so far and starts again from the current
+        position (for the next game on the same board).
+
+        Args: None
+        Returns: None
+        """
+        self.start = self._checkers.snapshot()
+        self._last = self.start
+        self.moves = []
+
+    def observe(self):
+        """
+        Looks at the board: if a move has been completed since the last
+        look, finds which legal move it was and records it. Call it after
+        every move (calling it more often does no harm; a multi-jump played
+        a step at a time is recorded once it is finished).
+
+        Args: None
+        Returns: None
+        """
+        now = self._checkers.snapshot()
+        last = self._last
+        if now.black_to_move == last.black_to_move:
+            return
+        position = self._position
+        position.black, position.red, position.kings = \
+            last.black, last.red, last.kings
+        black = last.black_to_move
+        if position.has_jump(black):
+            paths = position.iter_jump_paths(black)
+        else:
+            paths = position.iter_quiet_paths(black)
+        for path, _ in paths:
+            after = play_path(last, path)
+            if after[:5] == now[:5]:
+                self.moves.append(tuple(path))
+                self._last = now
+                return
+        raise ValueError("the board did not change by a legal move")
+
+    def record(self, tags=None, winner=None, finished=True):
+        """
+        Returns the game recorded so far.
+
+        Args:
+            tags : dict{str: str} or None
+            winner : Enum(PieceColor) or None
+            finished : bool (False for a game still going on)
+
+        Returns: GameRecord
+        """
+        result = result_of(winner) if finished else UNFINISHED
+        return GameRecord(dict(tags or {}), self.start, tuple(self.moves),
+                          result)
+
+
+def _square_names(size):
+    """
+    Private function: the PDN number of each dark square's bit index, and
+    the bit index of each number.
+    """
+    squares, number = dark_squares(size)
+    return {index: str(n + 1) for index, n in number.items()}, squares
+
+
+def format_move(path, size):
+    """
+    Writes a move in PDN notation: the numbers of the squares the piece
+    visits, joined by "x" for a jump and "-" otherwise (e.g. "9-13",
+    "22x15x6").
+
+    Args:
+        path : tuple[int, ...] (bit indices, start square first)
+        size : int (no. of rows of pieces)
+
+    Returns: str
+    """
+    names, _ = _square_names(size)
+    dim = 2 * size + 2
+    jump = abs(path[1] - path[0]) > dim + 1
+    return ("x" if jump else "-").join(names[i] for i in path)
+
+
+def parse_move(text, size):
+    """
+    Reads a move written by format_move (without checking it is legal).
+
+    Args:
+        text : str
+        size : int (no. of rows of pieces)
+
+    Returns: tuple[int, ...] (bit indices, start square first)
+    """
+    _, squares = _square_names(size)
+    parts = text.replace("x", "-").split("-")
+    try:
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"{text!r} is not a move") from None
+    if len(numbers) < 2 or not all(1 <= n <= len(squares) for n in numbers):
+        raise ValueError(f"{text!r} is not a move")
+    return tuple(squares[n - 1] for n in numbers)
+
+
+def format_pdn(record):
+    """
+    Writes a game in the text format.
+
+    Args:
+        record : GameRecord
+
+    Returns: str (ending with a blank line)
+    """
+    start = record.start
+    tags = dict(record.tags)
+    tags["Size"] = str(start.size)
+    if start != start_snapshot(start.size):
+        tags["FEN"] = snapshot_to_fen(start)
+    tags["Result"] = record.result
+    lines = [f'[{key} "{value}"]' for key, value in tags.items()]
+    lines.append("")
+    #one entry per move number: "12. 9-13 22x15"
+    numbered = []
+    ply = 0 if start.black_to_move else 1
+    if ply:
+        numbered.append(["1..."])
+    for path in record.moves:
+        if ply % 2 == 0:
+            numbered.append([f"{ply // 2 + 1}."])
+        numbered[-1].append(format_move(path, start.size))
+        ply += 1
+    numbered.append([record.result])
+    for first in range(0, len(numbered), PDN_MOVES_PER_LINE):
+        lines.append(" ".join(" ".join(entry) for entry
+                              in numbered[first:first + PDN_MOVES_PER_LINE]))
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_pdn(text):
+    """
+    Reads the games in PDN-like text written by format_pdn, one at a time.
+
+    Args:
+        text : str, or an iterable of lines (e.g. an open text file, which
+            is then read as the games are yielded)
+
+    Returns: generator of GameRecord
+    """
+    if isinstance(text, str):
+        text = text.splitlines()
+    tags = {}
+    words = []
+    for line in itertools.chain(text, [""]):
+        line = line.strip()
+        if line.startswith("["):
+            if words:
+                yield _pdn_game(tags, words)
+                tags, words = {}, []
+            key, _, value = line[1:-1].partition(" ")
+            tags[key] = value.strip('"')
+        elif line:
+            words.extend(line.split())
+        elif words:
+            yield _pdn_game(tags, words)
+            tags, words = {}, []
+
+
+def _pdn_game(tags, words):
+    """
+    Private function: builds a GameRecord from PDN tags and move text.
+    """
+    size = int(tags.pop("Size", "3"))
+    start = start_snapshot(size)
+    if "FEN" in tags:
+        start = fen_to_snapshot(tags.pop("FEN"))
+    result = tags.pop("Result", UNFINISHED)
+    moves = []
+    for word in words:
+        if word in RESULTS:
+            result = word
+        elif not word.endswith("."):
+            moves.append(parse_move(word, size))
+    return GameRecord(tags, start, tuple(moves), result)
+
+
+class PDNWriter:
+    """
+    Class appending games to a text (PDN-like) file.
+    """
+    def __init__(self, path):
+        """
+        Opens path for appending.
+
+        Args:
+            path (str)
+        """
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        """
+        Appends a game and flushes it to the file.
+
+        Args:
+            record : GameRecord
+
+        Returns: None
+        """
+        self._file.write(format_pdn(record))
+        self._file.flush()
+
+    def close(self):
+        """
+        Closes the file.
+
+        Args: None
+        Returns: None
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _square_width(size):
+    """
+    Private function: bytes per square number in the binary format.
+    """
+    return 1 if len(dark_squares(size)[0]) <= 256 else 2
+
+
+def pack_game(record):
+    """
+    Packs a game in the binary format (without the file header).
+
+    Args:
+        record : GameRecord
+
+    Returns: bytes
+    """
+    start = record.start
+    size = start.size
+    _, number = dark_squares(size)
+    width = _square_width(size)
+    tags = json.dumps(record.tags, separators=(",", ":")).encode("utf-8")
+    packed_start = snapshot_to_bytes(start)
+    moves = bytearray()
+    for path in record.moves:
+        moves.append(len(path))
+        for index in path:
+            moves += number[index].to_bytes(width, "little")
+    return GAME_HEADER.pack(size, RESULTS.index(record.result),
+                            len(record.moves), len(packed_start), len(tags)) \
+        + tags + packed_start + moves
+
+
+def _unpack_game(data, offset):
+    """
+    Private function: unpacks the game starting at offset of data.
+
+    Returns:
+        (GameRecord, int) : the game and the offset just past it
+    """
+    size, result, count, start_len, tags_len = \
+        GAME_HEADER.unpack_from(data, offset)
+    offset += GAME_HEADER.size
+    tags = json.loads(bytes(data[offset:offset + tags_len]).decode("utf-8"))
+    offset += tags_len
+    start = bytes_to_snapshot(bytes(data[offset:offset + start_len]))
+    offset += start_len
+    squares, _ = dark_squares(size)
+    width = _square_width(size)
+    moves = []
+    for _ in range(count):
+        length = data[offset]
+        offset += 1
+        if width == 1:
+            path = tuple(squares[n] for n in data[offset:offset + length])
+        else:
+            path = tuple(squares[int.from_bytes(data[i:i + 2], "little")]
+                         for i in range(offset, offset + 2 * length, 2))
+        offset += width * length
+        moves.append(path)
+    return GameRecord(tags, start, tuple(moves), RESULTS[result]), offset
+
+
+class BinaryWriter:
+    """
+    Class appending games to a binary game file and its index.
+    """
+    def __init__(self, path):
+        """
+        Opens path (and path + ".idx") for appending, writing the file
+        header if the file is new.
+
+        Args:
+            path (str)
+        """
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._index = open(path + ".idx", "ab")
+
+    def write(self, record):
+        """
+        Appends a game, and its offset to the index, and flushes both.
+
+        Args:
+            record : GameRecord
+
+        Returns: None
+        """
+        self._index.write(OFFSET.pack(self._file.tell()))
+        self._file.write(pack_game(record))
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        """
+        Closes the files.
+
+        Args: None
+        Returns: None
+        """
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(path):
+    """
+    Opens a game file for appending: text if path ends in .pdn, binary
+    otherwise.
+
+    Args:
+        path (str)
+
+    Returns: PDNWriter or BinaryWriter
+    """
+    if path.lower().endswith(".pdn"):
+        return PDNWriter(path)
+    return BinaryWriter(path)
+
+
+def read_games(path):
+    """
+    Yields the games in a game file of either format, in order. The file is
+    read as the games are yielded (a binary file through a memory map), so
+    files of millions of games can be streamed.
+
+    Args:
+        path (str)
+
+    Returns: generator of GameRecord
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    if not binary:
+        with open(path, encoding="utf-8") as f:
+            yield from parse_pdn(f)
+        return
+    with open(path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version = HEADER.unpack_from(data, 0)
+        if version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game file")
+        offset = HEADER.size
+        while offset < len(data):
+            record, offset = _unpack_game(data, offset)
+            yield record
+
+
+def count_games(path):
+    """
+    Returns the number of games in a binary game file, from its index.
+
+    Args:
+        path (str)
+
+    Returns: int
+    """
+    return os.path.getsize(path + ".idx") // OFFSET.size
+
+
+def read_game(path, index):
+    """
+    Reads game number index (from 0) of a binary game file, through its
+    index.
+
+    Args:
+        path (str)
+        index (int)
+
+    Returns: GameRecord
+    """
+    with open(path + ".idx", "rb") as f:
+        f.seek(index * OFFSET.size)
+        entry = f.read(OFFSET.size)
+        following = f.read(OFFSET.size)
+    if len(entry) != OFFSET.size:
+        raise IndexError(f"{path} has no game {index}")
+    offset, = OFFSET.unpack(entry)
+    #the game ends where the next one starts, or at the end of the file
+    if len(following) == OFFSET.size:
+        end, = OFFSET.unpack(following)
+    else:
+        end = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(end - offset)
+    return _unpack_game(data, 0)[0]
+
+
+@click.command(name="game_record")
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--pdn', is_flag=True,
+              help="Print the games as PDN text instead of counting them")
+
+def cmd(path, pdn):
+    start = time.perf_counter()
+    games = positions = 0
+    results = dict.fromkeys(RESULTS, 0)
+    for record in read_games(path):
+        if pdn:
+            print(format_pdn(record), end="")
+            continue
+        games += 1
+        results[record.result] += 1
+        for _ in replay(record):
+            positions += 1
+    if pdn:
+        return
+    seconds = time.perf_counter() - start
+    print(f"{games} games, {positions} positions in {seconds:.2f}s "
+          f"({positions / seconds if seconds else 0:,.0f} positions/s)")
+    print(f"black {results[BLACK_WIN]}, red {results[RED_WIN]}, "
+          f"draws {results[DRAW]}, unfinished {results[UNFINISHED]}")
+
+
+if __name__ == "__main__":
+    cmd()
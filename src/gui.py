@@ -12,7 +12,10 @@ import sys
 import time
 
 from checkers import Board, Square, Piece, Moves, PieceColor, Checkers
-from bot_minimax import SmartBot, RandomBot, BotPlayer, Move_Tree
+from bot_minimax import RandomBot, BotPlayer, Move_Tree
+from session import BotSession
+from game_record import GameRecorder, open_writer
+from render import BoardRenderer
 from enum import Enum
 
 import os
@@ -46,73 +49,48 @@ Background = Gray
 WIDTH = 600
 HEIGHT = 600
 
-def draw_board(surface: pygame.surface.Surface, game, move=None):
+# Seconds a bot move is held back, so that moves can be followed on screen
+BOT_MOVE_DELAY_S = 0.5
+
+def thinking_label(font, progress):
     """
-    Draws the state of the board in the window
-    
+    Renders the banner drawn over the top left of the board while a bot is
+    thinking, with the depth it is searching and the nodes it has searched
+    so far
+
     Args:
-        surface: Pygame surface to draw the board on
-        board: The board to draw
+        font: Pygame font to write with
+        progress: dict with "depth" and "nodes" (see SmartBot.progress)
 
-    Returns: None
+    Returns: pygame.Surface
     """
-    
-    grid = game.get_board().board
-    board_dim = game._board_dim
-
-    rh = HEIGHT / (board_dim)
-    cw = WIDTH / (board_dim)
-    for row in range(board_dim):
-        for col in range(board_dim):
-            rect = (col * cw, row * rh, cw, rh)
-            if (row + col)%2 == 0:
-                pygame.draw.rect(surface, color=White, rect=rect, width=0)
-            else:
-                pygame.draw.rect(surface, color=Black, rect=rect, width=0)
-
-    for i, row in enumerate(grid):
-        for j, square in enumerate(row):
-            if square.is_empty():
-                continue
-            is_king = square.piece.is_king
-            color = square.piece.color
-            circle_color = None
-            king_color = None
-            if color == PieceColor.BLACK:
-                circle_color = (52, 110, 235)
-                if is_king:
-                    king_color = (107, 141, 191)
-            elif color == PieceColor.RED:
-                circle_color = (255, 0, 0)
-                if is_king:
-                    king_color = (217, 113, 151)
-
-            center = (j * cw + cw // 2, i * rh + rh // 2)
-            radius = rh // 2 - (rh//10)
-            pygame.draw.circle(surface, color=circle_color,
-                               center=center, radius=radius)
-            if is_king:
-                king_radius = radius - (rh//6)
-                pygame.draw.circle(surface, color=king_color, center=center, radius=king_radius)
-
-    border_size = int(rh // 12)
-    if move is not None:
-        r = move.location.row
-        c = move.location.col
-        rect = (c * cw, r * rh, cw, rh)
-        pygame.draw.rect(surface, color=Dark_Gray, rect=rect, width=border_size)
-        for move in move.children:
-            row = move.location.row
-            col = move.location.col
-            rect = (col * cw, row * rh, cw, rh)
-            pygame.draw.rect(surface, color=(148, 214, 81), rect=rect, width=border_size)
-
-def play_checkers(game: Checkers, player1: str, player2: str):
+    text = "Thinking..."
+    if progress["depth"] is not None:
+        text += f" depth {progress['depth']}, {progress['nodes']:,} nodes"
+    return font.render(text, True, White, Black)
+
+def play_checkers(game: Checkers, player1: str, player2: str, time_ms=None,
+                  workers=None, parallel="root", record_path=None,
+                  ponder=False):
     """
-    Plays a game of checkers on a Pygame window
+    Plays a game of checkers on a Pygame window. Smart bots think in a
+    background thread while the window keeps being drawn, and each frame
+    only redraws the squares that changed (see render.BoardRenderer).
 
     Args:
         board: The board to play on
+        time_ms: Optional time limit per move for smart bots, in
+            milliseconds. Without one they search to a fixed depth.
+        workers: Optional number of processes smart bots search with.
+        parallel: How the workers share a search: "root" splits the root
+            moves between them (only without a time limit), "lazy" has them
+            all search the position with a shared transposition table.
+        record_path: Optional game file the game is appended to (see
+            game_record; PDN text if it ends in .pdn), also when the window
+            is closed before the end.
+        ponder: Whether a smart bot playing a human keeps searching during
+            the human's turn (see SmartBot.ponder), so that it can answer
+            the move it expected at once.
 
     Returns: None
 
@@ -131,7 +109,8 @@ def play_checkers(game: Checkers, player1: str, player2: str):
 
     pygame.key.set_repeat(50,100)
 
-    draw_board(surface, game)
+    renderer = BoardRenderer(surface)
+    pygame.display.update(renderer.draw(game))
 
     board_dim = game._board_dim
     square_size = HEIGHT // (board_dim)
@@ -143,25 +122,64 @@ def play_checkers(game: Checkers, player1: str, player2: str):
     color_player = {PieceColor.BLACK : player1,
                   PieceColor.RED : player2}
     depth = 2
+    if time_ms is not None:
+        #search as deep as the time limit allows
+        depth = None
+    #smart bots are kept for the whole game in sessions, which are told
+    #every move and search a copy of the game, so it can be drawn meanwhile
+    sessions = {}
+    for color, player in color_player.items():
+        if player == "Smart":
+            #pondering is for human opponents (two bots would slow each
+            #other down)
+            human = color_player[opposite_color[color]] == "Human"
+            sessions[color] = BotSession(game, color, depth,
+                                         ponder=ponder and human,
+                                         time_budget_ms=time_ms,
+                                         workers=workers, parallel=parallel)
+    #the smart bot move being searched, when a random bot's turn began and
+    #how many recorded moves the sessions have been told
+    search = None
+    random_since = None
+    followed = 0
+    thinking_font = pygame.font.Font('freesansbold.ttf', 18)
+    recorder = GameRecorder(game)
+    tags = {"Event": "gui", "Black": player1, "Red": player2}
+
+    def save_game(finished):
+        #appends the game to record_path, if given
+        if record_path is not None:
+            with open_writer(record_path) as writer:
+                writer.write(recorder.record(tags, game.get_winner(),
+                                             finished))
+
     while True:
         human_move = False
         if color_player[current]  == "Smart":
-            sbot = SmartBot(game, current, opposite_color[current], depth)
-            move = sbot.suggest_move()
-            game.execute_single_move_rand(move[0], move[1])
-            current = opposite_color[current]
-            time.sleep(0.5)
+            if search is None:
+                search = sessions[current].start_search()
+            elif search.done() and search.elapsed() >= BOT_MOVE_DELAY_S:
+                move = search.result()
+                search = None
+                game.execute_single_move_rand(game.to_move_tree(move), 0)
+                current = opposite_color[current]
         elif color_player[current] == "Random":
-            rbot = RandomBot(game, current)
-            move = rbot.suggest_move()
-            game.execute_single_move_rand(move[0], move[1])
-            current = opposite_color[current]
-            time.sleep(0.5)
+            if random_since is None:
+                random_since = time.perf_counter()
+            elif time.perf_counter() - random_since >= BOT_MOVE_DELAY_S:
+                random_since = None
+                rbot = RandomBot(game, current)
+                move = rbot.suggest_move()
+                game.execute_single_move_rand(move[0], move[1])
+                current = opposite_color[current]
         else:
             human_move = True
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                for session in sessions.values():
+                    session.close()
+                save_game(False)
                 pygame.quit()
                 sys.exit()
 
@@ -215,11 +233,21 @@ def play_checkers(game: Checkers, player1: str, player2: str):
                     current_move = None
             """
 
-        draw_board(surface, game, current_move)
-        pygame.display.update()
+        overlay = None
+        if search is not None and not search.done():
+            overlay = thinking_label(thinking_font, search.progress())
+        pygame.display.update(renderer.draw(game, current_move, overlay))
         clock.tick(24)
+        recorder.observe()
+        for path in recorder.moves[followed:]:
+            for session in sessions.values():
+                session.played(path)
+        followed = len(recorder.moves)
         is_done = game.is_done(current)
         if is_done:
+            for session in sessions.values():
+                session.close()
+            save_game(True)
             winner = opposite_color[current].name
 
             if winner == "BLACK":
@@ -249,10 +277,30 @@ play_checkers(c)
 @click.option('--size', default = 3)
 @click.option('--player1', default = "Human")
 @click.option('--player2', default = "Human")
-def cmd(size, player1, player2):
+@click.option('--time-ms', type = click.INT, default = None,
+              help = "Time limit per move for smart bots, in milliseconds")
+@click.option('--workers', type = click.INT, default = None,
+              help = "Processes smart bots search with")
+@click.option('--parallel', type = click.Choice(['root', 'lazy']),
+              default = 'root',
+              help = "Split the root moves between the workers (not with "
+                     "--time-ms), or have them share a hash table (lazy SMP)")
+@click.option('--record', 'record_path', type = click.Path(dir_okay = False),
+              default = None,
+              help = "Append the game to this file (PDN text if it ends in "
+                     ".pdn, binary otherwise)")
+@click.option('--ponder', is_flag = True,
+              help = "Let a smart bot keep searching during a human's turn")
+def cmd(size, player1, player2, time_ms, workers, parallel, record_path,
+        ponder):
+    if time_ms is not None and workers is not None and workers > 1 \
+            and parallel == "root":
+        raise click.BadParameter("root splitting cannot be combined with "
+                                 "--time-ms", param_hint = "--workers")
     board_size = size
     c = Checkers(board_size)
-    play_checkers(c, player1, player2)
+    play_checkers(c, player1, player2, time_ms, workers, parallel,
+                  record_path, ponder)
 
 if __name__ == '__main__':
     cmd()
\ No newline at end of file
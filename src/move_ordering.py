@@ -0,0 +1,128 @@
+"""
+Move ordering for the SmartBot alpha-beta search.
+
+Alpha-beta prunes the most when the best move is searched first. MoveOrderer
+ranks the moves of a position: the transposition table's best
+move first, then captures (more captured pieces first), then promotions,
+then killer moves (quiet moves that caused a cutoff at the same ply
+elsewhere in the tree), then the rest by their history score (how often and
+how deep they caused cutoffs so far).
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Ordering the moves of a position at ply 2::
+
+        orderer = MoveOrderer()
+        ordered = orderer.order(board, mvs, 2, tt_move, bot.move_key)
+
+    2) Telling the orderer that a quiet move caused a cutoff at ply 2::
+
+        orderer.record_cutoff(move_key, True, 2, depth)
+"""
+
+#killer moves remembered per ply
+KILLER_SLOTS = 2
+
+#ranks of the kinds of moves, best first
+TT_RANK, CAPTURE_RANK, PROMOTION_RANK, KILLER_RANK, QUIET_RANK = 4, 3, 2, 1, 0
+
+
+class MoveOrderer:
+    """
+    Class keeping the killer move and history tables of a bot's searches
+    and using them to order moves.
+    """
+    def __init__(self):
+        """
+        Initializes empty killer and history tables.
+        """
+        self._killers = []
+        self._history = {}
+
+    def new_search(self):
+        """
+        Prepares the tables for a new search: killers are forgotten and
+        history scores are halved so recent searches count the most.
+
+        Args: None
+        Returns: None
+        """
+        self._killers = []
+        for key in self._history:
+            self._history[key] //= 2
+
+    def stats(self):
+        """
+        Returns the size of the tables: plies with killer moves and moves
+        with a history score.
+
+        Args: None
+
+        Returns:
+            dict[str, int] : killer_plies and history_moves
+        """
+        return {"killer_plies": len(self._killers),
+                "history_moves": len(self._history)}
+
+    def order(self, board, mvs, ply, tt_move, move_key):
+        """
+        Returns the moves of mvs, best candidates first.
+
+        Args:
+            board : Checkers (position the moves belong to)
+            mvs : list[LegalMove] (moves of the side to move)
+            ply : int (distance from the root of the search)
+            tt_move : int (key of the transposition table's best move, or
+                NO_MOVE)
+            move_key : function(LegalMove) -> int (names a move the same way
+                the transposition table does)
+
+        Returns:
+            list[LegalMove]
+        """
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        position = board.get_position()
+        crown_rows = position.black_crown_row | position.red_crown_row
+        ranked = []
+        for mv in mvs:
+            key = move_key(mv)
+            if key == tt_move:
+                rank = (TT_RANK, 0)
+            elif mv.captured:
+                rank = (CAPTURE_RANK, mv.captured.bit_count())
+            elif not (position.kings >> mv.origin) & 1 \
+                    and (crown_rows >> mv.path[-1]) & 1:
+                #a man reaching an end row (its far one) is crowned
+                rank = (PROMOTION_RANK, 0)
+            elif key in killers:
+                rank = (KILLER_RANK, -killers.index(key))
+            else:
+                rank = (QUIET_RANK, self._history.get(key, 0))
+            ranked.append((rank, mv))
+        ranked.sort(key=lambda entry: entry[0], reverse=True)
+        return [mv for _, mv in ranked]
+
+    def record_cutoff(self, key, is_quiet, ply, depth):
+        """
+        Records that a move caused a beta cutoff. Quiet moves become killers
+        at their ply and gain history score.
+
+        Args:
+            key : int (key of the move)
+            is_quiet : bool (whether the move captures nothing)
+            ply : int (distance from the root of the search)
+            depth : int (remaining depth of the node)
+
+        Returns: None
+        """
+        if not is_quiet:
+            return
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[KILLER_SLOTS:]
+        self._history[key] = self._history.get(key, 0) + (depth + 1) ** 2
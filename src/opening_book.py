@@ -0,0 +1,275 @@
+"""
+Opening book for SmartBot.
+
+Every game starts from the same position, so the first moves can be worked
+out once instead of being searched again in every game. build_book plays a
+number of self-play openings with a SmartBot and counts, for every position
+it passes through, how often each move was chosen (the bot's choice among
+equally good moves is random, so the openings branch out). write_book stores
+the counts as a binary file of fixed-size records, (Zobrist hash, move,
+weight), sorted by hash, and OpeningBook finds a position's moves with a
+binary search over the memory-mapped file. A SmartBot given a book plays a
+book move, picked at random in proportion to its weight, whenever its
+position is in the book, and searches as usual otherwise.
+
+Moves are stored by their code (see move_code), which covers every square
+the piece visits.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Building a book of 100 openings, 8 plies long, searched to depth 6::
+
+        python3 src/opening_book.py --size 3 --depth 6 --plies 8 --games 100 -o book-3.bin
+
+    2) A bot playing from it::
+
+        SmartBot(checkers, color, opp, 4, book=OpeningBook("book-3.bin"))
+"""
+import bisect
+import mmap
+import random
+import struct
+import time
+import click
+
+from checkers import Checkers
+
+#file header: magic, format version, board size, record count
+MAGIC = b"CKOB"
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+
+#one record: position hash, move code, weight
+RECORD = struct.Struct("<QQI")
+
+#hashes are stored in 64 bits
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+#move codes are kept below this prime (2**61 - 1)
+MOVE_CODE_MODULUS = 2**61 - 1
+
+
+def move_code(move, board_dim):
+    """
+    Returns an integer naming a move by all the squares it visits (what
+    the transposition table and the book store). The squares are read as
+    the digits of a number (square + 1 in base board_dim**2), which names
+    moves of up to six squares exactly; longer jumps are reduced modulo
+    MOVE_CODE_MODULUS, so two of them in one position share a code with a
+    chance of about 2**-61.
+
+    Args:
+        move : LegalMove
+        board_dim : int
+
+    Returns:
+        int (0 <= code < MOVE_CODE_MODULUS)
+    """
+    cells = board_dim * board_dim
+    code = move.origin + 1
+    for square in move.path:
+        code = (code * cells + square + 1) % MOVE_CODE_MODULUS
+    return code
+
+
+class OpeningBook:
+    """
+    Class reading an opening book file through mmap.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #board size the book is for
+    size: int
+
+    #number of (position, move) records
+    records: int
+
+    def __init__(self, path):
+        """
+        Opens a book file written by write_book.
+
+        Args:
+            path (str)
+        """
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, records = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.size = size
+        self.records = records
+
+    def _hash_at(self, i):
+        """
+        Private method: the hash of record i.
+        """
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)[0]
+
+    def lookup(self, key):
+        """
+        Returns the book moves of a position.
+
+        Args:
+            key (int) : Zobrist hash of the position
+
+        Returns:
+            list[(int, int)] : (move code, weight) pairs, empty if the
+            position is not in the book
+        """
+        key &= HASH_MASK
+        records = range(self.records)
+        first = bisect.bisect_left(records, key, key=self._hash_at)
+        moves = []
+        for i in range(first, self.records):
+            stored, code, weight = RECORD.unpack_from(
+                self._map, HEADER.size + i * RECORD.size)
+            if stored != key:
+                break
+            moves.append((code, weight))
+        return moves
+
+    def moves(self, board):
+        """
+        Returns the book moves of the position on a board, as legal moves of
+        the color to move (a stored move that is not legal there, which a
+        hash collision could give, is left out).
+
+        Args:
+            board : Checkers
+
+        Returns:
+            list[(LegalMove, int)] : moves and their weights
+        """
+        if board.get_board_dim() != 2 * self.size + 2:
+            return []
+        weights = dict(self.lookup(board.zobrist_hash()))
+        if not weights:
+            return []
+        dim = board.get_board_dim()
+        found = []
+        for move in board.legal_moves(board.get_turn()):
+            code = move_code(move, dim)
+            if code in weights:
+                found.append((move, weights[code]))
+        return found
+
+    def choose(self, board):
+        """
+        Picks a book move for the position on a board at random, in
+        proportion to the weights.
+
+        Args:
+            board : Checkers
+
+        Returns:
+            LegalMove or None : None if the position is not in the book
+        """
+        found = self.moves(board)
+        if not found:
+            return None
+        moves, weights = zip(*found)
+        return random.choices(moves, weights)[0]
+
+    def close(self):
+        """
+        Closes the file.
+
+        Args: None
+        Returns: None
+        """
+        self._map.close()
+
+
+def write_book(path, size, weights):
+    """
+    Writes a book file.
+
+    Args:
+        path (str) : file to write
+        size (int) : board size of the book
+        weights : dict{(int, int): int} (weight of each (position hash,
+            move code) pair)
+
+    Returns: None
+    """
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, size, len(weights)))
+        for (key, code), weight in sorted(weights.items()):
+            out.write(RECORD.pack(key & HASH_MASK, code, weight))
+
+
+def build_book(size, depth, plies, games, progress=None):
+    """
+    Plays games self-play openings of plies plies with SmartBots searching
+    to depth, and counts how often each move was played in each position.
+    A position is searched once, however many openings pass through it.
+
+    Args:
+        size (int) : board size
+        depth (int) : search depth of the bots
+        plies (int) : length of each opening
+        games (int) : number of openings
+        progress : function(str) or None (told how far it got)
+
+    Returns:
+        dict{(int, int): int} : weight of each (position hash, move code)
+    """
+    #imported here as bot_minimax imports this module for SmartBot's book
+    from bot_minimax import SmartBot
+    from checkers import opposite_color
+
+    board = Checkers(size)
+    dim = board.get_board_dim()
+    bots = {color: SmartBot(board, color, opposite_color[color], depth)
+            for color in opposite_color}
+    best = {}
+    weights = {}
+    for game in range(games):
+        board._populate()
+        for _ in range(plies):
+            color = board.get_turn()
+            key = board.zobrist_hash() & HASH_MASK
+            if key not in best:
+                best[key] = bots[color].iterative_deepening()
+            if not best[key]:
+                break
+            _, move = bots[color].find_rand(best[key])
+            pair = (key, move_code(move, dim))
+            weights[pair] = weights.get(pair, 0) + 1
+            board.make_legal_move(move)
+        if progress is not None:
+            progress(f"{game + 1}/{games} openings, {len(best)} positions")
+    return weights
+
+
+@click.command(name="opening_book")
+@click.option('--size', type=click.INT, default=3,
+              help="Board size n for a (2n + 2)x(2n + 2) board")
+@click.option('--depth', type=click.INT, default=6,
+              help="Search depth of the self-play bots")
+@click.option('--plies', type=click.INT, default=8,
+              help="Length of each opening")
+@click.option('--games', type=click.INT, default=100,
+              help="Number of self-play openings")
+@click.option('--seed', type=click.INT, default=None)
+@click.option('-o', '--output', type=click.Path(dir_okay=False),
+              default=None, help="File to write (default book-SIZE.bin)")
+
+def cmd(size, depth, plies, games, seed, output):
+    if output is None:
+        output = f"book-{size}.bin"
+    random.seed(seed)
+    start = time.perf_counter()
+    weights = build_book(size, depth, plies, games,
+                         lambda line: print("\r" + line, end="", flush=True))
+    print("")
+    write_book(output, size, weights)
+    print(f"wrote {len(weights)} moves to {output} in "
+          f"{time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    cmd()
@@ -0,0 +1,256 @@
+"""
+Perft: counts the positions reachable in a given number of moves, to check
+move generation for correctness and time it.
+
+Every legal move is played with make_legal_move and taken back with
+unmake_move, depth moves deep, and the positions at the bottom are counted
+(a side that cannot move ends its line early, so that line adds nothing).
+The counts from the starting position are compared with a stored table of
+reference counts, so a change to the move generator that gets a count wrong
+shows up at once. With --legacy the moves come from the move trees of
+valid_moves, walked square by square (Checkers(size, use_bitboard=False)),
+which gives an independent second count.
+
+Author: Daniel Chen
+
+Example calls:
+
+    1) Counting the positions 6 moves deep on the default board::
+
+        python3 src/perft.py --size 3 --depth 6
+
+    2) The same, broken down by first move::
+
+        python3 src/perft.py --size 3 --depth 6 --divide
+
+    3) Counting from a position saved as str(checkers) prints it, red to move::
+
+        python3 src/perft.py --size 3 --depth 4 --position board.txt --turn red
+
+    4) Counting from a position given as text (see Checkers.to_fen)::
+
+        python3 src/perft.py --depth 4 --fen "3:R:B1,6,K14:R20,27,30:0"
+
+    5) Checking every stored reference count up to depth 6::
+
+        python3 src/perft.py --check --depth 6
+
+    6) From Python::
+
+        perft(Checkers(3), 6)
+"""
+import time
+import click
+
+from checkers import Checkers, LegalMove, PieceColor, fen_to_snapshot
+
+#column letters, as in the TUI
+COLUMNS = "abcdefghijklmnopqrstuvwxyz"
+
+#perft counts from the starting position, black to move: for each board size,
+#the counts at depth 1, 2, 3, ...
+REFERENCE = {
+    1: [3, 9, 12, 16, 22, 26, 40, 59, 105, 194, 355, 591],
+    2: [5, 25, 106, 369, 1271, 4104, 12495, 37474, 104013],
+    3: [7, 49, 302, 1469, 7361, 36768, 179740],
+    4: [9, 81, 658, 4265, 26875, 164406],
+    5: [11, 121, 1222, 10053, 78629],
+    6: [13, 169, 2042, 20513, 194687],
+    8: [17, 289, 4642, 64089],
+    12: [25, 625, 15026, 323849],
+}
+
+
+def tree_moves(checkers, color):
+    """
+    Yields every complete move of color as a LegalMove, taken from the move
+    trees of valid_moves (one per path from the root of a tree to a leaf).
+
+    Args:
+        checkers : Checkers
+        color : Enum(PieceColor)
+
+    Returns:
+        generator of LegalMove
+    """
+    dim = checkers.get_board_dim()
+    for tree in checkers.valid_moves(color):
+        origin = tree.location.row*dim + tree.location.col
+        stack = [(child, (child.location.row*dim + child.location.col,))
+                 for child in tree.children]
+        while stack:
+            node, path = stack.pop()
+            if node.children:
+                for child in node.children:
+                    stack.append((child, path + (child.location.row*dim
+                                                 + child.location.col,)))
+                continue
+            captured = 0
+            for square in node.dead_squares:
+                captured |= 1 << (square.row*dim + square.col)
+            yield LegalMove(origin, path, captured)
+
+
+def _moves(checkers, color, legacy):
+    """
+    Private function: the moves of color, from the bitboard or (legacy)
+    from the move trees.
+    """
+    if legacy:
+        return tree_moves(checkers, color)
+    return checkers.legal_moves(color)
+
+
+def perft(checkers, depth, legacy=False):
+    """
+    Counts the positions reachable from the current one in depth moves. The
+    position is left as it was found.
+
+    Args:
+        checkers : Checkers
+        depth : int
+        legacy : bool (take the moves from the move trees of valid_moves)
+
+    Returns:
+        int
+    """
+    if depth == 0:
+        return 1
+    color = checkers.get_turn()
+    if depth == 1 and not legacy:
+        return sum(1 for _ in checkers.legal_moves(color))
+    nodes = 0
+    for move in list(_moves(checkers, color, legacy)):
+        undo = checkers.make_legal_move(move)
+        nodes += perft(checkers, depth - 1, legacy)
+        checkers.unmake_move(undo)
+    return nodes
+
+
+def divide(checkers, depth, legacy=False):
+    """
+    Runs perft below each move of the current position.
+
+    Args:
+        checkers : Checkers
+        depth : int (at least 1; the moves themselves count as one)
+        legacy : bool (take the moves from the move trees of valid_moves)
+
+    Returns:
+        list[(LegalMove, int)] : each move and the positions it leads to
+    """
+    counts = []
+    for move in list(_moves(checkers, checkers.get_turn(), legacy)):
+        undo = checkers.make_legal_move(move)
+        counts.append((move, perft(checkers, depth - 1, legacy)))
+        checkers.unmake_move(undo)
+    return counts
+
+
+def move_name(checkers, move):
+    """
+    Names a move with the column|row squares the TUI uses: "b|2-a|3" for a
+    step, "b|2xd|4xf|2" for a jump.
+
+    Args:
+        checkers : Checkers
+        move : LegalMove
+
+    Returns:
+        str
+    """
+    dim = checkers.get_board_dim()
+    squares = []
+    for index in (move.origin,) + move.path:
+        row, col = divmod(index, dim)
+        squares.append(f"{COLUMNS[col]}|{row}")
+    return ("x" if move.captured else "-").join(squares)
+
+
+def timed_perft(checkers, depth, legacy=False):
+    """
+    Runs perft and times it.
+
+    Returns:
+        (int, float) : nodes and seconds taken
+    """
+    start = time.perf_counter()
+    nodes = perft(checkers, depth, legacy)
+    return nodes, time.perf_counter() - start
+
+
+def report(nodes, seconds):
+    """
+    Formats a node count with its time and nodes per second.
+    """
+    nps = nodes / seconds if seconds else 0.0
+    return f"{nodes} nodes in {seconds:.3f}s ({nps:,.0f} nodes/s)"
+
+
+@click.command(name="perft")
+@click.option('--size', type=click.INT, default=3,
+              help="Board size n for a (2n + 2)x(2n + 2) board")
+@click.option('--depth', type=click.INT, default=5)
+@click.option('--divide', 'show_divide', is_flag=True,
+              help="Print the count below each first move")
+@click.option('--position', type=click.File('r', encoding='utf-8'),
+              help="Start from a board written as str(checkers) prints it")
+@click.option('--turn', type=click.Choice(['black', 'red'],
+                                          case_sensitive=False),
+              default='black', help="Color to move in --position")
+@click.option('--fen', help="Start from a position given as text "
+                            "(size:turn:Bsquares:Rsquares:count)")
+@click.option('--legacy', is_flag=True,
+              help="Generate moves by walking the squares (move trees)")
+@click.option('--check', is_flag=True,
+              help="Compare every stored reference count up to --depth")
+
+def cmd(size, depth, show_divide, position, turn, fen, legacy, check):
+    if check:
+        failures = 0
+        for ref_size, counts in REFERENCE.items():
+            checkers = Checkers(ref_size, use_bitboard=not legacy)
+            for ref_depth, expected in enumerate(counts[:depth], start=1):
+                nodes, seconds = timed_perft(checkers, ref_depth, legacy)
+                status = "ok"
+                if nodes != expected:
+                    status = f"FAIL (expected {expected})"
+                failures += nodes != expected
+                print(f"size {ref_size} depth {ref_depth}: "
+                      f"{report(nodes, seconds)} {status}")
+        if failures:
+            print(f"{failures} counts wrong")
+        else:
+            print("all counts match")
+        raise SystemExit(1 if failures else 0)
+
+    if fen is not None:
+        size = fen_to_snapshot(fen).size
+    checkers = Checkers(size, use_bitboard=not legacy)
+    if position is not None:
+        checkers.load_board(position.read(), PieceColor[turn.upper()])
+    if fen is not None:
+        checkers.load_fen(fen)
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(checkers, depth, legacy)
+        for move, nodes in counts:
+            print(f"{move_name(checkers, move)}: {nodes}")
+        print(f"moves: {len(counts)}")
+        nodes = sum(n for _, n in counts)
+    else:
+        nodes = perft(checkers, depth, legacy)
+    seconds = time.perf_counter() - start
+    print(f"perft({depth}) = {report(nodes, seconds)}")
+    if position is None and fen is None \
+            and depth <= len(REFERENCE.get(size, [])):
+        expected = REFERENCE[size][depth - 1] if depth else 1
+        if nodes == expected:
+            print("matches the reference count")
+        else:
+            print(f"MISMATCH: reference count is {expected}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cmd()
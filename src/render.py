@@ -0,0 +1,388 @@
+"""
+Drawing the checkers board for the GUI
+
+The board background of each board size and the sprite of each kind of
+piece are drawn once and cached. BoardRenderer then only redraws the
+squares whose piece or highlight changed since the last frame, and returns
+their rects for pygame.display.update, so a frame in which nothing changed
+costs next to nothing.
+
+Author: Althea Li
+
+Example calls:
+
+    1) Drawing a game in a loop::
+
+        renderer = BoardRenderer(surface)
+        pygame.display.update(renderer.draw(game, move))
+
+    2) Measuring the CPU time of idle, changing and fully redrawn frames::
+
+        python3 src/render.py --size 12 --frames 500
+"""
+import os
+import random
+import time
+from bisect import bisect_right
+from functools import lru_cache
+
+import click
+import pygame
+
+from bitboard import iter_bits
+from checkers import Checkers, PieceColor
+
+Black = (0, 0, 0)
+White = (255,255,255)
+Dark_Gray = (100, 100, 100)
+Green = (148, 214, 81)
+
+# Piece and king-inside colors, by piece color
+PIECE_COLORS = {PieceColor.BLACK: (52, 110, 235),
+                PieceColor.RED: (255, 0, 0)}
+KING_COLORS = {PieceColor.BLACK: (107, 141, 191),
+               PieceColor.RED: (217, 113, 151)}
+
+# Border colors of highlighted squares
+SELECTED = "selected"
+TARGET = "target"
+HIGHLIGHT_COLORS = {SELECTED: Dark_Gray, TARGET: Green}
+
+# How many sizes of backgrounds and piece sprites are kept
+SURFACE_CACHE_SIZE = 16
+
+
+def _display_ready():
+    """
+    Private function: whether a display mode is set, so that surfaces can
+    be converted to its pixel format (which makes blitting them faster).
+    """
+    return pygame.display.get_init() and pygame.display.get_surface() \
+        is not None
+
+
+def square_edges(board_dim, length):
+    """
+    Returns the pixel coordinates where the rows (or columns) of a board
+    start, and where the last one ends.
+
+    Args:
+        board_dim (int) : no. of rows of the board
+        length (int) : height (or width) of the board in pixels
+
+    Returns: list[int]
+    """
+    return [i * length // board_dim for i in range(board_dim + 1)]
+
+
+@lru_cache(maxsize=SURFACE_CACHE_SIZE)
+def board_background(board_dim, width, height):
+    """
+    Returns the empty board, drawn once per board size.
+
+    Args:
+        board_dim (int) : no. of rows of the board
+        width, height (int) : size of the board in pixels
+
+    Returns: pygame.Surface
+    """
+    background = pygame.Surface((width, height))
+    xs = square_edges(board_dim, width)
+    ys = square_edges(board_dim, height)
+    for row in range(board_dim):
+        for col in range(board_dim):
+            rect = (xs[col], ys[row], xs[col+1] - xs[col],
+                    ys[row+1] - ys[row])
+            color = White if (row + col) % 2 == 0 else Black
+            pygame.draw.rect(background, color=color, rect=rect, width=0)
+    if _display_ready():
+        background = background.convert()
+    return background
+
+
+@lru_cache(maxsize=4*SURFACE_CACHE_SIZE)
+def piece_sprite(color, is_king, cell):
+    """
+    Returns the picture of a piece on a transparent square, drawn once per
+    color, king state and square size.
+
+    Args:
+        color (PieceColor)
+        is_king (bool)
+        cell (float) : height of a square in pixels
+
+    Returns: pygame.Surface
+    """
+    radius = cell // 2 - (cell//10)
+    side = int(2*radius) + 2
+    sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+    center = (side / 2, side / 2)
+    pygame.draw.circle(sprite, color=PIECE_COLORS[color], center=center,
+                       radius=radius)
+    if is_king:
+        pygame.draw.circle(sprite, color=KING_COLORS[color], center=center,
+                           radius=radius - (cell//6))
+    if _display_ready():
+        sprite = sprite.convert_alpha()
+    return sprite
+
+
+def highlights(move, board_dim):
+    """
+    Returns the highlighted squares of a move being entered: its starting
+    square and the squares it can go to next.
+
+    Args:
+        move (Moves or None)
+        board_dim (int)
+
+    Returns: dict{int: str}, SELECTED or TARGET by square index
+    """
+    if move is None:
+        return {}
+    marked = {}
+    for child in move.children:
+        marked[child.location.row*board_dim + child.location.col] = TARGET
+    marked[move.location.row*board_dim + move.location.col] = SELECTED
+    return marked
+
+
+def overlay_rect(overlay):
+    """
+    Returns the rect an overlay is drawn in by BoardRenderer.draw.
+
+    Args:
+        overlay (pygame.Surface or None)
+
+    Returns: pygame.Rect or None
+    """
+    if overlay is None:
+        return None
+    return overlay.get_rect(topleft=(5, 5))
+
+
+class BoardRenderer:
+    """
+    Draws a game on a surface, redrawing only what changed since the last
+    frame.
+    """
+    surface: pygame.Surface
+
+    #the pieces (black, red, kings bitmasks), highlights and overlay rect of
+    #the last frame drawn
+    _drawn: tuple
+    _marked: dict
+    _overlay_rect: pygame.Rect
+
+    #frames drawn, squares redrawn and CPU seconds spent, for stats
+    frames: int
+    squares_drawn: int
+    cpu_s: float
+
+    def __init__(self, surface):
+        """
+        Constructor. The first frame is drawn in full.
+
+        Args:
+            surface (pygame.Surface) : the surface to draw on (the window)
+        """
+        self.surface = surface
+        #board size drawn, and where its columns and rows start
+        self._board_dim = None
+        self._xs = []
+        self._ys = []
+        self._drawn = None
+        self._marked = {}
+        self._overlay_rect = None
+        self.frames = 0
+        self.squares_drawn = 0
+        self.cpu_s = 0.0
+
+    def invalidate(self):
+        """
+        Makes the next frame be drawn in full, e.g. after something else
+        drew on the surface.
+
+        Returns: None
+        """
+        self._drawn = None
+
+    def draw(self, game, move=None, overlay=None):
+        """
+        Draws the squares of game whose piece or highlight changed since the
+        last frame, with the squares of move highlighted and overlay (e.g.
+        a text label) on top at the top left corner.
+
+        Args:
+            game (Checkers)
+            move (Moves or None) : the move being entered
+            overlay (pygame.Surface or None)
+
+        Returns: list[pygame.Rect], the parts of the surface that changed
+        """
+        start = time.process_time()
+        surface = self.surface
+        board_dim = game.get_board_dim()
+        width, height = surface.get_size()
+        if board_dim != self._board_dim:
+            self._board_dim = board_dim
+            self._xs = square_edges(board_dim, width)
+            self._ys = square_edges(board_dim, height)
+            self._drawn = None
+        position = game.get_position()
+        pieces = (position.black, position.red, position.kings)
+        marked = highlights(move, board_dim)
+
+        dirty = []
+        if self._drawn is None:
+            surface.blit(board_background(board_dim, width, height), (0, 0))
+            changed = position.black | position.red
+            changed |= sum(1 << index for index in marked)
+            dirty.append(surface.get_rect())
+        else:
+            changed = 0
+            for old, new in zip(self._drawn, pieces):
+                changed |= old ^ new
+            for index in marked.keys() ^ self._marked.keys():
+                changed |= 1 << index
+            for index in marked.keys() & self._marked.keys():
+                if marked[index] != self._marked[index]:
+                    changed |= 1 << index
+            #squares under the old and new overlays are drawn again
+            for rect in (self._overlay_rect, overlay_rect(overlay)):
+                if rect is not None:
+                    changed |= self._covered(rect)
+
+        for index in iter_bits(changed):
+            dirty.append(self._draw_square(index, pieces, marked))
+        self._overlay_rect = None
+        if overlay is not None:
+            self._overlay_rect = surface.blit(overlay, (5, 5))
+            dirty.append(self._overlay_rect)
+
+        self._drawn = pieces
+        self._marked = marked
+        self.frames += 1
+        self.squares_drawn += changed.bit_count()
+        self.cpu_s += time.process_time() - start
+        return dirty
+
+    def stats(self):
+        """
+        Returns the frames drawn so far, the squares redrawn per frame and
+        the CPU milliseconds spent per frame.
+
+        Returns: dict{str: int | float}
+        """
+        frames = self.frames
+        return {"frames": frames,
+                "squares_per_frame": self.squares_drawn / frames
+                if frames else 0.0,
+                "cpu_ms_per_frame": 1000 * self.cpu_s / frames
+                if frames else 0.0}
+
+    def _covered(self, rect):
+        """
+        Private method: the squares rect overlaps, as a bitmask.
+        """
+        board_dim = self._board_dim
+        xs, ys = self._xs, self._ys
+        #the square a pixel is in starts at the last edge not past it
+        first_col = max(bisect_right(xs, rect.left) - 1, 0)
+        last_col = min(bisect_right(xs, rect.right - 1) - 1, board_dim - 1)
+        first_row = max(bisect_right(ys, rect.top) - 1, 0)
+        last_row = min(bisect_right(ys, rect.bottom - 1) - 1, board_dim - 1)
+        mask = 0
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                mask |= 1 << (row*board_dim + col)
+        return mask
+
+    def _draw_square(self, index, pieces, marked):
+        """
+        Private method: draws one square from the background, with its piece
+        and highlight, and returns its rect.
+        """
+        board_dim = self._board_dim
+        row, col = divmod(index, board_dim)
+        xs, ys = self._xs, self._ys
+        rect = pygame.Rect(xs[col], ys[row], xs[col+1] - xs[col],
+                           ys[row+1] - ys[row])
+        surface = self.surface
+        width, height = surface.get_size()
+        surface.blit(board_background(board_dim, width, height), rect, rect)
+        black, red, kings = pieces
+        cell = height / board_dim
+        if (black | red) >> index & 1:
+            color = PieceColor.BLACK if black >> index & 1 else PieceColor.RED
+            sprite = piece_sprite(color, bool(kings >> index & 1), cell)
+            surface.blit(sprite, sprite.get_rect(center=rect.center))
+        if index in marked:
+            pygame.draw.rect(surface, color=HIGHLIGHT_COLORS[marked[index]],
+                             rect=rect, width=int(cell // 12))
+        return rect
+
+
+def time_frames(size, frames, seed=None):
+    """
+    Draws frames of a board of the given size in three ways and returns the
+    CPU milliseconds per frame of each: "idle" (nothing changes), "moves"
+    (a random move is played before every frame) and "full" (every frame is
+    drawn in full, as before the renderer).
+
+    Args:
+        size (int) : no. of rows of pieces
+        frames (int)
+        seed (int or None)
+
+    Returns: dict{str: float}
+    """
+    rng = random.Random(seed)
+    surface = pygame.display.get_surface()
+    results = {}
+    for mode in ("idle", "moves", "full"):
+        game = Checkers(size)
+        renderer = BoardRenderer(surface)
+        #the first frame is drawn in full in every mode, and not counted
+        pygame.display.update(renderer.draw(game))
+        renderer.frames = renderer.squares_drawn = 0
+        renderer.cpu_s = 0.0
+        color = PieceColor.BLACK
+        for _ in range(frames):
+            if mode == "moves":
+                moves = list(game.legal_moves(color))
+                if not moves:
+                    game = Checkers(size)
+                    color = PieceColor.BLACK
+                    moves = list(game.legal_moves(color))
+                game.make_legal_move(rng.choice(moves))
+                color = PieceColor.RED if color == PieceColor.BLACK \
+                    else PieceColor.BLACK
+            elif mode == "full":
+                renderer.invalidate()
+            pygame.display.update(renderer.draw(game))
+        results[mode] = renderer.stats()["cpu_ms_per_frame"]
+    return results
+
+
+@click.command(name="render")
+@click.option('--size', 'sizes', type=click.INT, multiple=True,
+              help="Board size to time (repeatable; default 3 and 12)")
+@click.option('--frames', type=click.INT, default=500)
+@click.option('--seed', type=click.INT, default=None)
+def cmd(sizes, frames, seed):
+    #without a display the frames are drawn off screen
+    if "DISPLAY" not in os.environ:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((600, 600))
+    for size in sizes or (3, 12):
+        results = time_frames(size, frames, seed)
+        print(f"size {size}: "
+              + ", ".join(f"{mode} {ms:.3f} ms/frame"
+                          for mode, ms in results.items()))
+    pygame.display.quit()
+
+
+if __name__ == '__main__':
+    cmd()
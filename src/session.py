@@ -0,0 +1,228 @@
+"""
+Long-lived bot sessions.
+
+A BotSession is created once per game for a SmartBot and told about every
+move played in the game, by either side. The bot keeps everything it learns
+from one move to the next: its transposition table (which holds the part of
+the previous search below the moves actually played), its killer and
+history tables and, with pondering, its answers to the replies it expected.
+The session counts how often that pays off (see stats).
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) A bot playing red in a game, with pondering::
+
+        session = BotSession(game, PieceColor.RED, 6, ponder=True)
+        session.played(path)                 # after every move of the game
+        move = session.choose_move()         # on red's turn
+        game.execute_single_move_rand(game.to_move_tree(move), 0)
+        session.played((move.origin,) + move.path)
+
+    2) Searching in the background and checking the reuse afterwards::
+
+        search = session.start_search()
+        ...
+        move = search.result()
+        session.stats()["reused_roots"]
+"""
+from checkers import Checkers, LegalMove, PieceColor, Snapshot, \
+    opposite_color
+from bot_minimax import SmartBot, BackgroundSearch, PonderSearch
+from game_record import play_path
+
+
+class BotSession:
+    """
+    Class for a SmartBot kept for a whole game, following the game's moves
+    on a board of its own, so that its search state carries over from one
+    move to the next.
+    """
+    #the bot, searching its own copy of the game
+    bot: SmartBot
+
+    #color the bot plays
+    color: PieceColor
+
+    #the position of the game, as the session has followed it
+    position: Snapshot
+
+    #moves played since the session started, as paths of bit indices
+    moves: list
+
+    def __init__(self, game, color, depth, ponder=False, **options):
+        """
+        Starts a session for a bot playing color in game, from the game's
+        current position.
+
+        Args:
+            game : Checkers
+            color : PieceColor, the bot's color
+            depth : int (or None with a time budget), the bot's depth
+            ponder : bool, whether the bot searches on the opponent's turn
+                (see SmartBot.ponder)
+            options : further SmartBot arguments (time_budget_ms, workers,
+                parallel, tablebase, book, ...)
+        """
+        self.color = color
+        self.position = game.snapshot()
+        self.moves = []
+        self.bot = SmartBot(Checkers(self.position.size), color,
+                            opposite_color[color], depth, **options)
+        self._ponder = ponder
+        self._search = None
+        self._pondering = None
+        #search info of every search the session finished
+        self._searches = []
+        self._start_pondering()
+
+    def to_move(self):
+        """
+        Returns whether it is the bot's turn in the session's position.
+
+        Returns: bool
+        """
+        return self.position.black_to_move == (self.color == PieceColor.BLACK)
+
+    def played(self, move):
+        """
+        Tells the session a move was played in the game, by either side. A
+        running search or pondering is stopped; if it is now the opponent's
+        turn, pondering starts (when enabled).
+
+        Args:
+            move : LegalMove, or tuple[int, ...] (the squares the piece
+                visits, as bit indices, start square first)
+
+        Returns: None
+        """
+        if isinstance(move, LegalMove):
+            move = (move.origin,) + tuple(move.path)
+        self.stop()
+        self.position = play_path(self.position, tuple(move))
+        self.moves.append(tuple(move))
+        self._start_pondering()
+
+    def sync(self, game):
+        """
+        Sets the session's position to the game's, for a game changed other
+        than by played moves (e.g. a position set up by hand). What the bot
+        learned is kept.
+
+        Args:
+            game : Checkers
+
+        Returns: None
+        """
+        self.stop()
+        self.position = game.snapshot()
+        self._start_pondering()
+
+    def start_search(self):
+        """
+        Starts the bot's search for a move in the session's position, in a
+        background thread (stopping pondering first).
+
+        Returns: BackgroundSearch
+        """
+        self.stop()
+        self._search = _SessionSearch(self)
+        return self._search
+
+    def choose_move(self):
+        """
+        Searches for the bot's move in the session's position and returns
+        it, waiting for the search.
+
+        Returns: LegalMove
+        """
+        return self.start_search().result()
+
+    def stop(self):
+        """
+        Stops a running search or pondering and waits for it.
+
+        Returns: None
+        """
+        if self._pondering is not None:
+            self._pondering.cancel()
+            self._pondering = None
+        if self._search is not None:
+            if not self._search.done():
+                self._search.cancel()
+            self._search = None
+
+    def close(self):
+        """
+        Stops the bot and frees its worker processes (the session is not
+        used after that).
+
+        Returns: None
+        """
+        self.stop()
+        self.bot.close()
+
+    def stats(self):
+        """
+        Returns how much the bot's searches gained from what it kept: moves
+        (followed since the start), searches (finished), pondered (moves
+        answered from pondering), book (moves from the opening book),
+        reused_roots (searches whose position the transposition table
+        already held from earlier searches) and mean_reused_depth (the
+        depth it held them at), nodes (searched in all), plus the counters
+        of the transposition table ("tt", see TranspositionTable.stats) and
+        of the move orderer ("ordering", see MoveOrderer.stats) when the
+        bot has them.
+
+        Returns: dict
+        """
+        searches = self._searches
+        reused = [info["reused_depth"] for info in searches
+                  if info.get("reused_depth") is not None]
+        result = {"moves": len(self.moves),
+                  "searches": len(searches),
+                  "pondered": sum(1 for info in searches
+                                  if info.get("pondered")),
+                  "book": sum(1 for info in searches if info.get("book")),
+                  "reused_roots": len(reused),
+                  "mean_reused_depth": sum(reused) / len(reused)
+                  if reused else 0.0,
+                  "nodes": sum(info.get("nodes", 0) for info in searches)}
+        table = self.bot.get_table()
+        if table is not None:
+            result["tt"] = table.stats()
+        if self.bot._orderer is not None:
+            result["ordering"] = self.bot._orderer.stats()
+        return result
+
+    def _start_pondering(self):
+        """
+        Private method: starts pondering if it is enabled and it is the
+        opponent's turn.
+        """
+        if self._ponder and not self.to_move():
+            self._pondering = PonderSearch(self.bot, self.position)
+
+
+class _SessionSearch(BackgroundSearch):
+    """
+    Private class: a BackgroundSearch of a session's bot that also keeps the
+    info of the search in the session once it is done.
+    """
+
+    def __init__(self, session):
+        """
+        Starts the search in the session's position.
+        """
+        self.session = session
+        super().__init__(session.bot, session.position)
+
+    def _run(self, snapshot):
+        """
+        Private method: chooses the move and keeps the search info (runs in
+        the background thread).
+        """
+        move = super()._run(snapshot)
+        self.session._searches.append(dict(self.bot.get_search_info()))
+        return move
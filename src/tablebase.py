@@ -0,0 +1,492 @@
+"""
+Endgame tablebase: perfect play for every position with few pieces.
+
+generate works out, for one board size, every position with up to
+max_pieces pieces on the board (both colors together, each with at least one
+piece) and either side to move: whether the side to move wins, loses or can
+only draw, and in how many moves (plies) the game ends with best play (the
+winner hurrying, the loser holding out). It does this backwards from the
+positions where the side to move cannot move, which are lost. The 80-move
+draw rule is not taken into account.
+
+The result is written to a file of one 2-byte entry per position, and
+Tablebase reads it through mmap, so the processes of a parallel simulation
+all share one copy of it in memory. SmartBot consults a Tablebase whenever a
+position has few enough pieces to be in it.
+
+Only real positions are numbered, so the file has no unused entries: they
+are grouped by how many black men, red men, black kings and red kings they
+have (men split by whether they stand on the other side's crowning row), and
+numbered within a group by the squares of each kind of piece in turn (in the
+combinatorial number system, among the squares still free for it) and
+finally the side to move. Files grow quickly all the same: MAX_ENTRIES
+bounds what the command line generates.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Generating all positions with up to 3 pieces on the default board::
+
+        python3 src/tablebase.py --size 3 --pieces 3 -o endgame-3-3.tb
+
+    2) Probing the position of a game::
+
+        tablebase = Tablebase("endgame-3-3.tb")
+        tablebase.probe(checkers.get_position())   # e.g. (WIN, 7)
+
+    3) A bot that plays perfectly once 3 pieces are left::
+
+        SmartBot(checkers, color, opp, 4, tablebase=tablebase)
+"""
+import math
+import mmap
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations, product
+import click
+
+from bitboard import BitBoard, BLACK_MAN, BLACK_KING, RED_MAN, RED_KING, \
+    iter_bits
+
+#results of a position for the side to move
+DRAW, WIN, LOSS = 0, 1, 2
+
+#file header: magic, format version, board size, max pieces, entry count
+MAGIC = b"CKTB"
+VERSION = 2
+HEADER = struct.Struct("<4sHHH6xQ")
+
+#most positions the command line generates a tablebase for (64 MB of file;
+#solving takes far more memory, and minutes)
+MAX_ENTRIES = 2**25
+
+#stands for "the opponent has no pieces left" in successor lists
+NO_PIECES = -1
+
+
+class TablebaseIndex:
+    """
+    Class numbering the positions of a board size with up to max_pieces
+    pieces. Only real positions are numbered: each side has a piece and no
+    man stands on the row it would have been crowned on.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #board size and most pieces a position may have
+    size: int
+    max_pieces: int
+
+    #number of positions
+    entries: int
+
+    def __init__(self, size, max_pieces):
+        """
+        Initializes the numbering.
+
+        Args:
+            size (int) : no. of rows of pieces
+            max_pieces (int) : most pieces (both colors) a position may have
+        """
+        self.size = size
+        self.max_pieces = max_pieces
+        position = BitBoard(size)
+        #dark squares in bit order
+        self.squares = list(iter_bits(position.dark))
+        count = len(self.squares)
+        self._binomial = [[math.comb(n, k) for k in range(max_pieces + 1)]
+                          for n in range(count + 1)]
+        #black men stand off black's crowning row, red men off red's: both
+        #may stand on the middle rows, and each on the other's crowning row
+        self._dark = position.dark
+        self._black_crown = position.black_crown_row & position.dark
+        self._red_crown = position.red_crown_row & position.dark
+        self._middle = position.dark & ~(self._black_crown | self._red_crown)
+        middle = self._middle.bit_count()
+        row = self._black_crown.bit_count()
+        #first number of the positions with each count of black men in the
+        #middle and on red's crowning row, red men in the middle and on
+        #black's crowning row, black kings and red kings
+        self.offsets = {}
+        self.entries = 0
+        for k in range(2, max_pieces + 1):
+            for counts in product(range(k + 1), repeat=6):
+                black_men, black_back, red_men, red_back, black_kings, \
+                    red_kings = counts
+                if sum(counts) != k or not black_men + black_back \
+                        + black_kings or not red_men + red_back + red_kings:
+                    continue
+                men = black_men + black_back + red_men + red_back
+                block = 2 * math.prod((
+                    math.comb(middle, black_men), math.comb(row, black_back),
+                    math.comb(middle - black_men, red_men),
+                    math.comb(row, red_back),
+                    math.comb(count - men, black_kings),
+                    math.comb(count - men - black_kings, red_kings)))
+                if block:
+                    self.offsets[counts] = self.entries
+                    self.entries += block
+
+    def pieces(self, black, red):
+        """
+        Returns the number of pieces of a position.
+
+        Args:
+            black, red (int) : bitmasks of the pieces
+        Returns: int
+        """
+        return (black | red).bit_count()
+
+    def index(self, black, red, kings, black_to_move):
+        """
+        Returns the number of a real position with at most max_pieces
+        pieces.
+
+        Args:
+            black, red, kings (int) : bitmasks of the pieces
+            black_to_move (bool)
+        Returns: int
+        """
+        middle = self._middle
+        black_men = black & ~kings
+        red_men = red & ~kings
+        groups = (
+            (black_men & middle, middle),
+            (black_men & self._red_crown, self._red_crown),
+            (red_men & middle, middle & ~black_men),
+            (red_men & self._black_crown, self._black_crown),
+            (black & kings, self._dark & ~(black_men | red_men)),
+            (red & kings, self._dark & ~(black | red_men)))
+        binomial = self._binomial
+        number = 0
+        counts = []
+        for squares, free in groups:
+            k = squares.bit_count()
+            counts.append(k)
+            if k:
+                #the rank of squares among the sets of k squares of free
+                number *= binomial[free.bit_count()][k]
+                k = 0
+                for square in iter_bits(squares):
+                    k += 1
+                    number += binomial[(free & ((1 << square) - 1))
+                                       .bit_count()][k]
+        return self.offsets[tuple(counts)] + 2 * number \
+            + (0 if black_to_move else 1)
+
+    def positions(self):
+        """
+        Yields every real position: each side has a piece and no man stands
+        on the row it would have been crowned on.
+
+        Returns:
+            generator of (int, int, int, bool) : black, red and kings
+            bitmasks and whether black is to move
+        """
+        position = BitBoard(self.size)
+        for k in range(2, self.max_pieces + 1):
+            for squares in combinations(self.squares, k):
+                for kinds in product((BLACK_MAN, BLACK_KING, RED_MAN, RED_KING),
+                                     repeat=k):
+                    black = red = kings = 0
+                    for square, kind in zip(squares, kinds):
+                        bit = 1 << square
+                        if kind in (BLACK_MAN, BLACK_KING):
+                            black |= bit
+                        else:
+                            red |= bit
+                        if kind in (BLACK_KING, RED_KING):
+                            kings |= bit
+                    if not black or not red:
+                        continue
+                    men = ~kings
+                    if black & men & position.black_crown_row \
+                            or red & men & position.red_crown_row:
+                        continue
+                    yield black, red, kings, True
+                    yield black, red, kings, False
+
+
+def successors(position, black_to_move):
+    """
+    Returns the positions the side to move can reach in one move.
+
+    Args:
+        position : BitBoard (black, red and kings set)
+        black_to_move : bool
+
+    Returns:
+        list[(int, int, int)] : black, red and kings bitmasks after each
+        move, with the other side to move
+    """
+    results = []
+    own = position.own(black_to_move)
+    if position.has_jump(black_to_move):
+        paths = position.iter_jump_paths(black_to_move)
+    else:
+        paths = position.iter_quiet_paths(black_to_move)
+    crown = position.black_crown_row if black_to_move \
+        else position.red_crown_row
+    for path, captured in paths:
+        start = 1 << path[0]
+        end = 1 << path[-1]
+        kings = position.kings & ~captured
+        if kings & start or end & crown:
+            kings = (kings & ~start) | end
+        moved = (own & ~start) | end
+        if black_to_move:
+            results.append((moved, position.red & ~captured, kings))
+        else:
+            results.append((position.black & ~captured, moved, kings))
+    return results
+
+
+def solve(size, max_pieces, progress=None):
+    """
+    Works out every position with up to max_pieces pieces, backwards from
+    the positions where the side to move cannot move.
+
+    Args:
+        size (int) : no. of rows of pieces
+        max_pieces (int)
+        progress : function(str) or None (told what is being done)
+
+    Returns:
+        (TablebaseIndex, array) : the numbering and the entries (an 'H'
+        array: 0 for a draw, 2*d + 1 for a win in d plies,
+        2*d + 2 for a loss in d plies)
+    """
+    numbering = TablebaseIndex(size, max_pieces)
+    position = BitBoard(size)
+    index = numbering.index
+    #successors of each position, flattened, and where each one's start
+    nodes = []
+    starts = array("q", [0])
+    targets = array("q")
+    for black, red, kings, black_to_move in numbering.positions():
+        position.black, position.red, position.kings = black, red, kings
+        reached = set()
+        for after in successors(position, black_to_move):
+            opp = after[0] if not black_to_move else after[1]
+            if not opp:
+                reached.add(NO_PIECES)
+            else:
+                reached.add(index(*after, not black_to_move))
+        nodes.append(index(black, red, kings, black_to_move))
+        targets.extend(reached)
+        starts.append(len(targets))
+    if progress is not None:
+        progress(f"{len(nodes)} positions, {len(targets)} moves")
+
+    #predecessors of each position number, the same way
+    slot = {number: i for i, number in enumerate(nodes)}
+    counts = array("q", [0]) * (len(nodes) + 1)
+    for target in targets:
+        if target != NO_PIECES:
+            counts[slot[target] + 1] += 1
+    for i in range(len(nodes)):
+        counts[i + 1] += counts[i]
+    pred_starts = array("q", counts)
+    preds = array("q", [0]) * len(targets)
+    for i in range(len(nodes)):
+        for j in range(starts[i], starts[i + 1]):
+            if targets[j] != NO_PIECES:
+                t = slot[targets[j]]
+                preds[counts[t]] = i
+                counts[t] += 1
+
+    #the positions whose result is known, one ply further at each step
+    result = bytearray(len(nodes))
+    distance = array("H", [0]) * len(nodes)
+    remaining = array("q", (starts[i + 1] - starts[i]
+                            for i in range(len(nodes))))
+    frontier = []
+    wins_in_one = []
+    for i in range(len(nodes)):
+        if not remaining[i]:
+            result[i] = LOSS
+            frontier.append(i)
+        elif NO_PIECES in targets[starts[i]:starts[i + 1]]:
+            result[i] = WIN
+            distance[i] = 1
+            wins_in_one.append(i)
+    ply = 0
+    while frontier or wins_in_one:
+        following = wins_in_one if ply == 0 else []
+        wins_in_one = []
+        for i in frontier:
+            lost = result[i] == LOSS
+            for j in range(pred_starts[i], pred_starts[i + 1]):
+                p = preds[j]
+                if result[p]:
+                    continue
+                if lost:
+                    result[p] = WIN
+                else:
+                    remaining[p] -= 1
+                    if remaining[p]:
+                        continue
+                    result[p] = LOSS
+                distance[p] = ply + 1
+                following.append(p)
+        frontier = following
+        ply += 1
+    if progress is not None:
+        wins = result.count(WIN)
+        losses = result.count(LOSS)
+        progress(f"{wins} wins, {losses} losses, "
+                 f"{len(nodes) - wins - losses} draws, longest "
+                 f"{max(distance, default=0)} plies")
+
+    entries = array("H", [0]) * numbering.entries
+    for i, number in enumerate(nodes):
+        if result[i] == WIN:
+            entries[number] = 2 * distance[i] + 1
+        elif result[i] == LOSS:
+            entries[number] = 2 * distance[i] + 2
+    return numbering, entries
+
+
+def generate(size, max_pieces, path, progress=None):
+    """
+    Works out every position with up to max_pieces pieces (see solve) and
+    writes the tablebase file.
+
+    Args:
+        size (int) : no. of rows of pieces
+        max_pieces (int)
+        path (str) : file to write
+        progress : function(str) or None (told what is being done)
+
+    Returns: None
+    """
+    numbering, entries = solve(size, max_pieces, progress)
+    if sys.byteorder == "big":
+        entries.byteswap()
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, size, max_pieces,
+                              numbering.entries))
+        entries.tofile(out)
+
+
+class Tablebase:
+    """
+    Class reading a tablebase file through mmap.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #file the tablebase was read from
+    path: str
+
+    #board size and most pieces of the positions in the file
+    size: int
+    max_pieces: int
+
+    #probes that found the position
+    hits: int
+
+    def __init__(self, path):
+        """
+        Opens a tablebase file written by generate.
+
+        Args:
+            path (str)
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        magic, version, size, max_pieces, entries = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        length = len(self._map)
+        if length != HEADER.size + 2 * entries:
+            self._map.close()
+            raise ValueError(f"{path} should have {entries} entries but is "
+                             f"{length} bytes long (truncated?)")
+        self.size = size
+        self.max_pieces = max_pieces
+        self._numbering = TablebaseIndex(size, max_pieces)
+        if entries != self._numbering.entries:
+            self._map.close()
+            raise ValueError(f"{path} has {entries} entries, expected "
+                             f"{self._numbering.entries}")
+        self.hits = 0
+
+    def covers(self, position):
+        """
+        Returns whether a position is in the tablebase.
+
+        Args:
+            position : BitBoard
+        Returns: bool
+        """
+        return position.size == self.size and position.black \
+            and position.red \
+            and (position.black | position.red).bit_count() <= self.max_pieces
+
+    def probe(self, position):
+        """
+        Looks up a position.
+
+        Args:
+            position : BitBoard
+
+        Returns:
+            (int, int) or None : (WIN, LOSS or DRAW for the side to move,
+            plies until the game is decided; 0 for a draw), or None if the
+            position is not in the tablebase
+        """
+        if not self.covers(position):
+            return None
+        number = self._numbering.index(position.black, position.red,
+                                       position.kings, position.black_to_move)
+        entry, = struct.unpack_from("<H", self._map,
+                                    HEADER.size + 2 * number)
+        self.hits += 1
+        if not entry:
+            return DRAW, 0
+        if entry % 2:
+            return WIN, (entry - 1) // 2
+        return LOSS, (entry - 2) // 2
+
+    def close(self):
+        """
+        Closes the file.
+
+        Args: None
+        Returns: None
+        """
+        self._map.close()
+
+
+@click.command(name="tablebase")
+@click.option('--size', type=click.IntRange(1, 12), default=3,
+              help="Board size n for a (2n + 2)x(2n + 2) board")
+@click.option('--pieces', type=click.IntRange(2, None), default=3,
+              help="Most pieces (both colors together) of a position")
+@click.option('-o', '--output', type=click.Path(dir_okay=False),
+              default=None, help="File to write (default endgame-SIZE-PIECES.tb)")
+
+def cmd(size, pieces, output):
+    entries = TablebaseIndex(size, pieces).entries
+    if entries > MAX_ENTRIES:
+        raise click.BadParameter(f"{entries:,} positions on a size {size} "
+                                 f"board, more than the {MAX_ENTRIES:,} "
+                                 f"that can be solved here",
+                                 param_hint="--pieces")
+    if output is None:
+        output = f"endgame-{size}-{pieces}.tb"
+    start = time.perf_counter()
+    generate(size, pieces, output, print)
+    print(f"wrote {output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    cmd()
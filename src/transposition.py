@@ -0,0 +1,366 @@
+"""
+Transposition table for the SmartBot search.
+
+A fixed-capacity table, keyed by the Zobrist hash of a position, that
+remembers what a search already found out about a position: the depth it was
+searched to, the score, whether that score is exact or only a bound, and the
+best move. The table never grows past the memory cap it is built with.
+
+Author: Lucas Tucker
+
+Example calls:
+
+    1) Creating a 16 MB table that keeps the deepest search of a slot::
+
+        table = TranspositionTable(16, policy="depth")
+
+    2) Storing and probing a position::
+
+        table.store(checkers.zobrist_hash(), 3, EXACT, 4, NO_MOVE)
+        entry = table.probe(checkers.zobrist_hash())
+
+    3) Checking how well the table is doing::
+
+        table.stats()
+
+    4) A table in shared memory, opened again by name in a worker process::
+
+        table = SharedTranspositionTable(64)
+        worker_table = SharedTranspositionTable(name=table.name)
+"""
+from array import array
+from multiprocessing import shared_memory
+
+#bound types: the stored score is exact, a lower bound (the search failed
+#high) or an upper bound (the search failed low). 0 marks an empty slot.
+EMPTY, EXACT, LOWER, UPPER = 0, 1, 2, 3
+
+#stored as the best move when there is none
+NO_MOVE = -1
+
+#replacement policies: always overwrite the slot, overwrite it only with a
+#search at least as deep, or do that but also overwrite entries left over
+#from an earlier search
+POLICIES = ("always", "depth", "depth-age")
+
+#bytes taken by one entry (key, score, move, depth, bound, age)
+ENTRY_BYTES = sum(array(code).itemsize for code in "QiqbBB")
+
+#bytes taken by one entry of a SharedTranspositionTable (three 64-bit words)
+SHARED_ENTRY_BYTES = 24
+
+WORD_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class TranspositionTable:
+    """
+    Class for a fixed-size hash table of search results, stored in flat
+    arrays so that its memory use is known up front.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #number of entries the table holds
+    capacity: int
+
+    #replacement policy (one of POLICIES)
+    policy: str
+
+    #probes that found the position
+    hits: int
+
+    #probes that did not find the position
+    misses: int
+
+    #probes that found the slot taken by a different position
+    collisions: int
+
+    #bytes per entry, for stats
+    _entry_bytes = ENTRY_BYTES
+
+    def __init__(self, size_mb=16, policy="depth"):
+        """
+        Initializes an empty table using at most size_mb megabytes.
+
+        Args:
+            size_mb (float) : memory cap in megabytes
+            policy (str) : replacement policy, one of POLICIES
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.capacity = max(1, int(size_mb * 2**20) // ENTRY_BYTES)
+        self.policy = policy
+        self._keys = array("Q", [0]) * self.capacity
+        self._scores = array("i", [0]) * self.capacity
+        self._moves = array("q", [NO_MOVE]) * self.capacity
+        self._depths = array("b", [0]) * self.capacity
+        self._bounds = array("B", [EMPTY]) * self.capacity
+        self._ages = array("B", [0]) * self.capacity
+        self._age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        """
+        Marks the start of a new search, so the "depth-age" policy can tell
+        entries of earlier searches apart.
+
+        Args: None
+        Returns: None
+        """
+        self._age = (self._age + 1) % 256
+
+    def probe(self, key):
+        """
+        Looks up a position.
+
+        Args:
+            key (int) : Zobrist hash of the position
+
+        Returns:
+            (int, int, int, int) or None : (depth, bound, score, move) if the
+            position is in the table, None otherwise
+        """
+        key &= 0xFFFFFFFFFFFFFFFF
+        slot = key % self.capacity
+        bound = self._bounds[slot]
+        if bound == EMPTY:
+            self.misses += 1
+            return None
+        if self._keys[slot] != key:
+            self.misses += 1
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return (self._depths[slot], bound, self._scores[slot],
+                self._moves[slot])
+
+    def store(self, key, depth, bound, score, move=NO_MOVE):
+        """
+        Records a search result, if the replacement policy allows it.
+
+        Args:
+            key (int) : Zobrist hash of the position
+            depth (int) : depth the position was searched to
+            bound (int) : EXACT, LOWER or UPPER
+            score (int) : score of the position for the side to move
+            move (int) : key of the best move found, or NO_MOVE
+
+        Returns: None
+        """
+        key &= 0xFFFFFFFFFFFFFFFF
+        slot = key % self.capacity
+        if self._bounds[slot] != EMPTY and self._keys[slot] != key:
+            if self.policy == "depth" and depth < self._depths[slot]:
+                return
+            if self.policy == "depth-age" and depth < self._depths[slot] \
+                    and self._ages[slot] == self._age:
+                return
+            self.overwrites += 1
+        elif self._keys[slot] == key and move == NO_MOVE:
+            #keep the best move of an earlier search of this position
+            move = self._moves[slot]
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._bounds[slot] = bound
+        self._scores[slot] = score
+        self._moves[slot] = move
+        self._ages[slot] = self._age
+        self.stores += 1
+
+    def clear(self):
+        """
+        Empties the table and resets its counters.
+
+        Args: None
+        Returns: None
+        """
+        self._bounds = array("B", [EMPTY]) * self.capacity
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def stats(self):
+        """
+        Returns the table's counters.
+
+        Args: None
+
+        Returns:
+            dict[str, int | float] : capacity, size_mb, hits, misses,
+            collisions, stores, overwrites and hit_rate
+        """
+        probes = self.hits + self.misses
+        return {"capacity": self.capacity,
+                "size_mb": self.capacity * self._entry_bytes / 2**20,
+                "hits": self.hits,
+                "misses": self.misses,
+                "collisions": self.collisions,
+                "stores": self.stores,
+                "overwrites": self.overwrites,
+                "hit_rate": self.hits / probes if probes else 0.0}
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Class for a transposition table held in a multiprocessing shared memory
+    block, so that searches in several processes fill and read one table.
+
+    Entries are written without locks. Each entry is three 64-bit words:
+    the position key XORed with the other two, the packed (score, depth,
+    bound, age) and the best move. A probe XORs the words back together and
+    only accepts the entry if that gives its key, so an entry another
+    process was halfway through writing reads as a miss rather than as a
+    wrong result. The hit and store counters are kept per process.
+    """
+    #PUBLIC ATTRIBUTES
+
+    #name of the shared memory block, to open the table in another process
+    name: str
+
+    _entry_bytes = SHARED_ENTRY_BYTES
+
+    def __init__(self, size_mb=16, policy="depth", name=None):
+        """
+        Creates an empty table using at most size_mb megabytes, or opens the
+        table another process created under name (size_mb is then ignored).
+        The process that created the table frees it with close.
+
+        Args:
+            size_mb (float) : memory cap in megabytes
+            policy (str) : replacement policy, one of POLICIES
+            name (str) : name of an existing table, or None
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.policy = policy
+        self._owner = name is None
+        if self._owner:
+            capacity = max(1, int(size_mb * 2**20) // SHARED_ENTRY_BYTES)
+            #a new block is zero-filled, which reads as all slots empty
+            self._memory = shared_memory.SharedMemory(
+                create=True, size=8 + capacity * SHARED_ENTRY_BYTES)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self.name = self._memory.name
+        self._words = self._memory.buf.cast("Q")
+        if self._owner:
+            self._words[0] = capacity
+        #the first word holds the capacity, as the block may be rounded up
+        self.capacity = self._words[0]
+        self._age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def _read(self, slot):
+        """
+        Private method: the (key, data, move) words of a slot, with the key
+        XORed back out of the first word.
+        """
+        base = 1 + 3 * slot
+        words = self._words
+        check, data, move = words[base], words[base + 1], words[base + 2]
+        return check ^ data ^ move, data, move
+
+    def probe(self, key):
+        """
+        Looks up a position.
+
+        Args:
+            key (int) : Zobrist hash of the position
+
+        Returns:
+            (int, int, int, int) or None : (depth, bound, score, move) if the
+            position is in the table, None otherwise
+        """
+        key &= WORD_MASK
+        stored, data, move = self._read(key % self.capacity)
+        bound = (data >> 40) & 0xFF
+        if bound == EMPTY:
+            self.misses += 1
+            return None
+        if stored != key:
+            self.misses += 1
+            self.collisions += 1
+            return None
+        self.hits += 1
+        score = data & 0xFFFFFFFF
+        if score >= 1 << 31:
+            score -= 1 << 32
+        if move == WORD_MASK:
+            move = NO_MOVE
+        return ((data >> 32) & 0xFF, bound, score, move)
+
+    def store(self, key, depth, bound, score, move=NO_MOVE):
+        """
+        Records a search result, if the replacement policy allows it.
+
+        Args:
+            key (int) : Zobrist hash of the position
+            depth (int) : depth the position was searched to
+            bound (int) : EXACT, LOWER or UPPER
+            score (int) : score of the position for the side to move
+            move (int) : key of the best move found, or NO_MOVE
+
+        Returns: None
+        """
+        key &= WORD_MASK
+        slot = key % self.capacity
+        stored, data, stored_move = self._read(slot)
+        if (data >> 40) & 0xFF != EMPTY:
+            stored_depth = (data >> 32) & 0xFF
+            if stored != key:
+                if self.policy == "depth" and depth < stored_depth:
+                    return
+                if self.policy == "depth-age" and depth < stored_depth \
+                        and (data >> 48) & 0xFF == self._age:
+                    return
+                self.overwrites += 1
+            elif move == NO_MOVE and stored_move != WORD_MASK:
+                #keep the best move of an earlier search of this position
+                move = stored_move
+        data = (score & 0xFFFFFFFF) | (depth & 0xFF) << 32 | bound << 40 \
+            | self._age << 48
+        move &= WORD_MASK
+        base = 1 + 3 * slot
+        words = self._words
+        words[base + 1] = data
+        words[base + 2] = move
+        words[base] = key ^ data ^ move
+        self.stores += 1
+
+    def clear(self):
+        """
+        Empties the table (for every process using it) and resets this
+        process's counters.
+
+        Args: None
+        Returns: None
+        """
+        self._memory.buf[8:8 + self.capacity * SHARED_ENTRY_BYTES] = \
+            bytes(self.capacity * SHARED_ENTRY_BYTES)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def close(self):
+        """
+        Detaches this process from the table, and frees the shared memory if
+        this process created it.
+
+        Args: None
+        Returns: None
+        """
+        self._words.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
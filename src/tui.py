@@ -12,9 +12,12 @@ File Use: calling <python3 tui.py> in terminal will load the file, and then
 Done By : Niko Matheos
 """
 import time
+from typing import Optional
 from rich.console import Console
 from checkers import Checkers, PieceColor
-from bot_minimax import SmartBot, RandomBot
+from bot_minimax import RandomBot
+from session import BotSession
+from game_record import GameRecorder, open_writer
 
 # Initialize console (for typesetting) and useful global variables.
 console = Console()
@@ -200,11 +203,16 @@ def bot_turn(game, bot):
 
     Args:
         game : Checkers, the current game being played.
-        bot : SmartBot|RandomBot, the bot whose turn it is.
+        bot : BotSession|RandomBot, the bot whose turn it is (a Smart Bot
+            plays through its session).
     Returns: None
     """
-    move = bot.suggest_move()
-    game.execute_single_move_rand(move[0], move[1])
+    if isinstance(bot, BotSession):
+        move = bot.choose_move()
+        game.execute_single_move_rand(game.to_move_tree(move), 0)
+    else:
+        move = bot.suggest_move()
+        game.execute_single_move_rand(move[0], move[1])
     print_board(game)
 
 def print_board(game: Checkers) -> None:
@@ -334,7 +342,9 @@ def print_message(color, game_over=False):
     console.print(top + rw2 + rw3 + rw4 + rw5 + rw6 + btm)
 
 def play_checkers(game: Checkers, player1: str, player2: str, depth1: int,
-    depth2: int) -> None:
+    depth2: int, time1: Optional[int] = None,
+    time2: Optional[int] = None, record_path: Optional[str] = None,
+    ponder: bool = False) -> None:
     """
     Plays a game of Checkers on the terminal
 
@@ -346,12 +356,21 @@ def play_checkers(game: Checkers, player1: str, player2: str, depth1: int,
             "Random Bot".)
         depth1: If player1 is a Smart Bot, this is its depth. Otherwise None
         depth2: If player2 is a Smart Bot, this is its depth. Otherwise None
+        time1: If player1 is a Smart Bot, an optional time limit per move in
+            milliseconds (the bot then searches as deep as it can, up to
+            depth1). Otherwise None
+        time2: Same as time1, for player2
+        record_path: Optional game file to append the game to once it is
+            over (PDN text if it ends in .pdn, binary otherwise)
+        ponder: Whether a Smart Bot playing a Human keeps searching while
+            the Human thinks, so that it can answer the expected move at once
 
     Returns: None
     """
     col_pl = {PieceColor.BLACK : player1,
                   PieceColor.RED : player2}
-    depths = {player1 : depth1, player2 : depth2}
+    depths = {PieceColor.BLACK : depth1, PieceColor.RED : depth2}
+    times = {PieceColor.BLACK : time1, PieceColor.RED : time2}
 
     # The starting player is BLACK
     current = PieceColor.BLACK
@@ -365,27 +384,50 @@ def play_checkers(game: Checkers, player1: str, player2: str, depth1: int,
     print_board(game)
     print()
 
-    # Keep playing until there is a winner:
-    while not game.is_done(current):
-        # Get move from current player
-        if col_pl[current] == "Human":
-            human_turn(game, current, col_pl[non_current])
-        elif col_pl[current] == "Random Bot":
-            rbot = RandomBot(game, current)
-            bot_turn(game, rbot)
-        elif col_pl[current] == "Smart Bot":
-            sbot = SmartBot(game, current, non_current, depths[col_pl[current]])
-            bot_turn(game, sbot)
-        else:
-            console.print(':pile_of_poo: Everybody Dance! :pile_of_poo:')
+    # Records the moves, for record_path
+    recorder = GameRecorder(game)
+
+    # Smart Bots are kept for the whole game in sessions, which are told
+    # every move; one playing a Human may ponder while the Human thinks
+    sessions = {}
+    for color, player in col_pl.items():
+        if player == "Smart Bot":
+            opp = PieceColor.RED if color == PieceColor.BLACK \
+                else PieceColor.BLACK
+            sessions[color] = BotSession(game, color, depths[color],
+                ponder=ponder and col_pl[opp] == "Human",
+                time_budget_ms=times[color])
 
-        # Update the player
-        if current.value == PieceColor.BLACK.value:
-            current = PieceColor.RED
-            non_current = PieceColor.BLACK
-        elif current.value == PieceColor.RED.value:
-            current = PieceColor.BLACK
-            non_current = PieceColor.RED
+    # Keep playing until there is a winner:
+    try:
+        while not game.is_done(current):
+            # Get move from current player
+            if col_pl[current] == "Human":
+                human_turn(game, current, col_pl[non_current])
+            elif col_pl[current] == "Random Bot":
+                rbot = RandomBot(game, current)
+                bot_turn(game, rbot)
+            elif col_pl[current] == "Smart Bot":
+                bot_turn(game, sessions[current])
+            else:
+                console.print(':pile_of_poo: Everybody Dance! :pile_of_poo:')
+            before = len(recorder.moves)
+            recorder.observe()
+            for path in recorder.moves[before:]:
+                for session in sessions.values():
+                    session.played(path)
+
+            # Update the player
+            if current.value == PieceColor.BLACK.value:
+                current = PieceColor.RED
+                non_current = PieceColor.BLACK
+            elif current.value == PieceColor.RED.value:
+                current = PieceColor.BLACK
+                non_current = PieceColor.RED
+    finally:
+        # Stops pondering, also when a player exits
+        for session in sessions.values():
+            session.close()
 
 
     # Escaped loop, game is over, print final board state
@@ -393,6 +435,16 @@ def play_checkers(game: Checkers, player1: str, player2: str, depth1: int,
     print()
     print()
 
+    # Save the game
+    if record_path is not None:
+        tags = {"Event": "tui", "Black": player1, "Red": player2}
+        if depth1 is not None:
+            tags["BlackDepth"] = str(depth1)
+        if depth2 is not None:
+            tags["RedDepth"] = str(depth2)
+        with open_writer(record_path) as writer:
+            writer.write(recorder.record(tags, game.get_winner()))
+
     # Find winner and print winner or tie
     if game.get_winner() is None:
         console.print("Draw")
@@ -406,6 +458,25 @@ def play_checkers(game: Checkers, player1: str, player2: str, depth1: int,
     print()
     console.print("[bold i yellow]Reimport to play again![/bold i yellow]")
 
+def ask_time_limit(player):
+    """
+    Asks for an optional time limit per move for a smart bot. With a time
+    limit the bot searches as deep as it can in that time, up to its depth.
+
+    Args:
+        player: 1 or 2, which player is being set up
+    Returns: int time limit in milliseconds, or None for no limit
+    """
+    while True:
+        v = input(f"Enter a time limit per move for player {player} in " +
+            "milliseconds, or press Enter for none > ")
+        if v == "":
+            return None
+        try:
+            return int(v)
+        except ValueError:
+            console.print("Please enter a whole number of milliseconds.")
+
 def start_tui():
     """
     When tui.py is loaded in terminal as main, this function is called to set up
@@ -434,10 +505,12 @@ def start_tui():
                 "Bot'[/turquoise].")
 
     depth1 = None
+    time1 = None
     if player1 == 'Smart Bot':
         console.print('[yellow i]Reminder: A high depth will make the game ' +
             "incredibly slow! Recoomended depth: 2[/yellow i]")
         depth1 = int(input("Enter the depth for player 1 (smart bot depth) > "))
+        time1 = ask_time_limit(1)
 
     player2 = ''
     while player2 not in player_types:
@@ -450,10 +523,12 @@ def start_tui():
                 "Bot'[/turquoise].")
 
     depth2 = None
+    time2 = None
     if player2 == 'Smart Bot':
         console.print('[yellow i]Reminder: A high depth will make the game ' +
             'incredibly slow! Recoomended depth: 2[/yellow i]')
         depth2 = int(input("Enter the depth for player 2 (smart bot depth) > "))
+        time2 = ask_time_limit(2)
 
     size = 3
     console.print("Now you must select how many rows of pieces each player " +
@@ -461,8 +536,17 @@ def start_tui():
         "pieces, meaning you would enter '3'.")
     size = int(input("How many rows of pieces will each player have? > "))
 
+    record_path = input("Enter a file to save the game to (ending in .pdn " +
+        "for text), or press Enter to skip > ").strip() or None
+
+    ponder = False
+    if "Human" in (player1, player2) and "Smart Bot" in (player1, player2):
+        ponder = input("Should the smart bot keep thinking during your " +
+            "turn? (y/n) > ").strip().lower().startswith("y")
+
     game = Checkers(size)
-    play_checkers(game, player1, player2, depth1, depth2)
+    play_checkers(game, player1, player2, depth1, depth2, time1, time2,
+        record_path, ponder)
 
 
 